@@ -1,23 +1,18 @@
 #!/usr/bin/env python3
 
 import argparse
+import os
 import stat
-import shutil
 import random
 import time
-import pickle
 import hashlib
 from pathlib import Path
-import importlib
 import json
 # import tomllib
 import sys
-from challenges.base import BaseChallenge
-from utils import reset_workspace, make_writable_recursive
+from utils import move_to_trash, purge_trash, remove_tree, run_detached, trash_dir
 from state import State
-from cryptography.fernet import Fernet
-import base64
-import logging
+import functools
 
 # ===================== CONFIG =====================
 
@@ -25,16 +20,40 @@ CONFIG_DIR = Path.home() / ".config" / "bashquest"
 ACTIVE_WORKSPACE_FILE = CONFIG_DIR / "active_workspace"
 USER_CONFIG_FILE = CONFIG_DIR / "env"
 LOG_FILE = CONFIG_DIR / "bashquest.log"
+MANIFEST_FILE = CONFIG_DIR / "manifest.json"
 SYSTEM_CONFIG_FILE = Path("/etc/bashquest/env")
 
 # CHALLENGES_LIST = "challenges.toml"
 CHALLENGES_LIST = "challenges.json"
 DEFAULT_WORKSPACE_NAME = "workspace"
 
-if not CONFIG_DIR.exists():
-    CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+# Commands whose execution is logged (those changing the workspace)
+LOGGED_COMMANDS = ("start", "goto", "submit", "reset")
+
+# Commands that load, change and save the state, under the lock of the
+# workspace; the others only read it and take no lock
+LOCKED_COMMANDS = ("start", "goto", "submit", "reset")
+
+# Heavy modules (cryptography, pickle, logging, the challenge loader) are
+# imported by the functions that need them, so that commands which never
+# touch the encrypted state start as fast as possible.
+
+# Number of journal records after which the state is compacted into a new
+# snapshot (JOURNAL_COMPACT_EVERY in the env file; 0 disables the journal).
+DEFAULT_JOURNAL_COMPACT_EVERY = 32
+
+_env = None
+
+
+def load_env() -> dict[str, str]:
+    """
+    Return the settings of the env file (system-wide if present, otherwise
+    the user's one, which is created if it does not exist).
+    """
+    global _env
+    if _env is not None:
+        return _env
 
-def load_secret_key() -> bytes:
     env_file = SYSTEM_CONFIG_FILE
     # check for system configuration
     if not env_file.exists():
@@ -45,7 +64,7 @@ def load_secret_key() -> bytes:
         with env_file.open("w") as f:
             f.write("SECRET_KEY=bashquest_internal_secret_please_change_me\n")
 
-    # read secret key
+    _env = {}
     with env_file.open() as f:
         for line in f:
             line = line.strip()
@@ -53,11 +72,27 @@ def load_secret_key() -> bytes:
                 continue
             if "=" in line:
                 key, value = line.split("=", 1)
-                if key == "SECRET_KEY":
-                    return value.encode()
+                _env[key] = value
+    return _env
 
-    print("Fatal error: SECRET_KEY not found in env file.")
-    sys.exit(1)
+
+def get_int_setting(name: str, default: int) -> int:
+    value = load_env().get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Fatal error: {name} must be an integer number.")
+        sys.exit(1)
+
+
+def load_secret_key() -> bytes:
+    key = load_env().get("SECRET_KEY")
+    if key is None:
+        print("Fatal error: SECRET_KEY not found in env file.")
+        sys.exit(1)
+    return key.encode()
 
 # ===================== ARGPARSE =====================
 
@@ -86,6 +121,8 @@ def init_argparser():
     goto = sub.add_parser("goto", help="jump to a specific challenge (resets workspace)")
     goto.add_argument("target", help="challenge number (1-based) or challenge id")
 
+    sub.add_parser("reset", help="restore the workspace of the current challenge as it was set up")
+
     submit = sub.add_parser("submit", help="submit a flag")
     submit.add_argument(
         "flag",
@@ -94,6 +131,8 @@ def init_argparser():
         help="string to submit (optional for put-the-flag challenges)",
     )
 
+    sub.add_parser("watch", help="check a put-the-flag challenge as the workspace changes, and move on when solved")
+
     use = sub.add_parser("use", help="switch to another workspace")
     use.add_argument("path", help="path to the workspace to use (absolute or relative)")
 
@@ -101,80 +140,287 @@ def init_argparser():
 
     sub.add_parser("done", help="cancel the quest and cleanup")
 
+    report = sub.add_parser("report", help="report the progress of all workspaces under a directory")
+    report.add_argument("root", help="directory containing the workspaces")
+    report.add_argument(
+        "--format",
+        choices=["csv", "json"],
+        default="csv",
+        help="CSV table or JSON lines (default: csv)",
+    )
+    report.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of worker processes (default: number of CPUs)",
+    )
+
+    grade = sub.add_parser("grade", help="evaluate the current challenge of all workspaces under a directory")
+    grade.add_argument("root", help="directory containing the workspaces")
+    grade.add_argument(
+        "--format",
+        choices=["csv", "json"],
+        default="csv",
+        help="CSV table or JSON lines (default: csv)",
+    )
+    grade.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    grade.add_argument(
+        "--timeout",
+        type=float,
+        default=10,
+        help="seconds allowed to grade one workspace (default: 10)",
+    )
+
+    provision = sub.add_parser("provision", help="create the workspaces of a class from a roster")
+    provision.add_argument("roster", help="CSV file with the columns user, workspace and (optionally) seed")
+    provision.add_argument(
+        "--seed-base",
+        type=int,
+        default=None,
+        help="seed of the rows without one: SEED_BASE plus the row number (default: random)",
+    )
+    provision.add_argument(
+        "--format",
+        choices=["csv", "json"],
+        default="csv",
+        help="CSV table or JSON lines (default: csv)",
+    )
+    provision.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of worker processes (default: number of CPUs)",
+    )
+
+    daemon = sub.add_parser("daemon", help="manage the resident bashquest server")
+    daemon.add_argument(
+        "action",
+        choices=["start", "stop", "status", "run"],
+        help="start in background, stop, show status, or run in foreground",
+    )
+
     return parser
 
 # ===================== logger =====================
 
-def setup_logger(name, log_file,
-                 formatter=logging.Formatter('%(asctime)s %(levelname)s %(message)s'),
-                 level=logging.INFO):
+def setup_logger(name, log_file, formatter=None, level=None, max_bytes=0, max_age=0, backup_count=0):
     """
     Function to setup a generic loggers.
 
+    Records are written by a background thread (see eventlog.py).
+
     :param name: name of the logger
     :type name: str
     :param log_file: file of the log
     :type log_file: str
-    :param formatter: formatter to be used by the logger
+    :param formatter: formatter to be used by the logger (default: JSON lines)
     :type formatter: logging.Formatter
-    :param level: level to display
+    :param level: level to display (default: logging.INFO)
     :type level: int
+    :param max_bytes: rotate the log before it grows beyond this size (0: never)
+    :type max_bytes: int
+    :param max_age: rotate the log when its first record is this many seconds old (0: never)
+    :type max_age: float
+    :param backup_count: number of rotated logs to keep
+    :type backup_count: int
     :return: the logger
     :rtype: logging.Logger
     """
-    handler = logging.FileHandler(log_file)
+    import logging
+
+    from eventlog import JsonFormatter, SharedRotatingFileHandler, start_listener
+
+    if formatter is None:
+        formatter = JsonFormatter()
+    if level is None:
+        level = logging.INFO
+    Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+    handler = SharedRotatingFileHandler(log_file, max_bytes, max_age, backup_count)
     handler.setFormatter(formatter)
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    logger.addHandler(handler)
+    logger.addHandler(start_listener(handler))
     return logger
 
 
-mylogger = setup_logger("mylogger", LOG_FILE)
+DEFAULT_LOG_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_LOG_MAX_DAYS = 7
+DEFAULT_LOG_BACKUPS = 5
+
+_logger = None
+# Fields added to every event: the command being executed and its seed
+_log_context = {}
+
+
+def get_logger():
+    """Return the bashquest logger, opening the log file on first use."""
+    global _logger
+    if _logger is None:
+        _logger = setup_logger(
+            "mylogger",
+            LOG_FILE,
+            max_bytes=get_int_setting("LOG_MAX_BYTES", DEFAULT_LOG_MAX_BYTES),
+            max_age=get_int_setting("LOG_MAX_DAYS", DEFAULT_LOG_MAX_DAYS) * 86400,
+            backup_count=get_int_setting("LOG_BACKUPS", DEFAULT_LOG_BACKUPS),
+        )
+    return _logger
+
+
+def log_event(event: str, **fields):
+    get_logger().info(event, extra={"fields": {**_log_context, **fields}})
 
 # ===================== STATE =====================
 
-def get_fernet(secret_key: str):
-    # SECRET_KEY must be 32 bytes for Fernet
-    key = secret_key.ljust(32, b'\0')[:32]
-    return Fernet(base64.urlsafe_b64encode(key))
+DEFAULT_STATE_CODEC = "aead"
+
+
+@functools.cache
+def get_codec(secret_key: bytes):
+    """Return the codec encrypting the state files (STATE_CODEC in the env file)."""
+    from codec import CODECS, StateCodec
+
+    name = load_env().get("STATE_CODEC", DEFAULT_STATE_CODEC)
+    if name not in CODECS:
+        print(f"Fatal error: STATE_CODEC must be one of: {', '.join(CODECS)}.")
+        sys.exit(1)
+    return StateCodec(secret_key, name)
+
+
+DEFAULT_STATE_BACKEND = "file"
+# Whether the state files are flushed to the disk when saved (STATE_FSYNC
+# in the env file; 0 trades durability on power loss for speed)
+DEFAULT_STATE_FSYNC = 1
+# Shared by all the users: its directory must be writable by all of them
+DEFAULT_STATE_DB = Path("/var/lib/bashquest/state.db")
+
+
+@functools.cache
+def get_backend(secret_key: bytes):
+    """
+    Return the storage backend of the states (STATE_BACKEND in the env
+    file; the sqlite backend stores all states in STATE_DB).
+    """
+    from storage import BACKENDS, FileBackend, SqliteBackend
+
+    env = load_env()
+    name = env.get("STATE_BACKEND", DEFAULT_STATE_BACKEND)
+    if name not in BACKENDS:
+        print(f"Fatal error: STATE_BACKEND must be one of: {', '.join(BACKENDS)}.")
+        sys.exit(1)
+    codec = get_codec(secret_key)
+    if name == "sqlite":
+        import sqlite3
+
+        db_file = Path(env.get("STATE_DB", DEFAULT_STATE_DB))
+        try:
+            return SqliteBackend(codec, db_file)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Fatal error: cannot open the state database {db_file} ({e}).")
+            print("Its directory must exist and be writable by all the students, or set STATE_DB.")
+            sys.exit(1)
+    compact_every = get_int_setting("JOURNAL_COMPACT_EVERY", DEFAULT_JOURNAL_COMPACT_EVERY)
+    fsync = get_int_setting("STATE_FSYNC", DEFAULT_STATE_FSYNC) != 0
+    return FileBackend(codec, compact_every, fsync)
+
+
+DEFAULT_SETUP_CACHE_MB = 256
+SETUP_CACHE_DIR = CONFIG_DIR / "setup-cache"
+
+
+@functools.cache
+def get_setup_cache(secret_key: bytes):
+    """
+    Return the cache of challenge setups, or None if it is disabled
+    (SETUP_CACHE_MB in the env file is its disk budget; 0 disables it).
+    """
+    from setupcache import SetupCache
+
+    budget = get_int_setting("SETUP_CACHE_MB", DEFAULT_SETUP_CACHE_MB)
+    if budget <= 0:
+        return None
+    return SetupCache(SETUP_CACHE_DIR, get_codec(secret_key), budget * 1024 * 1024)
+
+
+DEFAULT_PREBUILD_NEXT = 1
+STAGING_DIR = CONFIG_DIR / "staging"
 
 
-def workspace_state_file(ws: Path) -> Path:
-    return ws / ".bashquest" / "state.bin"
+@functools.cache
+def get_prebuilder(secret_key: bytes):
+    """
+    Return the prebuilder of the next challenge, or None if it is disabled
+    (PREBUILD_NEXT=0 in the env file).
+    """
+    from prebuild import Prebuilder
+
+    if get_int_setting("PREBUILD_NEXT", DEFAULT_PREBUILD_NEXT) == 0:
+        return None
+    return Prebuilder(STAGING_DIR, get_codec(secret_key))
+
+
+DEFAULT_WORKSPACE_STORAGE = "disk"
+WORKSPACE_STORAGES = ("disk", "tmpfs")
+DEFAULT_TMPFS_ROOT = "/dev/shm"
+DEFAULT_TMPFS_MAX_MB = 512
+
+
+@functools.cache
+def get_tmpfs() -> tuple[Path, int] | None:
+    """
+    Return the directory of the RAM-backed workspaces and the cap on the
+    RAM they use, in bytes (TMPFS_ROOT and TMPFS_MAX_MB in the env file),
+    or None if new workspaces are created on disk (WORKSPACE_STORAGE).
+    """
+    env = load_env()
+    storage = env.get("WORKSPACE_STORAGE", DEFAULT_WORKSPACE_STORAGE)
+    if storage not in WORKSPACE_STORAGES:
+        print(f"Fatal error: WORKSPACE_STORAGE must be one of: {', '.join(WORKSPACE_STORAGES)}.")
+        sys.exit(1)
+    if storage == "disk":
+        return None
+    return Path(env.get("TMPFS_ROOT", DEFAULT_TMPFS_ROOT)), get_int_setting("TMPFS_MAX_MB", DEFAULT_TMPFS_MAX_MB) * 1024 * 1024
 
 
 def save_state(state: State, secret_key: str):
-    ws = Path(state.workspace)
-    ws_bash = ws / ".bashquest"
-    ws_bash.mkdir(parents=True, exist_ok=True)
-    fernet = get_fernet(secret_key)
-    raw = pickle.dumps(state)
-    encrypted = fernet.encrypt(raw)
-    with workspace_state_file(ws).open("wb") as f:
-        f.write(encrypted)
+    get_backend(secret_key).save(state)
 
 def load_state(ws: Path, secret_key: str) -> State | None:
-    f = workspace_state_file(ws)
+    """Return the state of ws, or None if it has none; exit if it cannot be read."""
+    from storage import StateError
+
     try:
-        fernet = get_fernet(secret_key)
-        raw = f.read_bytes()
-        state = pickle.loads(fernet.decrypt(raw))
-        return state
-    except Exception:
-        return None
+        return get_backend(secret_key).load(ws)
+    except StateError as e:
+        print(f"Fatal error: {e}.")
+        print("Check SECRET_KEY, or use 'done' and 'start' to begin a new quest.")
+        sys.exit(1)
 
 
 def set_active_workspace(ws: Path):
+    """ws is the path given by the user: for RAM workspaces, the link to the tree (see tmpfs.py)."""
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
     with ACTIVE_WORKSPACE_FILE.open("w") as f:
-        f.write(str(ws.resolve()))
+        f.write(os.path.abspath(ws))
 
 
-def get_active_workspace() -> Path | None:
+def read_active_workspace() -> Path | None:
+    """Return the active workspace as given by the user, not resolved."""
     if not ACTIVE_WORKSPACE_FILE.exists():
         return None
-    ws = Path(ACTIVE_WORKSPACE_FILE.read_text().strip())
+    return Path(ACTIVE_WORKSPACE_FILE.read_text().strip())
+
+
+def get_active_workspace() -> Path | None:
+    """Return the (resolved) active workspace, or None if there is none."""
+    link = read_active_workspace()
+    if link is None:
+        return None
+    ws = link.resolve()
     if ws.exists() and ws.is_dir():
         return ws
     return None
@@ -184,7 +430,7 @@ def get_active_workspace() -> Path | None:
 
 
 def render_description(description: list[str], state: State) -> list[str]:
-    context = vars(state)
+    context = state.context()
     rendered = []
     for line in description:
         try:
@@ -208,64 +454,76 @@ def resolve_challenge_index(target: str, challenges) -> int | None:
 
 # ===================== CHALLENGE LOADING =====================
 
-class SymbolChallenge:
-    def __init__(self, cid, title, description, setup, evaluate):
-        self.id = cid
-        self.title = title
-        self.description = description
-        self.setup = setup
-        self.evaluate = evaluate
+def find_challenges_list() -> Path:
+    config_file = CONFIG_DIR / CHALLENGES_LIST
+    if config_file.exists():
+        return config_file
+    script_dir = Path(__file__).resolve().parent
+    fallback = script_dir / CHALLENGES_LIST
+    if fallback.exists():
+        return fallback
+    print(f"Fatal error: {CHALLENGES_LIST} not found.")
+    print(f"Checked:")
+    print(f"  - {CONFIG_DIR / CHALLENGES_LIST}")
+    print(f"  - {fallback}")
+    sys.exit(1)
 
 
-def build_from_symbols(mod, cid):
-    title = getattr(mod, f"title_{cid}")
-    description = getattr(mod, f"description_{cid}")
-    setup = getattr(mod, f"setup_{cid}")
-    evaluate = getattr(mod, f"check_{cid}")
+def load_challenges():
+    """
+    Return the challenges in the configured order.
 
-    ch = SymbolChallenge(cid, title, description, setup, evaluate)
-    ch.requires_flag = getattr(mod, f"requires_flag_{cid}", True)
-    return ch
+    Metadata comes from the cached manifest, so no challenge module is
+    imported until its setup or evaluation is actually needed.
+    """
+    from manifest import LazyChallenge, load_manifest
 
+    bundle = sys.modules.get("bundle")
+    if bundle is not None and bundle.MANIFEST is not None:
+        # running from the zipapp: the manifest was built with the archive
+        return [LazyChallenge(e) for e in load_bundled_manifest(bundle)]
 
-def load_challenges():
+    entries = load_manifest(find_challenges_list(), MANIFEST_FILE)
+    return [LazyChallenge(e) for e in entries]
+
+
+def load_bundled_manifest(bundle) -> list[dict]:
     config_file = CONFIG_DIR / CHALLENGES_LIST
-    if not config_file.exists():
-        script_dir = Path(__file__).resolve().parent
-        fallback = script_dir / CHALLENGES_LIST
-        if fallback.exists():
-            config_file = fallback
-        else:
-            print(f"Fatal error: {CHALLENGES_LIST} not found.")
-            print(f"Checked:")
-            print(f"  - {CONFIG_DIR / CHALLENGES_LIST}")
-            print(f"  - {fallback}")
+    if config_file.exists():
+        list_text = config_file.read_text()
+    else:
+        list_text = bundle.CHALLENGES_LIST_TEXT
+    by_name = {e["name"]: e for e in bundle.MANIFEST}
+    entries = []
+    for cid in json.loads(list_text):
+        if cid not in by_name:
+            print(f"Fatal error: challenge {cid} is not part of this bundle.")
             sys.exit(1)
+        entries.append(by_name[cid])
+    return entries
 
-    # data = tomllib.loads(config_file.read_text())
-    # challenge_ids = data["challenges"]
-    data = json.loads(config_file.read_text())
-    challenge_ids = data
 
-    challenges = []
+# Differences with the expected tree shown after a wrong submission, at most
+MAX_HINTS = 5
 
-    for cid in challenge_ids:
-        mod = importlib.import_module(f"challenges.{cid}")
 
-        cls = next(
-            (c for c in mod.__dict__.values()
-             if isinstance(c, type)
-             and issubclass(c, BaseChallenge)
-             and c is not BaseChallenge),
-            None
-        )
+def get_hints(ch, state) -> list[str]:
+    """What is still wrong in the workspace, for the challenges that declare their expected tree."""
+    expected = getattr(ch, "expected", None)
+    if expected is None:
+        return []
+    return expected(state).hints(Path(state.workspace))
 
-        if cls:
-            challenges.append(cls())
-        else:
-            challenges.append(build_from_symbols(mod, cid))
 
-    return challenges
+def print_hints(hints: list[str]):
+    if not hints:
+        return
+    print("What is still wrong:")
+    for hint in hints[:MAX_HINTS]:
+        print(f"  - {hint}")
+    if len(hints) > MAX_HINTS:
+        print(f"  ... and {len(hints) - MAX_HINTS} more.")
+    print("")
 
 
 def display_challenge(state, c):
@@ -285,21 +543,32 @@ def exec_use_command(args):
     if not (ws / ".bashquest").exists():
         print(f"No workspace found at {ws}")
         return
-    set_active_workspace(ws)
-    print(f"Active workspace set to {ws}")
+    set_active_workspace(path)
+    print(f"Active workspace set to {path}")
 
 def exec_workspace_command():
-    ws = get_active_workspace()
-    if ws is None:
+    if get_active_workspace() is None:
         print("No active workspace. Use 'start' or 'use' to select a workspace.")
     else:
-        print(ws)
+        print(read_active_workspace())
 
 def exec_done_command():
     ws = get_active_workspace()
-    make_writable_recursive(ws)
-    shutil.rmtree(ws, ignore_errors=True)
-    print(f"Workspace {ws} removed.")
+    link = read_active_workspace()
+    secret_key = load_secret_key()
+    get_backend(secret_key).delete(ws)
+    prebuilder = get_prebuilder(secret_key)
+    if prebuilder is not None:
+        prebuilder.discard(ws)
+    try:
+        remove_tree(ws)
+        remove_tree(trash_dir(ws))
+        if link.is_symlink():
+            # a RAM workspace: its tree was ws
+            link.unlink()
+    except OSError as e:
+        print(f"Could not remove all of {ws}: {e}")
+    print(f"Workspace {link} removed.")
 
 def exec_list_command(state, challenges):
     total = len(challenges)
@@ -324,61 +593,266 @@ def exec_start_command(args, challenges, secret_key):
     path = Path(args.path)
     if not path.is_absolute():
         path = Path.cwd() / path
+    if path.is_symlink() and not path.exists():
+        # a RAM workspace lost with a reboot
+        path.unlink()
+    tmpfs = get_tmpfs()
+    if tmpfs is not None and not path.exists():
+        from tmpfs import create
+
+        if not create(path, *tmpfs):
+            print(f"Not enough room in {tmpfs[0]}: the workspace is on disk.")
     path.mkdir(parents=True, exist_ok=True)
     workspace = path.resolve()
     (workspace / ".bashquest").mkdir(exist_ok=True)
-    set_active_workspace(workspace)
+    set_active_workspace(path)
 
-    # 2. Load or initialize state
-    state = load_state(workspace, secret_key)
-    if not state:
-        state = State()
-        state.workspace = str(workspace)
+    from storage import lock_workspace
 
-    # 3. Start from challenge 0
-    set_challenge(state, challenges, 0, secret_key)
+    with lock_workspace(workspace):
+        # 2. Load or initialize state
+        state = load_state(workspace, secret_key)
+        if not state:
+            state = State()
+            state.workspace = str(workspace)
+
+        # 3. Start from challenge 0
+        set_challenge(state, challenges, 0, secret_key, args.seed)
 
 # ===================== main =====================
 
 
-def set_challenge(state: State, challenges, idx: int, secret_key):
+def set_challenge(state: State, challenges, idx: int, secret_key, seed=None):
     """
     Set the current challenge to idx:
-    - reset workspace
-    - run setup
+    - move the content of the workspace to the trash
+    - drop the data of the previous challenge
+    - run setup (or take the prepared one, see prebuild.py; or from the
+      setup cache if the seed was given explicitly)
+    - record the tree it created, with its seed (see restore.py)
     - persist state
     - print challenge header and description
+    - purge the trash and prepare the next challenge in background
     """
     if not (0 <= idx < len(challenges)):
         print("Invalid challenge.")
         return
 
+    from restore import forget_tree
+
     state.challenge_index = idx
+    state.clear_scratch()
+    before = state.to_dict()
 
+    # the files of the previous challenge are deleted in background,
+    # once the new challenge is set up
     ws = Path(state.workspace).resolve()
-    reset_workspace(ws)
+    forget_tree(ws)
+    move_to_trash(ws)
 
     ch = challenges[idx]
-    state = ch.setup(state)
+    started = time.perf_counter()
+    # the next challenge is prepared in advance only with a random seed
+    prebuilder = get_prebuilder(secret_key) if seed is None else None
+    prebuilt = prebuilder.take(ws, ch, idx, state) if prebuilder is not None else None
+    cache = get_setup_cache(secret_key) if seed is not None else None
+    if prebuilt is not None:
+        state, setup_seed = prebuilt
+    else:
+        setup_seed = seed
+        if setup_seed is None:
+            # drawn from the generator seeded by run_command, and recorded
+            setup_seed = random.getrandbits(63)
+            random.seed(setup_seed)
+        if cache is not None:
+            state = cache.setup(ch, state, ws, seed)
+        else:
+            state = ch.setup(state)
+
+    ram_tree = None
+    tmpfs = get_tmpfs()
+    if tmpfs is not None and is_too_big_for_ram(ws, tmpfs):
+        disk_ws = move_workspace_to_disk(ws, secret_key)
+        if disk_ws is not None:
+            # set up again on disk; the tree in RAM is removed in background
+            ram_tree, ws = ws, disk_ws
+            state = State.from_dict(before)
+            state.workspace = str(ws)
+            random.seed(setup_seed)
+            state = cache.setup(ch, state, ws, seed) if cache is not None else ch.setup(state)
+            print("The workspace has outgrown the RAM allowed (TMPFS_MAX_MB): it is now on disk.")
+    record_setup(ws, ch, idx, setup_seed, secret_key)
     save_state(state, secret_key)
 
     display_challenge(state, ch)
-    mylogger.info(f"Challenge set to {idx + 1}")
+    log_event("challenge_set", challenge=ch.id, index=idx + 1, setup_seed=setup_seed, prebuilt=prebuilt is not None,
+              duration_ms=round((time.perf_counter() - started) * 1000, 3))
+
+    next_ch = challenges[idx + 1] if prebuilder is not None and idx + 1 < len(challenges) else None
+    run_detached(finish_challenge_set, ws, prebuilder, next_ch, idx + 1, ram_tree)
+
+
+def record_setup(ws: Path, ch, idx: int, seed: int, secret_key):
+    """Record the tree just set up for challenge ch, for exec_reset_command."""
+    from restore import RestoreError, forget_tree, record_tree, save_tree
+
+    try:
+        save_tree(ws, get_codec(secret_key), {
+            "challenge": ch.id,
+            "index": idx,
+            "seed": seed,
+            "source_hash": getattr(ch, "source_hash", None),
+            "entries": record_tree(ws),
+        })
+    except (OSError, RestoreError):
+        # a reset will set the challenge up again
+        forget_tree(ws)
+
+
+def setup_again(ch, idx: int, seed: int, path: Path, secret_key):
+    """Set up challenge ch (at index idx) with seed in the directory path."""
+    state = State()
+    state.workspace = str(path)
+    state.challenge_index = idx
+    random.seed(seed)
+    cache = get_setup_cache(secret_key)
+    if cache is not None:
+        cache.setup(ch, state, path, seed)
+    else:
+        ch.setup(state)
+
+
+def exec_reset_command(state: State, challenges, secret_key, seed=None):
+    """
+    Restore the workspace of the current challenge as it was set up,
+    touching only what changed; set the challenge up again if its setup
+    was not recorded or cannot be reproduced.
+    """
+    from restore import RestoreError, load_tree, restore_tree, save_tree
+
+    idx = state.challenge_index
+    if idx >= len(challenges):
+        print("All challenges completed.")
+        return
+    ch = challenges[idx]
+    ws = Path(state.workspace).resolve()
+    codec = get_codec(secret_key)
+
+    record = load_tree(ws, codec)
+    if record is None or (record["challenge"], record["index"], record["source_hash"]) != (
+            ch.id, idx, getattr(ch, "source_hash", None)):
+        set_challenge(state, challenges, idx, secret_key, seed)
+        return
+    if seed is not None and seed != record["seed"]:
+        set_challenge(state, challenges, idx, secret_key, seed)
+        return
+
+    started = time.perf_counter()
+    try:
+        removed, restored, chmodded = restore_tree(
+            ws, record["entries"], lambda path: setup_again(ch, idx, record["seed"], path, secret_key)
+        )
+    except (OSError, RestoreError):
+        set_challenge(state, challenges, idx, secret_key, record["seed"])
+        return
+    save_tree(ws, codec, record)
+
+    log_event("workspace_reset", challenge=ch.id, index=idx + 1, removed=removed, restored=restored,
+              modes=chmodded, duration_ms=round((time.perf_counter() - started) * 1000, 3))
+    print(f"Workspace restored: {removed} removed, {restored} restored, {chmodded} modes reset.")
+
+
+def is_too_big_for_ram(ws: Path, tmpfs: tuple[Path, int]) -> bool:
+    """Whether ws is a RAM workspace and the RAM workspaces of the user are beyond their cap."""
+    from tmpfs import is_in, over_cap
 
+    return is_in(ws, tmpfs[0]) and over_cap(*tmpfs)
 
-def main():
+
+def move_workspace_to_disk(ws: Path, secret_key) -> Path | None:
+    """
+    Move the active RAM workspace ws, with its state, to the disk where its
+    link is; return its new path, or None if ws is not reached by a link.
+    """
+    from tmpfs import move_to_disk
+
+    link = read_active_workspace()
+    if link is None or not link.is_symlink() or link.resolve() != ws:
+        return None
+    disk_ws = move_to_disk(link, ws)
+    # the sqlite backend keeps the states by path
+    get_backend(secret_key).delete(ws)
+    prebuilder = get_prebuilder(secret_key)
+    if prebuilder is not None:
+        prebuilder.discard(ws)
+    return disk_ws
+
+
+def finish_challenge_set(ws: Path, prebuilder, next_ch, next_idx: int, ram_tree: Path | None = None):
+    """Run in a detached process once a challenge is set."""
+    if ram_tree is not None:
+        remove_tree(ram_tree)
+        remove_tree(trash_dir(ram_tree))
+    purge_trash(ws)
+    if next_ch is not None:
+        prebuilder.build(ws, next_ch, next_idx)
+
+
+def main(argv=None):
     parser = init_argparser()
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    run_command(args)
+
+
+def run_command(args, secret_key=None, challenges=None):
+    """
+    Execute the parsed command line.
+
+    secret_key and challenges are loaded on demand unless given, which is
+    how the daemon reuses them between commands.
+    """
+    if args.command == "daemon":
+        from daemon import exec_daemon_command
+        exec_daemon_command(args)
+        return
+    elif args.command == "report":
+        from report import exec_report_command
+        exec_report_command(args)
+        return
+    elif args.command == "grade":
+        from grade import exec_grade_command
+        exec_grade_command(args)
+        return
+    elif args.command == "provision":
+        from provision import exec_provision_command
+        exec_provision_command(args)
+        return
 
     seed = args.seed if args.seed is not None else int(time.time())
     random.seed(seed)
-    mylogger.info(f"Seed: {seed}")
-
-    secret_key = load_secret_key()
-    CHALLENGES = load_challenges()
+    if args.command not in LOGGED_COMMANDS:
+        dispatch_command(args, secret_key, challenges)
+        return
 
+    _log_context.update(command=args.command, seed=seed)
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        dispatch_command(args, secret_key, challenges)
+        outcome = "ok"
+    except SystemExit as e:
+        outcome = "ok" if e.code in (None, 0) else "error"
+        raise
+    finally:
+        log_event("command", outcome=outcome,
+                  duration_ms=round((time.perf_counter() - started) * 1000, 3))
+        _log_context.clear()
+
+
+def dispatch_command(args, secret_key=None, challenges=None):
+    """Execute a command of the quest (see run_command)."""
     if args.command == "start":
-        exec_start_command(args, CHALLENGES, secret_key)
+        exec_start_command(args, challenges or load_challenges(), secret_key or load_secret_key())
         return
 
     workspace = get_active_workspace()
@@ -386,19 +860,44 @@ def main():
         print("No active workspace. Use 'start' or 'use' to select a workspace.")
         return
 
-    state = load_state(workspace, secret_key)
-    if not state:
-        state = State()
-        state.workspace = str(workspace)
-        save_state(state, secret_key)
-
+    # commands that do not need the challenges nor the state
     if args.command == "done":
         exec_done_command()
+        return
     elif args.command == "use":
         exec_use_command(args)
+        return
     elif args.command == "workspace":
         exec_workspace_command()
-    elif args.command == "list":
+        return
+
+    secret_key = secret_key or load_secret_key()
+    CHALLENGES = challenges or load_challenges()
+
+    if args.command == "watch":
+        from watch import exec_watch_command
+        exec_watch_command(workspace, secret_key, CHALLENGES, args.seed)
+        return
+
+    if args.command in LOCKED_COMMANDS:
+        from storage import lock_workspace
+
+        with lock_workspace(workspace):
+            exec_quest_command(args, workspace, secret_key, CHALLENGES)
+    else:
+        exec_quest_command(args, workspace, secret_key, CHALLENGES)
+
+
+def exec_quest_command(args, workspace: Path, secret_key, CHALLENGES):
+    """Execute a command on the state of the workspace (under its lock if the command changes it)."""
+    state = load_state(workspace, secret_key)
+    if not state:
+        state = State()
+        state.workspace = str(workspace)
+        if args.command in LOCKED_COMMANDS:
+            save_state(state, secret_key)
+
+    if args.command == "list":
         exec_list_command(state, CHALLENGES)
     elif args.command == "challenge":
         exec_challenge_command(state, CHALLENGES)
@@ -407,7 +906,13 @@ def main():
         if idx is None:
             print("Invalid challenge.")
             return
-        set_challenge(state, CHALLENGES, idx, secret_key)
+        if idx == state.challenge_index and args.seed is not None:
+            # same challenge, maybe with the same seed: only restore what changed
+            exec_reset_command(state, CHALLENGES, secret_key, args.seed)
+        else:
+            set_challenge(state, CHALLENGES, idx, secret_key, args.seed)
+    elif args.command == "reset":
+        exec_reset_command(state, CHALLENGES, secret_key)
     elif args.command == "submit":
         if state.challenge_index >= len(CHALLENGES):
             print("All challenges completed.")
@@ -425,28 +930,34 @@ def main():
             flag_value = None
 
         if not ch.evaluate(state, flag_value):
-            mylogger.info(f"Challenge {state.challenge_index + 1}: wrong flag")
+            log_event("submit", challenge=ch.id, index=state.challenge_index + 1, outcome="wrong")
             print("")
             print("..:: The flag is WRONG ::..")
             print("")
+            print_hints(get_hints(ch, state))
             return
 
-        print("")
-        print("..:: Congratulations, the flag is CORRECT ::..")
-        print("")
+        pass_challenge(state, CHALLENGES, ch, secret_key, args.seed)
 
-        # Mark challenge as passed
-        state.passed_challenges.add(ch.id)
-        save_state(state, secret_key)
 
-        mylogger.info(f"Challenge {state.challenge_index + 1}: passed")
+def pass_challenge(state: State, challenges, ch, secret_key, seed=None):
+    """Mark the current challenge ch as passed and set the next one."""
+    print("")
+    print("..:: Congratulations, the flag is CORRECT ::..")
+    print("")
 
-        next_idx = state.challenge_index + 1
+    # Mark challenge as passed
+    state.passed_challenges.add(ch.id)
+    save_state(state, secret_key)
 
-        if next_idx < len(CHALLENGES):
-            set_challenge(state, CHALLENGES, next_idx, secret_key)
-        else:
-            print("You completed all challenges!")
+    log_event("submit", challenge=ch.id, index=state.challenge_index + 1, outcome="passed")
+
+    next_idx = state.challenge_index + 1
+
+    if next_idx < len(challenges):
+        set_challenge(state, challenges, next_idx, secret_key, seed)
+    else:
+        print("You completed all challenges!")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Cold-start comparison between the source layout and the zipapp bundle.
+
+The sources are copied without __pycache__ into a read-only directory (use
+--install-dir to place it on the filesystem to test, e.g. an NFS mount),
+so every run of the source layout recompiles its modules, as it happens on
+a read-only shared install. The same commands are then run from the
+zipapp built by bundle.py.
+
+Usage:
+    python benchmarks/cold_start.py [--repeat N] [--install-dir DIR]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import bundle
+
+COMMANDS = [
+    ["list"],
+    ["challenge"],
+    ["submit", "not-the-flag"],
+    ["--seed", "1", "goto", "8"],
+]
+
+
+def install_sources(dest: Path):
+    for name, (_, relpath) in bundle.bundled_sources(ROOT).items():
+        target = dest / relpath
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(ROOT / relpath, target)
+    shutil.copyfile(ROOT / "challenges.json", dest / "challenges.json")
+
+
+def make_read_only(path: Path):
+    for p in sorted(path.rglob("*"), reverse=True):
+        p.chmod(0o555 if p.is_dir() else 0o444)
+    path.chmod(0o555)
+
+
+def timed_run(entry: Path, argv: list[str], home: Path) -> float:
+    env = dict(os.environ, HOME=str(home), PYTHONDONTWRITEBYTECODE="1")
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, str(entry), *argv], cwd=home, env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - t0) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=10, help="runs per command")
+    parser.add_argument("--install-dir", type=Path,
+                        help="directory where the two layouts are installed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, \
+         tempfile.TemporaryDirectory(dir=args.install_dir) as install:
+        home = Path(tmp)
+        src_dir = Path(install) / "src"
+        install_sources(src_dir)
+        pyz = bundle.build(Path(install) / "bashquest.pyz")
+        make_read_only(src_dir)
+
+        layouts = {"sources": src_dir / "bashquest.py", "zipapp": pyz}
+        timed_run(layouts["sources"], ["--seed", "1", "start", "ws"], home)
+
+        print(f"{'command':<28}" + "".join(f"{name:>12}" for name in layouts) + f"{'speedup':>10}")
+        for argv in COMMANDS:
+            medians = {}
+            for name, entry in layouts.items():
+                medians[name] = statistics.median(
+                    timed_run(entry, argv, home) for _ in range(args.repeat))
+            print(f"{' '.join(argv):<28}"
+                  + "".join(f"{medians[name]:>9.1f} ms" for name in layouts)
+                  + f"{medians['sources'] / medians['zipapp']:>9.2f}x")
+
+        for p in src_dir.rglob("*"):
+            p.chmod(0o755)
+        src_dir.chmod(0o755)
+
+
+if __name__ == "__main__":
+    main()
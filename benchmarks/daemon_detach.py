@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Check that the daemon replies before the background work of a command.
+
+A workspace is started in a temporary home directory, then a daemon is
+run whose finish_challenge_set (the purge of the trash and the setup of
+the next challenge, run detached once a challenge is set) is slowed down
+by --delay seconds. A goto through the client must return well before
+that delay, and the slowed-down work must still complete afterwards.
+
+Usage:
+    python benchmarks/daemon_detach.py [--delay S] [--repeat N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Run in the daemon process: finish_challenge_set sleeps first, then
+# leaves a mark once done
+DAEMON = """
+import sys, time
+from pathlib import Path
+sys.path.insert(0, {root!r})
+import bashquest, daemon
+
+finish = bashquest.finish_challenge_set
+
+def slow_finish(ws, *args):
+    time.sleep({delay!r})
+    finish(ws, *args)
+    with open({marks!r}, "a") as f:
+        f.write("done\\n")
+
+bashquest.finish_challenge_set = slow_finish
+daemon.serve()
+"""
+
+
+def run(argv: list[str], env: dict, home: Path, entry: str = "client.py") -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, str(ROOT / entry), *argv], cwd=home, env=env,
+                          stdin=subprocess.DEVNULL, capture_output=True, text=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--delay", type=float, default=3.0, help="seconds finish_challenge_set is slowed down by")
+    parser.add_argument("--repeat", type=int, default=3, help="gotos through the daemon")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bashquest-detach-") as tmp:
+        home = Path(tmp)
+        env = dict(os.environ, HOME=str(home), XDG_RUNTIME_DIR=str(home))
+        marks = home / "finished"
+
+        proc = run(["--seed", "1", "start", "ws"], env, home, "bashquest.py")
+        if proc.returncode != 0:
+            print(proc.stdout + proc.stderr)
+            sys.exit(1)
+
+        server = subprocess.Popen(
+            [sys.executable, "-c", DAEMON.format(root=str(ROOT), delay=args.delay, marks=str(marks))],
+            cwd=home, env=env, stdin=subprocess.DEVNULL)
+        problems = []
+        try:
+            for _ in range(50):
+                if run(["daemon", "status"], env, home).stdout.startswith("The bashquest daemon is running"):
+                    break
+                time.sleep(0.1)
+            else:
+                print("The daemon did not start.")
+                sys.exit(1)
+
+            for i in range(args.repeat):
+                started = time.perf_counter()
+                proc = run(["goto", str(i % 2 + 2)], env, home)
+                elapsed = time.perf_counter() - started
+                print(f"goto through the daemon: {elapsed * 1000:.0f} ms")
+                if proc.returncode != 0:
+                    problems.append(f"goto failed (exit {proc.returncode}):\n{(proc.stdout + proc.stderr).strip()}")
+                elif elapsed >= args.delay / 2:
+                    problems.append(f"goto took {elapsed:.2f} s: it waited for the background work")
+
+            # the background work itself must not be lost
+            deadline = time.monotonic() + args.delay * args.repeat + 10
+            while time.monotonic() < deadline:
+                if marks.exists() and len(marks.read_text().splitlines()) >= args.repeat:
+                    break
+                time.sleep(0.1)
+            else:
+                problems.append("the background work did not complete")
+        finally:
+            run(["daemon", "stop"], env, home)
+            server.wait(timeout=10)
+
+        for problem in problems:
+            print(problem)
+        print("FAIL" if problems else "OK")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
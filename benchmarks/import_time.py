@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Startup/import-time regression benchmark for the bashquest CLI.
+
+Every subcommand is run in a throw-away HOME with `python -X importtime`.
+The raw import log of each run can be kept with --output; the script
+prints the total import time, the wall time and the heaviest imports of
+each command, and exits with status 1 if any command exceeds its budget.
+
+Usage:
+    python benchmarks/import_time.py [--budget MS] [--budget-for CMD=MS ...]
+                                     [--repeat N] [--output DIR]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPT = ROOT / "bashquest.py"
+
+# (label, argv) in execution order: later commands need the workspace
+# created by "start".
+COMMANDS = [
+    ("help", ["--help"]),
+    ("start", ["--seed", "1", "start", "ws"]),
+    ("workspace", ["workspace"]),
+    ("use", ["use", "ws"]),
+    ("list", ["list"]),
+    ("challenge", ["challenge"]),
+    ("submit", ["submit", "not-the-flag"]),
+    ("goto", ["--seed", "1", "goto", "1"]),
+]
+
+# Default budgets in milliseconds of cumulative import time.
+DEFAULT_BUDGET_MS = 150.0
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int, int]]:
+    """Return (module, self_us, cumulative_us, depth) for each import line."""
+    rows = []
+    for line in stderr.splitlines():
+        m = IMPORT_LINE.match(line)
+        if m:
+            self_us, cum_us, indent, name = m.groups()
+            rows.append((name, int(self_us), int(cum_us), len(indent) // 2))
+    return rows
+
+
+def run_once(argv: list[str], home: Path) -> tuple[float, str]:
+    env = dict(os.environ, HOME=str(home), PYTHONDONTWRITEBYTECODE="")
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", str(SCRIPT), *argv],
+        cwd=home, env=env, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - t0) * 1000
+    return wall_ms, proc.stderr
+
+
+def parse_budgets(args) -> dict[str, float]:
+    budgets = {label: args.budget for label, _ in COMMANDS}
+    for item in args.budget_for:
+        label, _, ms = item.partition("=")
+        if label not in budgets or not ms:
+            sys.exit(f"invalid --budget-for value: {item}")
+        budgets[label] = float(ms)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_MS,
+                        help="import-time budget in ms for every command")
+    parser.add_argument("--budget-for", action="append", default=[],
+                        metavar="CMD=MS", help="budget for a single command")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="runs per command (the median is reported)")
+    parser.add_argument("--top", type=int, default=5,
+                        help="number of heaviest imports to show")
+    parser.add_argument("--output", type=Path,
+                        help="directory where the raw importtime logs are saved")
+    args = parser.parse_args()
+    budgets = parse_budgets(args)
+
+    failed = []
+    with tempfile.TemporaryDirectory() as tmp:
+        home = Path(tmp)
+        for label, argv in COMMANDS:
+            totals, walls, rows = [], [], []
+            for i in range(args.repeat):
+                wall_ms, stderr = run_once(argv, home)
+                rows = parse_importtime(stderr)
+                totals.append(sum(cum for _, _, cum, depth in rows if depth == 0) / 1000)
+                walls.append(wall_ms)
+                if args.output:
+                    args.output.mkdir(parents=True, exist_ok=True)
+                    (args.output / f"{label}.{i}.importtime").write_text(stderr)
+
+            total = statistics.median(totals)
+            over = total > budgets[label]
+            if over:
+                failed.append(label)
+            print(f"{label:<10} imports {total:7.1f} ms  wall {statistics.median(walls):7.1f} ms"
+                  f"  budget {budgets[label]:6.1f} ms  {'OVER' if over else 'ok'}")
+            heaviest = sorted((r for r in rows if r[3] == 0), key=lambda r: -r[2])
+            for name, _, cum, _ in heaviest[:args.top]:
+                print(f"{'':<12}{cum / 1000:7.1f} ms  {name}")
+
+    if failed:
+        print(f"Import-time budget exceeded by: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark of utils.reset_workspace() against the previous implementation
+(chmod 0o777 of every entry with make_writable_recursive(), then
+shutil.rmtree()).
+
+Each run removes a freshly built workspace of about N entries: directories
+of 50 files each, one in ten made unreadable and unwritable like the
+directories of cd_permissions. A deep chain of directories is also removed
+to check that the removal does not recurse.
+
+Usage:
+    python benchmarks/reset_workspace.py [--sizes N ...] [--repeat N] [--depth N]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils import make_writable_recursive, remove_tree, reset_workspace
+
+FILES_PER_DIR = 50
+
+
+def previous_reset_workspace(ws: Path, keep=(".bashquest",)):
+    if ws.exists():
+        try:
+            ws.chmod(0o777)
+        except Exception:
+            pass
+        for p in ws.iterdir():
+            if p.name in keep:
+                continue
+            make_writable_recursive(p)
+            if p.is_dir() and not p.is_symlink():
+                shutil.rmtree(p)
+            else:
+                p.unlink()
+    ws.mkdir(parents=True, exist_ok=True)
+
+
+def build_tree(ws: Path, entries: int):
+    ws.mkdir()
+    (ws / ".bashquest").mkdir()
+    locked = []
+    for d in range(entries // (FILES_PER_DIR + 1)):
+        sub = ws / f"dir{d // 100}" / f"sub{d}"
+        sub.mkdir(parents=True)
+        for f in range(FILES_PER_DIR):
+            (sub / f"file{f}.txt").write_bytes(b"x")
+        if d % 10 == 0:
+            locked.append(sub)
+    for sub in locked:
+        sub.chmod(0o111)
+
+
+def build_chain(ws: Path, depth: int):
+    ws.mkdir()
+    fd = os.open(ws, os.O_RDONLY)
+    for _ in range(depth):
+        os.mkdir("d", dir_fd=fd)
+        child = os.open("d", os.O_RDONLY, dir_fd=fd)
+        os.close(fd)
+        fd = child
+    os.close(fd)
+
+
+def measure(reset, build, size: int, repeat: int, tmp: Path) -> float:
+    times = []
+    for i in range(repeat):
+        ws = tmp / f"ws-{reset.__name__}-{size}-{i}"
+        build(ws, size)
+        t0 = time.perf_counter()
+        reset(ws)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="entries per tree")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measure")
+    parser.add_argument("--depth", type=int, default=5000, help="depth of the chain of directories")
+    args = parser.parse_args()
+
+    # not TemporaryDirectory: its cleanup recurses, like the previous implementation
+    tmp = Path(tempfile.mkdtemp(prefix="bashquest-bench-"))
+    try:
+        print(f"{'entries':>8}{'previous':>14}{'current':>14}")
+        for size in args.sizes:
+            before = measure(previous_reset_workspace, build_tree, size, args.repeat, tmp)
+            after = measure(reset_workspace, build_tree, size, args.repeat, tmp)
+            print(f"{size:>8}{before:>11.1f} ms{after:>11.1f} ms")
+
+        print(f"chain of {args.depth} directories:")
+        for reset in (previous_reset_workspace, reset_workspace):
+            try:
+                ms = measure(reset, build_chain, args.depth, 1, tmp)
+                print(f"  {reset.__name__}: {ms:.1f} ms")
+            except (RecursionError, OSError) as e:
+                print(f"  {reset.__name__}: {type(e).__name__}")
+    finally:
+        remove_tree(tmp)
+
+
+if __name__ == "__main__":
+    main()
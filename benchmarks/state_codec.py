@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the state codecs: encode/decode time and encoded size
+of a typical serialized State, for each codec in codec.CODECS.
+
+Usage:
+    python benchmarks/state_codec.py [--number N]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from codec import CODECS, StateCodec
+from state import State
+
+SECRET_KEY = b"bashquest_internal_secret_please_change_me"
+
+
+def sample_state() -> bytes:
+    state = State()
+    state.workspace = "/home/student/workspace"
+    state.challenge_index = 21
+    state.flag_hash = bytes(32)
+    state.passed_challenges = {f"challenge_{i}" for i in range(21)}
+    state.dir1, state.dir2, state.dir3 = "alpha", "beta", "gamma"
+    state.filename = "abcdefgh.txt"
+    return json.dumps({"state": state.to_dict(), "journal": "0123456789abcdef"}).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20000, help="iterations per measure")
+    args = parser.parse_args()
+
+    raw = sample_state()
+    print(f"plain state: {len(raw)} bytes")
+    print(f"{'codec':<8}{'size':>8}{'encode':>14}{'decode':>14}{'key setup':>14}")
+    for name in CODECS:
+        codec = StateCodec(SECRET_KEY, name)
+        blob = codec.encode(raw)
+        assert codec.decode(blob) == raw
+        enc = min(timeit.repeat(lambda: codec.encode(raw), number=args.number, repeat=3))
+        dec = min(timeit.repeat(lambda: codec.decode(blob), number=args.number, repeat=3))
+        setup = min(timeit.repeat(lambda: StateCodec(SECRET_KEY, name), number=200, repeat=3))
+        print(f"{name:<8}{len(blob):>8}"
+              f"{enc / args.number * 1e6:>11.2f} us"
+              f"{dec / args.number * 1e6:>11.2f} us"
+              f"{setup / 200 * 1e6:>11.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Stress test of concurrent commands on one workspace.
+
+A workspace is started in a temporary home directory with the put-the-flag
+challenges (those declaring their expected tree), then hundreds of CLI
+invocations run against it at once: submit (after the driver solves the
+current challenge, reading the state without the lock like a student
+looking at the description), reset, list, challenge and workspace.
+
+At the end the state must be readable, and no progress may be lost: every
+challenge logged as passed is among the passed challenges of the state,
+no challenge was passed twice (two submits of the same challenge, both
+seeing the old state) and the current challenge follows the passed ones.
+No command may fail or find the state unreadable.
+
+Usage:
+    python benchmarks/state_stress.py [--invocations N] [--concurrency N]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+CHALLENGES = [
+    "mkdir_single_directory",
+    "echo_redirect_single_word",
+    "rmdir_deepest_directory",
+    "copy_file_to_dir",
+    "mkdir_nested_directories",
+    "rm_file_in_deepest_directory",
+    "copy_file_in_same_directory",
+    "echo_redirect_two_words",
+    "rmdir_non_empty_deepest_directory",
+    "move_file_into_directory",
+    "echo_redirect_append_to_file",
+    "mv_rename_file",
+    "rmdir_three_nested_directories",
+    "mv_rename_directory",
+]
+
+# Relative frequency of the commands run
+MIX = {"submit": 6, "reset": 1, "list": 2, "challenge": 2, "workspace": 1}
+
+
+def run(argv: list[str], home: Path) -> tuple[str, int, str]:
+    env = dict(os.environ, HOME=str(home))
+    proc = subprocess.run([sys.executable, str(ROOT / "bashquest.py"), *argv], cwd=home, env=env,
+                          stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    return argv[0], proc.returncode, proc.stdout + proc.stderr
+
+
+def solve(ws: Path, backend, challenges):
+    """Bring the workspace to the expected tree of its current challenge, as far as it can."""
+    from storage import StateError
+    from utils import remove_tree
+
+    try:
+        state = backend.load(ws)
+    except StateError:
+        return
+    if state is None or state.challenge_index >= len(challenges):
+        return
+    tree = challenges[state.challenge_index].expected(state)
+    for path, rule in tree.rules.items():
+        target = ws / path
+        try:
+            if rule.kind is None:
+                remove_tree(target)
+            elif rule.kind == "directory":
+                target.mkdir(parents=True, exist_ok=True)
+            elif not rule.unchanged:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(rule.content if rule.content is not None else b"")
+        except OSError:
+            # the challenge changed meanwhile
+            return
+
+
+def passed_events(log_file: Path) -> list[dict]:
+    events = []
+    for line in log_file.read_text().splitlines():
+        event = json.loads(line)
+        if event["event"] == "submit" and event.get("outcome") == "passed":
+            events.append(event)
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--invocations", type=int, default=400, help="CLI invocations in total")
+    parser.add_argument("--concurrency", type=int, default=50, help="invocations running at once")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the mix of commands")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bashquest-stress-") as tmp:
+        home = Path(tmp)
+        # read by bashquest when imported
+        os.environ["HOME"] = str(home)
+        config = home / ".config" / "bashquest"
+        config.mkdir(parents=True)
+        (config / "challenges.json").write_text(json.dumps(CHALLENGES))
+
+        import bashquest
+
+        _, code, out = run(["--seed", "1", "start", "ws"], home)
+        if code != 0:
+            print(out)
+            sys.exit(1)
+        ws = (home / "ws").resolve()
+        backend = bashquest.get_backend(bashquest.load_secret_key())
+        challenges = bashquest.load_challenges()
+
+        rng = random.Random(args.seed)
+        commands = rng.choices(list(MIX), weights=list(MIX.values()), k=args.invocations)
+
+        def invoke(command: str):
+            if command == "submit":
+                solve(ws, backend, challenges)
+            return run([command], home)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(invoke, commands))
+        elapsed = time.perf_counter() - started
+
+        failures = [(command, code, out) for command, code, out in results
+                    if code != 0 or "Fatal error" in out or "Traceback" in out]
+        counts = Counter(command for command, _, _ in results)
+        print(f"{len(results)} invocations ({', '.join(f'{n} {c}' for c, n in counts.items())}),"
+              f" {args.concurrency} at once, in {elapsed:.1f} s")
+
+        problems = []
+        for command, code, out in failures[:5]:
+            problems.append(f"'{command}' failed (exit {code}):\n{out.strip()}")
+        if len(failures) > 5:
+            problems.append(f"... and {len(failures) - 5} more failed commands")
+
+        state = backend.load(ws)
+        events = passed_events(config / "bashquest.log")
+        logged = Counter(e["challenge"] for e in events)
+        print(f"passed: {len(state.passed_challenges)} of {len(CHALLENGES)} challenges;"
+              f" current challenge: {state.challenge_index + 1}")
+        lost = set(logged) - state.passed_challenges
+        if lost:
+            problems.append(f"passed but lost: {', '.join(sorted(lost))}")
+        # once all are passed, the last challenge stays the current one and can be submitted again
+        twice = [cid for cid, n in logged.items() if n > 1 and cid != challenges[-1].id]
+        if twice:
+            problems.append(f"passed more than once: {', '.join(sorted(twice))}")
+        if state.challenge_index != min(len(state.passed_challenges), len(CHALLENGES) - 1):
+            problems.append(f"current challenge {state.challenge_index + 1} does not follow"
+                            f" the {len(state.passed_challenges)} passed ones")
+
+        for problem in problems:
+            print(problem)
+        print("FAIL" if problems else "OK")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
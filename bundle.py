@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Single-file zipapp distribution of bashquest.
+
+Build it with:
+
+    python bundle.py [-o bashquest.pyz]
+
+The archive contains the sources plus one `bundle.bin` entry holding the
+compiled code of every module, the challenge list and a prebuilt challenge
+manifest. At startup `install()` reads that entry with a single read of the
+archive and serves all imports from memory, so no per-module stat/open (nor
+__pycache__ lookup) reaches the filesystem. If the archive was built by a
+different Python version, the bytecode is ignored and the modules are
+imported from the bundled sources through zipimport.
+"""
+
+import marshal
+import sys
+from importlib.machinery import ModuleSpec
+from importlib.util import MAGIC_NUMBER
+
+BUNDLE_DATA = "bundle.bin"
+
+# Set by install(): the challenge list text and the manifest entries.
+CHALLENGES_LIST_TEXT: str | None = None
+MANIFEST: list[dict] | None = None
+
+BOOTSTRAP = """\
+import bundle
+bundle.install(__loader__)
+from bashquest import main
+main()
+"""
+
+
+class BundleImporter:
+    """Meta path finder and loader for the code objects in bundle.bin."""
+
+    def __init__(self, archive: str, modules: dict):
+        self.archive = archive
+        self.modules = modules
+
+    def find_spec(self, fullname, path=None, target=None):
+        entry = self.modules.get(fullname)
+        if entry is None:
+            return None
+        is_pkg, relpath, _ = entry
+        spec = ModuleSpec(fullname, self, origin=f"{self.archive}/{relpath}", is_package=is_pkg)
+        spec.has_location = True
+        if is_pkg:
+            spec.submodule_search_locations = [f"{self.archive}/{relpath.rpartition('/')[0]}"]
+        return spec
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        _, _, code = self.modules[module.__spec__.name]
+        exec(marshal.loads(code), module.__dict__)
+
+
+def install(loader):
+    """Serve the bundled modules from memory (called by the archive's __main__)."""
+    global CHALLENGES_LIST_TEXT, MANIFEST
+
+    data = marshal.loads(loader.get_data(f"{loader.archive}/{BUNDLE_DATA}"))
+    CHALLENGES_LIST_TEXT = data["challenges_list"]
+    MANIFEST = data["manifest"]
+    if data["magic"] == MAGIC_NUMBER:
+        sys.meta_path.insert(0, BundleImporter(loader.archive, data["modules"]))
+
+
+# ===================== BUILD =====================
+
+def bundled_sources(root) -> dict[str, tuple[bool, str]]:
+    """Return {module name: (is package, path relative to root)} to bundle."""
+    import tomllib
+
+    config = tomllib.loads((root / "pyproject.toml").read_text())
+    sources = {name: (False, f"{name}.py") for name in config["tool"]["setuptools"]["py-modules"]}
+    for package in config["tool"]["setuptools"]["packages"]["find"]["include"]:
+        sources[package] = (True, f"{package}/__init__.py")
+        for path in sorted((root / package).glob("*.py")):
+            if path.stem != "__init__":
+                sources[f"{package}.{path.stem}"] = (False, f"{package}/{path.name}")
+    return sources
+
+
+def build(output, interpreter="/usr/bin/env python3"):
+    import importlib.util
+    import os
+    import py_compile
+    import tempfile
+    import zipfile
+    from pathlib import Path
+
+    root = Path(__file__).resolve().parent
+    sys.path.insert(0, str(root))
+    import manifest
+
+    sources = bundled_sources(root)
+
+    modules = {}
+    for name, (is_pkg, relpath) in sources.items():
+        code = compile((root / relpath).read_bytes(), relpath, "exec", dont_inherit=True)
+        modules[name] = (is_pkg, relpath, marshal.dumps(code))
+
+    list_text = (root / "challenges.json").read_text()
+    entries = manifest.load_manifest(root / "challenges.json", Path(tempfile.mkdtemp()) / "manifest.json")
+    for entry in entries:
+        entry["path"] = f"challenges/{entry['name']}.py"
+
+    data = marshal.dumps({
+        "magic": importlib.util.MAGIC_NUMBER,
+        "modules": modules,
+        "challenges_list": list_text,
+        "manifest": entries,
+    })
+
+    output = Path(output)
+    with tempfile.TemporaryDirectory() as tmp:
+        # __main__ and bundle are loaded by zipimport: ship them precompiled
+        # with unchecked hash-based pycs, which need no source mtime
+        main_src = Path(tmp) / "__main__.py"
+        main_src.write_text(BOOTSTRAP)
+        compiled = {}
+        for arcname, src in (("__main__", main_src), ("bundle", root / "bundle.py")):
+            cfile = Path(tmp) / f"{arcname}.pyc"
+            py_compile.compile(str(src), cfile=str(cfile), dfile=f"{arcname}.py", doraise=True,
+                               invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+            compiled[arcname] = cfile.read_bytes()
+
+        with output.open("wb") as f:
+            f.write(f"#!{interpreter}\n".encode())
+            with zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as z:
+                z.writestr("__main__.py", BOOTSTRAP)
+                for arcname, pyc in compiled.items():
+                    z.writestr(f"{arcname}.pyc", pyc)
+                z.writestr(BUNDLE_DATA, data)
+                z.writestr("challenges.json", list_text)
+                for name, (is_pkg, relpath) in sources.items():
+                    z.write(root / relpath, relpath)
+    os.chmod(output, 0o755)
+    return output
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the bashquest zipapp")
+    parser.add_argument("-o", "--output", default="bashquest.pyz", help="archive to create")
+    parser.add_argument("-p", "--python", default="/usr/bin/env python3",
+                        help="interpreter written in the shebang line")
+    args = parser.parse_args()
+    print(f"Created {build(args.output, args.python)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,8 @@ class AbsolutePathsChallenge(BaseChallenge):
         "The flag is the absolute path to the file."
     ]
     requires_flag = True
+    # the flag is the absolute path of the workspace: never served from the setup cache
+    relocatable = False
 
     def setup(self, state: State) -> State:
         ws = Path(state.workspace).resolve()
@@ -0,0 +1,201 @@
+"""
+Declarative description of the files a challenge creates.
+
+A setup fills a WorkspaceSpec with directories, files (with their content
+or just their size) and modes, then calls build() to create all of it in
+one pass:
+
+- directories first, parents before children;
+- files written with os.open/os.write from bytes (str content is encoded
+  once when added), in a pool of threads when there are many of them;
+  files given by size are streamed from a reused buffer, or only sized
+  (sparse or preallocated) when their content does not matter, and
+  streamed files are written chunk by chunk as their iterable yields them;
+- modes last, children before their parents, so that read-only or
+  non-listable directories can still be filled.
+
+Parent directories of files are added implicitly. Adding a path twice
+replaces the previous entry, as writing the file twice would.
+
+The spec only drives the creation of the tree. The setup cache
+(setupcache.py) and the record of the tree for resets (restore.py) still
+walk the finished workspace: they serve every challenge, most of which
+create their files without a spec, and the record needs the inode and
+ctime of every live entry anyway, which only a stat of the built tree
+gives.
+
+    spec = WorkspaceSpec()
+    spec.dir("locked", mode=0o111)
+    spec.file("locked/readme.txt", "hello\\n", mode=0o444)
+    spec.sized_file("big.bin", 10_000)
+    spec.sized_file("huge.img", 500 * 1024 * 1024, layout=SPARSE)
+    spec.build(ws)
+"""
+
+import os
+from pathlib import Path
+
+# Files written by one thread below this count
+PARALLEL_MIN_FILES = 64
+MAX_WORKERS = 8
+# Size of the buffer files given by size are written from
+CHUNK_SIZE = 1024 * 1024
+
+# fill -> CHUNK_SIZE bytes repeating it, shared by all writes (read only)
+_chunks: dict[bytes, bytes] = {}
+
+
+# How a file given by size gets its size
+WRITE = "write"        # fill written up to size
+SPARSE = "sparse"      # ftruncate: a hole, no disk blocks (du reports ~0)
+ALLOCATE = "allocate"  # posix_fallocate: zeros, disk blocks reserved
+
+
+class Entry:
+    __slots__ = ("kind", "content", "size", "fill", "layout", "mode")
+
+    def __init__(self, kind: str, content: bytes = b"", size: int = 0, fill: bytes = b"",
+                 layout: str = WRITE, mode: int | None = None):
+        self.kind = kind
+        self.content = content
+        self.size = size
+        self.fill = fill
+        self.layout = layout
+        self.mode = mode
+
+
+def chunk_of(fill: bytes) -> bytes:
+    chunk = _chunks.get(fill)
+    if chunk is None:
+        # a whole number of fills, so that every chunk continues the pattern
+        chunk = fill * max(1, CHUNK_SIZE // len(fill))
+        _chunks[fill] = chunk
+    return chunk
+
+
+def write_all(fd: int, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def write_sized(fd: int, entry: Entry):
+    """Make fd exactly entry.size bytes long, as entry.layout says."""
+    if entry.layout == SPARSE:
+        os.ftruncate(fd, entry.size)
+        return
+    if entry.layout == ALLOCATE:
+        try:
+            os.posix_fallocate(fd, 0, entry.size)
+            return
+        except OSError:
+            # not supported by the filesystem: write the zeros
+            entry = Entry("file", size=entry.size, fill=b"\0")
+    chunk = chunk_of(entry.fill)
+    left = entry.size
+    while left >= len(chunk):
+        write_all(fd, chunk)
+        left -= len(chunk)
+    if left:
+        write_all(fd, memoryview(chunk)[:left])
+
+
+def write_file(path: str, entry: Entry):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o666)
+    try:
+        if entry.fill or entry.layout != WRITE:
+            write_sized(fd, entry)
+        elif isinstance(entry.content, bytes):
+            write_all(fd, entry.content)
+        else:
+            for chunk in entry.content:
+                write_all(fd, chunk)
+    finally:
+        os.close(fd)
+
+
+def write_files(files: list[tuple[str, Entry]]):
+    for path, entry in files:
+        write_file(path, entry)
+
+
+class WorkspaceSpec:
+    def __init__(self):
+        # relative path -> Entry, parents before children
+        self.entries: dict[str, Entry] = {}
+
+    def _add(self, path: str, entry: Entry):
+        parent = os.path.dirname(path)
+        if parent and parent not in self.entries:
+            self.dir(parent)
+        self.entries.pop(path, None)
+        self.entries[path] = entry
+
+    def dir(self, path: str, mode: int | None = None):
+        """Add the directory path (relative to the workspace)."""
+        entry = self.entries.get(path)
+        if entry is not None and entry.kind == "dir":
+            if mode is not None:
+                entry.mode = mode
+            return
+        self._add(path, Entry("dir", mode=mode))
+
+    def file(self, path: str, content: bytes | str = b"", mode: int | None = None):
+        """Add the file path with the given content."""
+        if isinstance(content, str):
+            content = content.encode()
+        self._add(path, Entry("file", content=content, size=len(content), mode=mode))
+
+    def stream_file(self, path: str, chunks, mode: int | None = None):
+        """
+        Add the file path with the bytes yielded by the iterable chunks,
+        which is consumed when the workspace is built (possibly in another
+        thread).
+        """
+        self._add(path, Entry("file", content=chunks, mode=mode))
+
+    def sized_file(self, path: str, size: int, fill: bytes = b"X", layout: str = WRITE,
+                   mode: int | None = None):
+        """
+        Add the file path, exactly size bytes long: fill repeated, or zeros
+        if layout is SPARSE or ALLOCATE (for when only the size matters).
+        """
+        if layout == WRITE and not fill:
+            raise ValueError("fill must not be empty")
+        self._add(path, Entry("file", size=size, fill=fill, layout=layout, mode=mode))
+
+    def chmod(self, path: str, mode: int):
+        """Set the mode of an entry already added."""
+        self.entries[path].mode = mode
+
+    def items(self):
+        return self.entries.items()
+
+    def files(self) -> list[str]:
+        return [path for path, entry in self.entries.items() if entry.kind == "file"]
+
+    def build(self, ws: Path):
+        """Create the entries in the workspace ws."""
+        root = str(ws)
+        files = []
+        for path, entry in self.entries.items():
+            full = os.path.join(root, path)
+            if entry.kind == "dir":
+                os.makedirs(full, exist_ok=True)
+            else:
+                files.append((full, entry))
+
+        workers = min(MAX_WORKERS, os.cpu_count() or 1)
+        if len(files) < PARALLEL_MIN_FILES or workers == 1:
+            write_files(files)
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(workers) as pool:
+                # one batch per thread: no per-file scheduling overhead
+                for future in [pool.submit(write_files, files[i::workers]) for i in range(workers)]:
+                    future.result()
+
+        for path, entry in reversed(self.entries.items()):
+            if entry.mode is not None:
+                os.chmod(os.path.join(root, path), entry.mode)
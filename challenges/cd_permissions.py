@@ -1,6 +1,7 @@
 import stat
 import random
 from pathlib import Path
+from challenges.builder import WorkspaceSpec
 from state import State
 from utils import hash_flag
 
@@ -29,24 +30,25 @@ def setup_cd_permissions(state: State) -> State:
     ws = Path(state.workspace).resolve()
 
     d1, d2, d3 = random_dirname(), random_dirname(), random_dirname()
-    p1, p2, p3 = ws / d1, ws / d1 / d2, ws / d1 / d2 / d3
-    p3.mkdir(parents=True)
-
-    (p1 / INSTRUCTIONS).write_text(f"To continue, cd into:\n{d2}\n")
-    (p2 / INSTRUCTIONS).write_text(f"To continue, cd into:\n{d3}\n")
-    (p3 / INSTRUCTIONS).write_text(
-        "You reached the deepest directory.\n"
-        "The directory name is the flag.\n"
-        "Use pwd to show the full path.\n"
-    )
+    p1, p2, p3 = d1, f"{d1}/{d2}", f"{d1}/{d2}/{d3}"
 
     x = stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
     r = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
 
+    # modes are applied once everything is created
+    spec = WorkspaceSpec()
     for p in (p1, p2, p3):
-        p.chmod(x)
-    for f in (p1/INSTRUCTIONS, p2/INSTRUCTIONS, p3/INSTRUCTIONS):
-        f.chmod(r)
+        spec.dir(p, mode=x)
+    spec.file(f"{p1}/{INSTRUCTIONS}", f"To continue, cd into:\n{d2}\n", mode=r)
+    spec.file(f"{p2}/{INSTRUCTIONS}", f"To continue, cd into:\n{d3}\n", mode=r)
+    spec.file(
+        f"{p3}/{INSTRUCTIONS}",
+        "You reached the deepest directory.\n"
+        "The directory name is the flag.\n"
+        "Use pwd to show the full path.\n",
+        mode=r,
+    )
+    spec.build(ws)
 
     state.flag_hash = hash_flag(d3)
     return state
@@ -1,6 +1,7 @@
 from challenges.base import BaseChallenge
 import random
 from pathlib import Path
+from challenges.expect import ExpectedTree
 from state import State
 
 FRUITS = [
@@ -12,6 +13,11 @@ FRUITS = [
     "pineapple", "nectarine", "pomegranate", "tangerine",
 ]
 
+
+def content_of(name: str) -> str:
+    return f"This file is named {name}.\n"
+
+
 class CopyAndRenameFileChallenge(BaseChallenge):
     id = "copy_file_in_same_directory"
     title = "Copy a file in the same directory"
@@ -36,7 +42,7 @@ class CopyAndRenameFileChallenge(BaseChallenge):
         dst_file = ws / f"{dst_name}.txt"
 
         # Create source file
-        src_file.write_text(f"This file is named {src_name}.\n")
+        src_file.write_text(content_of(src_name))
 
         # Persist expected names
         state.cp_src = src_file.name
@@ -44,23 +50,16 @@ class CopyAndRenameFileChallenge(BaseChallenge):
 
         return state
 
-    def evaluate(self, state: State, flag: str | None) -> bool:
-        ws = Path(state.workspace)
-
-        src = ws / state.cp_src
-        dst = ws / state.cp_dst
+    def expected(self, state: State) -> ExpectedTree:
+        content = content_of(Path(state.cp_src).stem)
+        tree = ExpectedTree()
 
-        # Both files must exist
-        if not src.exists() or not dst.exists():
-            return False
+        # Both files must exist (true copy, not mv), the copy with the content
+        tree.unchanged(state.cp_src)
+        tree.file(state.cp_dst, content)
 
-        # They must be files
-        if not src.is_file() or not dst.is_file():
-            return False
+        return tree
 
-        # Content must be identical (true copy, not mv)
-        try:
-            return src.read_text() == dst.read_text()
-        except Exception:
-            return False
+    def evaluate(self, state: State, flag: str | None) -> bool:
+        return self.expected(state).matches(Path(state.workspace))
 
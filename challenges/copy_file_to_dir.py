@@ -1,6 +1,7 @@
 from challenges.base import BaseChallenge
 import random
 from pathlib import Path
+from challenges.expect import ExpectedTree
 from state import State
 from utils import hash_flag
 
@@ -23,6 +24,10 @@ FIRST_NAMES = [
 ]
 
 
+def content_of(name: str) -> str:
+    return f"This file is named {name}.\n"
+
+
 class CopyFileToDirChallenge(BaseChallenge):
     id = "cp_copy_file_to_dir"
     title = "Copy a file into a directory"
@@ -44,7 +49,7 @@ class CopyFileToDirChallenge(BaseChallenge):
         dest_dir = ws / name
 
         # Create file and directory
-        src_file.write_text(f"This file is named {fruit}.\n")
+        src_file.write_text(content_of(fruit))
         dest_dir.mkdir(exist_ok=True)
 
         # Persist state
@@ -53,23 +58,18 @@ class CopyFileToDirChallenge(BaseChallenge):
 
         return state
 
-    def evaluate(self, state: State, flag: str | None) -> bool:
-        ws = Path(state.workspace)
-
-        src = ws / state.cp_source_file
-        dest = ws / state.cp_dest_dir / state.cp_source_file
+    def expected(self, state: State) -> ExpectedTree:
+        content = content_of(Path(state.cp_source_file).stem)
+        tree = ExpectedTree()
 
-        # Source must still exist
-        if not src.exists() or not src.is_file():
-            return False
+        # Source must still exist (its content is not checked)
+        tree.unchanged(state.cp_source_file)
 
         # Destination must contain a copied file
-        if not dest.exists() or not dest.is_file():
-            return False
-
-        # Optional: ensure content matches
-        try:
-            return src.read_text() == dest.read_text()
-        except Exception:
-            return False
+        tree.file(f"{state.cp_dest_dir}/{state.cp_source_file}", content)
+
+        return tree
+
+    def evaluate(self, state: State, flag: str | None) -> bool:
+        return self.expected(state).matches(Path(state.workspace))
 
@@ -1,5 +1,6 @@
 from pathlib import Path
 import random
+from challenges.expect import ExpectedTree
 from state import State
 
 ECHO_FILENAME = "flag.txt"
@@ -44,20 +45,14 @@ def setup_echo_redirect_append_to_file(state: State) -> State:
     return state
 
 
-def check_echo_redirect_append_to_file(state: State, flag: str | None) -> bool:
-    ws = Path(state.workspace)
-    target = ws / ECHO_FILENAME
+def expected_echo_redirect_append_to_file(state: State) -> ExpectedTree:
+    tree = ExpectedTree()
+    tree.file(ECHO_FILENAME, state.echo_expected_content, ignore_trailing=b"\n")
+    return tree
 
-    if not target.exists() or not target.is_file():
-        return False
-
-    try:
-        content = target.read_text().rstrip("\n")
-    except Exception:
-        return False
 
+def check_echo_redirect_append_to_file(state: State, flag: str | None) -> bool:
     # Accept both flag-less and explicit-flag submission
-    if flag is None:
-        return content == state.echo_expected_content
-    else:
-        return content == state.echo_expected_content and flag == content
+    if flag is not None and flag != state.echo_expected_content:
+        return False
+    return expected_echo_redirect_append_to_file(state).matches(Path(state.workspace))
@@ -1,5 +1,6 @@
 from pathlib import Path
 import random
+from challenges.expect import WHITESPACE, ExpectedTree
 from state import State
 from utils import hash_flag
 
@@ -27,20 +28,14 @@ def setup_echo_redirect_single_word(state: State) -> State:
 
     return state
 
-def check_echo_redirect_single_word(state: State, flag: str | None) -> bool:
-    ws = Path(state.workspace)
-    target = ws / ECHO_FILENAME
-
-    if not target.exists() or not target.is_file():
-        return False
+def expected_echo_redirect_single_word(state: State) -> ExpectedTree:
+    tree = ExpectedTree()
+    tree.file(ECHO_FILENAME, state.echo_word, ignore_leading=WHITESPACE, ignore_trailing=WHITESPACE)
+    return tree
 
-    try:
-        content = target.read_text().strip()
-    except Exception:
-        return False
 
+def check_echo_redirect_single_word(state: State, flag: str | None) -> bool:
     # This is required to handle both absence and presence of flag in submit
-    if flag is None:
-        return content == state.echo_word
-    else:
-        return content == state.echo_word and flag == content
+    if flag is not None and flag != state.echo_word:
+        return False
+    return expected_echo_redirect_single_word(state).matches(Path(state.workspace))
@@ -1,5 +1,6 @@
 from pathlib import Path
 import random
+from challenges.expect import WHITESPACE, ExpectedTree
 from state import State
 
 ECHO_FILENAME = "flag.txt"
@@ -30,21 +31,15 @@ def setup_echo_redirect_two_words(state: State) -> State:
     return state
 
 
-def check_echo_redirect_two_words(state: State, flag: str | None) -> bool:
-    ws = Path(state.workspace)
-    target = ws / ECHO_FILENAME
-
-    if not target.exists() or not target.is_file():
-        return False
+def expected_echo_redirect_two_words(state: State) -> ExpectedTree:
+    tree = ExpectedTree()
+    tree.file(ECHO_FILENAME, state.echo_words, ignore_leading=WHITESPACE, ignore_trailing=WHITESPACE)
+    return tree
 
-    try:
-        content = target.read_text().strip()
-    except Exception:
-        return False
 
+def check_echo_redirect_two_words(state: State, flag: str | None) -> bool:
     # Accept both flag-less and explicit-flag submission
-    if flag is None:
-        return content == state.echo_words
-    else:
-        return content == state.echo_words and flag == content
+    if flag is not None and flag != state.echo_words:
+        return False
+    return expected_echo_redirect_two_words(state).matches(Path(state.workspace))
 
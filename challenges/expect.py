@@ -0,0 +1,241 @@
+"""
+Declarative description of the tree a challenge expects after it is solved.
+
+The challenges where the student changes the workspace (mkdir, rmdir, cp,
+mv, echo > file...) declare the paths that must exist, with their kind and
+optionally their content (or its sha256) and mode, the paths that must not
+exist and the paths that must be left as the setup created them:
+
+    tree = ExpectedTree()
+    tree.dir("alpha/beta")
+    tree.absent("alpha/beta/gamma")
+    tree.unchanged("apple.txt", "This file is named apple.\\n")
+    tree.file("alice/apple.txt", "This file is named apple.\\n")
+    problems = tree.check(ws)
+
+check() lists every directory containing a declared path once, with
+os.scandir (nothing else of the workspace is visited), and reads the files
+whose content is checked in chunks: a content differing in size is not
+read at all, and a file is never read whole into memory. It returns the
+differences found, parents first, each one able to describe itself to the
+student; an empty list means that the tree is as expected.
+
+Paths are relative to the workspace. Like Path.is_file() and is_dir(),
+the kind of an entry is the kind of what a symbolic link points to, but a
+path declared absent must not even be a (dangling) link.
+"""
+
+import hashlib
+import os
+import string
+from pathlib import Path
+
+# Size of the reads of the files whose content is checked
+CHUNK_SIZE = 256 * 1024
+
+WHITESPACE = string.whitespace.encode()
+
+# What a Difference is about
+MISSING = "missing"
+PRESENT = "present"
+KIND = "kind"
+CONTENT = "content"
+MODE = "mode"
+UNREADABLE = "unreadable"
+
+
+class Rule:
+    __slots__ = ("kind", "content", "sha256", "mode", "lead", "trail", "unchanged")
+
+    def __init__(self, kind: str | None, content: bytes | None = None, sha256: str | None = None,
+                 mode: int | None = None, lead: bytes = b"", trail: bytes = b"", unchanged: bool = False):
+        self.kind = kind
+        self.content = content
+        self.sha256 = sha256
+        self.mode = mode
+        self.lead = lead
+        self.trail = trail
+        self.unchanged = unchanged
+
+
+class Difference:
+    __slots__ = ("path", "issue", "expected", "found")
+
+    def __init__(self, path: str, issue: str, expected=None, found=None):
+        self.path = path
+        self.issue = issue
+        self.expected = expected
+        self.found = found
+
+    def __repr__(self):
+        return f"Difference({self.path!r}, {self.issue!r}, {self.expected!r}, {self.found!r})"
+
+    def hint(self, rule: Rule | None = None) -> str:
+        """What is wrong, for the student."""
+        changed = rule is not None and rule.unchanged
+        if self.issue == MISSING:
+            if changed:
+                return f"{self.path} was removed, but it must stay where it is."
+            return f"{self.path} does not exist yet."
+        if self.issue == PRESENT:
+            return f"{self.path} must not exist."
+        if self.issue == KIND:
+            return f"{self.path} should be a {self.expected}, not a {self.found}."
+        if self.issue == CONTENT:
+            if changed:
+                return f"{self.path} was modified, but it must keep its content."
+            return f"{self.path} does not have the expected content."
+        if self.issue == MODE:
+            return f"{self.path} should have mode {self.expected:o}, not {self.found:o}."
+        return f"{self.path} cannot be read."
+
+
+def kind_of(entry: os.DirEntry) -> str:
+    if entry.is_dir():
+        return "directory"
+    if entry.is_file():
+        return "file"
+    return "special file" if os.path.exists(entry.path) else "broken link"
+
+
+def same_content(path: str, size: int, rule: Rule) -> bool:
+    """Whether the file path (size bytes long) has the content of rule, read in chunks."""
+    expected = rule.content
+    if not rule.lead and not rule.trail:
+        if size != len(expected):
+            return False
+    elif size < len(expected):
+        return False
+
+    fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        pos = 0
+        leading = bool(rule.lead)
+        while chunk := os.read(fd, CHUNK_SIZE):
+            if leading:
+                chunk = chunk.lstrip(rule.lead)
+                if not chunk:
+                    continue
+                leading = False
+            n = min(len(chunk), len(expected) - pos)
+            if chunk[:n] != expected[pos:pos + n]:
+                return False
+            pos += n
+            # anything after the expected content can only be ignored characters
+            if chunk[n:].strip(rule.trail) if rule.trail else chunk[n:]:
+                return False
+    finally:
+        os.close(fd)
+    return pos == len(expected)
+
+
+def is_under(path: str, dirs: set[str]) -> bool:
+    """Whether path is one of dirs or is inside one of them."""
+    while path:
+        if path in dirs:
+            return True
+        path = os.path.dirname(path)
+    return False
+
+
+def sha256_of(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class ExpectedTree:
+    def __init__(self):
+        # relative path -> Rule
+        self.rules: dict[str, Rule] = {}
+
+    def _add(self, path: str, rule: Rule):
+        self.rules[os.path.normpath(path)] = rule
+
+    def file(self, path: str, content: bytes | str | None = None, sha256: str | None = None,
+             mode: int | None = None, ignore_leading: bytes = b"", ignore_trailing: bytes = b""):
+        """
+        The file path must exist, with the given content (if any), whose
+        sha256 hex digest is sha256 (if given) and with mode (if given).
+        The characters of ignore_leading and ignore_trailing are ignored
+        at the start and at the end of the file when comparing content
+        (e.g. WHITESPACE, or b"\\n" for the newline echo adds).
+        """
+        if isinstance(content, str):
+            content = content.encode()
+        self._add(path, Rule("file", content, sha256, mode, ignore_leading, ignore_trailing))
+
+    def dir(self, path: str, mode: int | None = None):
+        """The directory path must exist (with mode, if given)."""
+        self._add(path, Rule("directory", mode=mode))
+
+    def absent(self, path: str):
+        """Nothing must exist at path."""
+        self._add(path, Rule(None))
+
+    def unchanged(self, path: str, content: bytes | str | None = None, mode: int | None = None):
+        """The file path created by the setup must still be there (with content, if given)."""
+        if isinstance(content, str):
+            content = content.encode()
+        self._add(path, Rule("file", content, mode=mode, unchanged=True))
+
+    def check(self, ws: Path) -> list[Difference]:
+        """Compare the tree of the workspace ws with the rules; return the differences."""
+        root = str(ws)
+        by_dir: dict[str, dict[str, str]] = {}
+        for path in self.rules:
+            parent, name = os.path.split(path)
+            by_dir.setdefault(parent, {})[name] = path
+
+        differences = []
+        # directories known not to be (listable) directories: their content is not looked at
+        gone = set()
+        for parent in sorted(by_dir, key=lambda p: (p.count(os.sep) if p else -1, p)):
+            names = by_dir[parent]
+            if is_under(parent, gone):
+                found = None
+            else:
+                try:
+                    with os.scandir(os.path.join(root, parent)) as it:
+                        found = {e.name: e for e in it if e.name in names}
+                except (FileNotFoundError, NotADirectoryError):
+                    found = None
+                except PermissionError:
+                    differences.append(Difference(parent, UNREADABLE))
+                    gone.add(parent)
+                    continue
+
+            for name, path in names.items():
+                entry = found.get(name) if found is not None else None
+                difference = self._compare(path, self.rules[path], entry)
+                if difference is not None:
+                    differences.append(difference)
+                if entry is None or not entry.is_dir():
+                    gone.add(path)
+        return differences
+
+    def _compare(self, path: str, rule: Rule, entry: os.DirEntry | None) -> Difference | None:
+        if rule.kind is None:
+            return Difference(path, PRESENT) if entry is not None else None
+        if entry is None:
+            return Difference(path, MISSING, rule.kind)
+        kind = kind_of(entry)
+        if kind != rule.kind:
+            return Difference(path, KIND, rule.kind, kind)
+        try:
+            st = entry.stat()
+            if rule.mode is not None and st.st_mode & 0o7777 != rule.mode:
+                return Difference(path, MODE, rule.mode, st.st_mode & 0o7777)
+            if rule.content is not None and not same_content(entry.path, st.st_size, rule):
+                return Difference(path, CONTENT)
+            if rule.sha256 is not None and sha256_of(entry.path) != rule.sha256:
+                return Difference(path, CONTENT)
+        except PermissionError:
+            return Difference(path, UNREADABLE)
+        return None
+
+    def matches(self, ws: Path) -> bool:
+        return not self.check(ws)
+
+    def hints(self, ws: Path) -> list[str]:
+        """What is still wrong in the workspace ws, for the student."""
+        return [d.hint(self.rules.get(d.path)) for d in self.check(ws)]
@@ -1,6 +1,7 @@
 from challenges.base import BaseChallenge
+from challenges.builder import WorkspaceSpec
+from challenges.textgen import TextGenerator
 import random
-import string
 from pathlib import Path
 from state import State
 from utils import hash_flag
@@ -19,10 +20,6 @@ VOCABULARY = [
     "watermelon", "passionfruit",
 ]
 
-def random_text(min_len=2, max_len=15) -> str:
-    length = random.randint(min_len, max_len)
-    return "".join(random.choices(string.ascii_lowercase, k=length))
-
 
 class GrepFlagAcrossFilesChallenge(BaseChallenge):
     id = "grep_flag_across_files"
@@ -45,39 +42,28 @@ class GrepFlagAcrossFilesChallenge(BaseChallenge):
 
         # Choose the flag word
         flag_word = random.choice(VOCABULARY)
-        flag_line = f"flag:{flag_word}"
+        flag_line = f"flag:{flag_word}\n".encode()
 
         # Choose which file will contain the real flag
         flag_file_index = random.randint(0, NUM_FILES - 1)
 
-        for i in range(NUM_FILES):
-            filename = ws / f"data_{i:03d}.txt"
-            lines: list[str] = []
+        # Random words, 30% of them decoys containing "flag" but not "flag:"
+        text = TextGenerator(decoy_rate=0.3)
 
+        spec = WorkspaceSpec()
+        for i in range(NUM_FILES):
             num_lines = random.randint(MIN_LINES_PER_FILE, MAX_LINES_PER_FILE)
 
-            # Decide position of flag line (only in one file)
-            flag_position = (
-                random.randint(0, num_lines - 1)
-                if i == flag_file_index
-                else None
-            )
-
-            for line_idx in range(num_lines):
-                if flag_position is not None and line_idx == flag_position:
-                    lines.append(flag_line)
-                    continue
-
-                # Decoy lines
-                if random.random() < 0.3:
-                    prefix = random_text(1, 5)
-                    suffix = random_text(1, 5)
-                    decoy = f"{prefix}flag{suffix}"
-                    lines.append(decoy[:15])
-                else:
-                    lines.append(random_text())
-
-            filename.write_text("\n".join(lines) + "\n")
+            if i == flag_file_index:
+                # The flag line replaces one of the lines of this file
+                flag_position = random.randint(0, num_lines - 1)
+                content = text.lines(flag_position) + flag_line + text.lines(num_lines - flag_position - 1)
+            else:
+                content = text.lines(num_lines)
+
+            spec.file(f"data_{i:03d}.txt", content)
+
+        spec.build(ws)
 
         # Persist state
         state.flag_hash = hash_flag(flag_word)
@@ -1,6 +1,6 @@
 from challenges.base import BaseChallenge
+from challenges.textgen import TextGenerator
 import random
-import string
 from pathlib import Path
 from state import State
 from utils import hash_flag
@@ -17,10 +17,6 @@ VOCABULARY = [
     "watermelon", "passionfruit",
 ]
 
-def random_text(min_len=2, max_len=15) -> str:
-    length = random.randint(min_len, max_len)
-    return "".join(random.choices(string.ascii_lowercase, k=length))
-
 
 class GrepFlagLineChallenge(BaseChallenge):
     id = "grep_flag_line"
@@ -46,29 +42,16 @@ class GrepFlagLineChallenge(BaseChallenge):
 
         # Choose the flag
         flag_word = random.choice(VOCABULARY)
-        flag_line = f"flag:{flag_word}"
-
-        lines: list[str] = []
+        flag_line = f"flag:{flag_word}\n".encode()
 
         # Insert the real flag line at a random position
         flag_position = random.randint(0, total_lines - 1)
 
-        for i in range(total_lines):
-            if i == flag_position:
-                lines.append(flag_line)
-                continue
-
-            # Generate decoy lines
-            if random.random() < 0.3:
-                # Line contains "flag" but NOT "flag:"
-                prefix = random_text(1, 5)
-                suffix = random_text(1, 5)
-                decoy = f"{prefix}flag{suffix}"
-                lines.append(decoy[:15])
-            else:
-                lines.append(random_text())
-
-        data_file.write_text("\n".join(lines) + "\n")
+        # Random words, 30% of them decoys containing "flag" but NOT "flag:"
+        text = TextGenerator(decoy_rate=0.3)
+        data_file.write_bytes(
+            text.lines(flag_position) + flag_line + text.lines(total_lines - flag_position - 1)
+        )
 
         # Persist state
         state.flag_hash = hash_flag(flag_word)
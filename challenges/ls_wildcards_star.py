@@ -1,6 +1,7 @@
 from challenges.base import BaseChallenge
+from challenges.builder import WorkspaceSpec
+from challenges.names import sample_names
 import random
-import string
 from pathlib import Path
 from state import State
 from utils import hash_flag
@@ -9,8 +10,7 @@ TOTAL_FILES = 300
 MIN_MATCHES = 0
 MAX_MATCHES = 10
 
-def random_name(length: int) -> str:
-    return "".join(random.choices(string.ascii_lowercase, k=length))
+NAME_LENGTH = (4, 8)
 
 class LSWildcardsChallenge(BaseChallenge):
     id = "ls_wildcards_star"
@@ -31,7 +31,8 @@ class LSWildcardsChallenge(BaseChallenge):
     def setup(self, state: State) -> State:
         ws = Path(state.workspace).resolve()
 
-        pattern = random_name(random.choice([2, 3]))
+        pattern_len = random.choice([2, 3])
+        pattern = sample_names(1, (pattern_len, pattern_len))[0]
         self.pattern = pattern
         state.ls_pattern = pattern
 
@@ -43,32 +44,15 @@ class LSWildcardsChallenge(BaseChallenge):
         # Decide number of matches
         match_count = random.randint(MIN_MATCHES, MAX_MATCHES)
 
-        filenames: set[str] = set()
-
-        def make_matching_name() -> str:
-            name_len = random.randint(4, 8)
-            pos = random.randint(0, name_len - len(pattern))
-            chars = list(random_name(name_len))
-            chars[pos:pos + len(pattern)] = pattern
-            return "".join(chars)
-
-        def make_non_matching_name() -> str:
-            while True:
-                name = random_name(random.randint(4, 8))
-                if pattern not in name:
-                    return name
-
-        # Generate matching files
-        while len([n for n in filenames if pattern in n]) < match_count:
-            filenames.add(make_matching_name())
-
-        # Generate non-matching files
-        while len(filenames) < TOTAL_FILES:
-            filenames.add(make_non_matching_name())
+        # Generate matching files, then the others
+        filenames = sample_names(match_count, NAME_LENGTH, contains=pattern)
+        filenames += sample_names(TOTAL_FILES - match_count, NAME_LENGTH, excludes=pattern, taken=filenames)
 
         # Create files
+        spec = WorkspaceSpec()
         for name in filenames:
-            (ws / f"{name}.txt").touch()
+            spec.file(f"{name}.txt")
+        spec.build(ws)
 
         # Persist correct answer
         state.flag_hash = hash_flag(str(match_count))
@@ -1,5 +1,6 @@
 from pathlib import Path
 import random
+from challenges.expect import ExpectedTree
 from state import State
 
 DIR_NAMES = [
@@ -34,17 +35,15 @@ def setup_mkdir_nested_directories(state: State) -> State:
     return state
 
 
-def check_mkdir_nested_directories(state: State, flag: str | None) -> bool:
-    ws = Path(state.workspace)
-
-    target = ws / state.dir1 / state.dir2 / state.dir3
+def expected_mkdir_nested_directories(state: State) -> ExpectedTree:
+    tree = ExpectedTree()
 
     # Final directory must exist
-    if not target.exists():
-        return False
+    tree.dir(f"{state.dir1}/{state.dir2}/{state.dir3}")
 
-    if not target.is_dir():
-        return False
+    return tree
 
-    return True
+
+def check_mkdir_nested_directories(state: State, flag: str | None) -> bool:
+    return expected_mkdir_nested_directories(state).matches(Path(state.workspace))
 
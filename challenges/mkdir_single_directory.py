@@ -1,5 +1,6 @@
 from pathlib import Path
 import random
+from challenges.expect import ExpectedTree
 from state import State
 
 DIR_NAMES = [
@@ -31,16 +32,15 @@ def setup_mkdir_single_directory(state: State) -> State:
     return state
 
 
-def check_mkdir_single_directory(state: State, flag: str | None) -> bool:
-    ws = Path(state.workspace)
-    target = ws / state.dir_name
+def expected_mkdir_single_directory(state: State) -> ExpectedTree:
+    tree = ExpectedTree()
 
     # Directory must exist and be exactly one level deep
-    if not target.exists():
-        return False
+    tree.dir(state.dir_name)
+
+    return tree
 
-    if not target.is_dir():
-        return False
 
-    return True
+def check_mkdir_single_directory(state: State, flag: str | None) -> bool:
+    return expected_mkdir_single_directory(state).matches(Path(state.workspace))
 
@@ -1,6 +1,7 @@
 from challenges.base import BaseChallenge
 import random
 from pathlib import Path
+from challenges.expect import ExpectedTree
 from state import State
 
 FRUITS = [
@@ -55,19 +56,17 @@ class MoveFileIntoDirectoryChallenge(BaseChallenge):
 
         return state
 
-    def evaluate(self, state: State, flag: str | None) -> bool:
-        ws = Path(state.workspace)
-
-        src = ws / state.mv_src
-        dst = ws / state.mv_dir / state.mv_src
+    def expected(self, state: State) -> ExpectedTree:
+        tree = ExpectedTree()
 
         # Source must NOT exist anymore
-        if src.exists():
-            return False
+        tree.absent(state.mv_src)
 
         # Destination must exist
-        if not dst.exists() or not dst.is_file():
-            return False
+        tree.file(f"{state.mv_dir}/{state.mv_src}")
 
-        return True
+        return tree
+
+    def evaluate(self, state: State, flag: str | None) -> bool:
+        return self.expected(state).matches(Path(state.workspace))
 
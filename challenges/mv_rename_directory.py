@@ -1,6 +1,7 @@
 from challenges.base import BaseChallenge
 import random
 from pathlib import Path
+from challenges.expect import ExpectedTree
 from state import State
 
 DIR_NAMES = [
@@ -44,20 +45,17 @@ class RenameDirectoryChallenge(BaseChallenge):
 
         return state
 
-    def evaluate(self, state: State, flag: str | None) -> bool:
-        ws = Path(state.workspace)
-
-        parent = ws / state.mv_parent_dir
-        old_dir = parent / state.mv_old_dir
-        new_dir = parent / state.mv_new_dir
+    def expected(self, state: State) -> ExpectedTree:
+        tree = ExpectedTree()
 
         # Old directory must not exist
-        if old_dir.exists():
-            return False
+        tree.absent(f"{state.mv_parent_dir}/{state.mv_old_dir}")
 
         # New directory must exist
-        if not new_dir.exists() or not new_dir.is_dir():
-            return False
+        tree.dir(f"{state.mv_parent_dir}/{state.mv_new_dir}")
 
-        return True
+        return tree
+
+    def evaluate(self, state: State, flag: str | None) -> bool:
+        return self.expected(state).matches(Path(state.workspace))
 
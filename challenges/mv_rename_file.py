@@ -1,6 +1,7 @@
 from challenges.base import BaseChallenge
 import random
 from pathlib import Path
+from challenges.expect import ExpectedTree
 from state import State
 
 FRUITS = [
@@ -42,19 +43,17 @@ class RenameFileChallenge(BaseChallenge):
 
         return state
 
-    def evaluate(self, state: State, flag: str | None) -> bool:
-        ws = Path(state.workspace)
-
-        old_file = ws / state.mv_old_name
-        new_file = ws / state.mv_new_name
+    def expected(self, state: State) -> ExpectedTree:
+        tree = ExpectedTree()
 
         # Old must not exist
-        if old_file.exists():
-            return False
+        tree.absent(state.mv_old_name)
 
         # New must exist
-        if not new_file.exists() or not new_file.is_file():
-            return False
+        tree.file(state.mv_new_name)
 
-        return True
+        return tree
+
+    def evaluate(self, state: State, flag: str | None) -> bool:
+        return self.expected(state).matches(Path(state.workspace))
 
@@ -0,0 +1,106 @@
+"""
+Names for the files and directories of the challenges.
+
+PLACES is a fixed pool of distinct names (countries and cities), to draw
+from with random.sample(). sample_names() generates any number of unique
+random names instead, with their length range and alphabet, and either
+containing or not containing a pattern: e.g. exactly 7 names containing
+"ab" and 293 that do not, for the wildcard challenges, or the 100k names
+of a large directory. It works in batches like textgen.py, takes linear
+time in the number of names, and gives up with a ValueError when the
+names asked for do not exist (or are too rare to be found by chance).
+"""
+
+import random
+import string
+
+from challenges.textgen import draw, sampler, span
+
+# Candidates generated per name asked for, at most, before giving up
+MAX_TRIES_PER_NAME = 20
+MIN_TRIES = 1000
+
+PLACES = [
+    # Countries
+    "afghanistan", "albania", "algeria", "andorra", "angola", "argentina", "armenia",
+    "australia", "austria", "azerbaijan", "bahamas", "bahrain", "bangladesh", "barbados", "belarus", "belgium",
+    "belize", "benin", "bhutan", "bolivia", "bosnia_and_herzegovina", "botswana", "brazil", "brunei", "bulgaria",
+    "burkina_faso", "burundi", "cabo_verde", "cambodia", "cameroon", "canada", "central_african_republic", "chad",
+    "chile", "china", "colombia", "comoros", "congo_brazzaville", "congo_kinshasa", "costa_rica", "croatia", "cuba",
+    "cyprus", "czech_republic", "denmark", "djibouti", "dominica", "ecuador", "egypt",
+    "el_salvador", "equatorial_guinea", "eritrea", "estonia", "eswatini", "ethiopia", "fiji", "finland", "france",
+    "gabon", "gambia", "georgia", "germany", "ghana", "greece", "grenada", "guatemala", "guinea", "guinea_bissau",
+    "guyana", "haiti", "honduras", "hungary", "iceland", "india", "indonesia", "iran", "iraq", "ireland", "israel",
+    "italy", "jamaica", "japan", "jordan", "kazakhstan", "kenya", "kiribati", "kosovo", "kuwait", "kyrgyzstan",
+    "laos", "latvia", "lebanon", "lesotho", "liberia", "libya", "liechtenstein", "lithuania", "luxembourg", "madagascar",
+    "malawi", "malaysia", "maldives", "mali", "malta", "marshall_islands", "mauritania", "mauritius", "mexico",
+    "micronesia", "moldova", "monaco", "mongolia", "montenegro", "morocco", "mozambique", "myanmar", "namibia",
+    "nauru", "nepal", "netherlands", "new_zealand", "nicaragua", "niger", "nigeria", "north_macedonia", "norway",
+    "oman", "pakistan", "palau", "palestine", "panama", "papua_new_guinea", "paraguay", "peru", "philippines",
+    "poland", "portugal", "qatar", "romania", "russia", "rwanda", "saint_lucia",
+    "samoa", "san_marino", "saudi_arabia", "senegal",
+    "serbia", "seychelles", "sierra_leone", "singapore", "slovakia", "slovenia", "solomon_islands", "somalia",
+    "south_africa", "south_korea", "south_sudan", "spain", "sri_lanka", "sudan", "suriname", "sweden", "switzerland",
+    "syria", "taiwan", "tajikistan", "tanzania", "thailand", "timor_leste", "togo", "tonga", "trinidad_and_tobago",
+    "tunisia", "turkey", "turkmenistan", "tuvalu", "uganda", "ukraine", "united_arab_emirates", "united_kingdom",
+    "united_states", "uruguay", "uzbekistan", "vanuatu", "vatican_city", "venezuela", "vietnam", "yemen", "zambia",
+    "zimbabwe",
+    # Cities
+    "new_york", "los_angeles", "chicago", "houston", "phoenix", "philadelphia", "san_antonio", "san_diego",
+    "dallas", "san_jose", "london", "paris", "berlin", "madrid", "rome", "buenos_aires", "sao_paulo", "rio_de_janeiro",
+    "toronto", "vancouver", "sydney", "melbourne", "brisbane", "tokyo", "osaka", "kyoto", "beijing", "shanghai",
+    "hong_kong", "bangkok", "jakarta", "delhi", "mumbai", "kolkata", "karachi", "islamabad", "cairo",
+    "nairobi", "cape_town", "durban", "lagos", "accra", "addis_ababa", "tehran", "baghdad", "riyadh", "doha",
+    "abu_dhabi", "dubai", "moscow", "saint_petersburg", "kiev", "warsaw", "prague", "budapest", "vienna", "athens",
+    "lisbon", "oslo", "stockholm", "helsinki", "copenhagen", "reykjavik", "brussels", "amsterdam", "zurich",
+    "geneva", "luxembourg_city", "valletta", "vilnius", "riga", "tallinn", "sarajevo", "belgrade", "podgorica",
+    "skopje", "zagreb", "ljubljana", "bratislava", "bern", "san_salvador", "guatemala_city"
+]
+
+
+def count_names(length: tuple[int, int], alphabet: str) -> int:
+    lo, hi = length
+    return sum(len(alphabet) ** n for n in range(lo, hi + 1))
+
+
+def sample_names(n: int, length: tuple[int, int] = (4, 8), alphabet: str = string.ascii_lowercase,
+                 contains: str | None = None, excludes: str | None = None,
+                 taken=(), rng=random) -> list[str]:
+    """
+    Return n distinct random names, none of them in taken. Each name is
+    made of length[0]..length[1] characters of alphabet; if contains is
+    given it is put at a random position of every name, and names
+    containing excludes are discarded.
+    """
+    lo, hi = length
+    if contains:
+        lo = max(lo, len(contains))
+        if lo > hi:
+            raise ValueError(f"{contains!r} does not fit in {hi} characters")
+    if n > count_names((lo, hi), alphabet) - len(taken):
+        raise ValueError(f"there are fewer than {n} names of {lo}..{hi} characters")
+
+    lengths = sampler(span(lo, hi))
+    letters = sampler(alphabet.encode())
+    taken = set(taken)
+    names: list[str] = []
+    tries = max(MIN_TRIES, MAX_TRIES_PER_NAME * n)
+    while len(names) < n:
+        if tries <= 0:
+            raise ValueError(f"could not find {n} names matching the constraints")
+        batch = min(tries, n - len(names))
+        tries -= batch
+        sizes = draw(rng, lengths, batch)
+        text = draw(rng, letters, sum(sizes)).decode()
+        pos = 0
+        for size in sizes:
+            name = text[pos:pos + size]
+            pos += size
+            if contains:
+                at = rng.randrange(size - len(contains) + 1)
+                name = name[:at] + contains + name[at + len(contains):]
+            if excludes and excludes in name or name in taken:
+                continue
+            taken.add(name)
+            names.append(name)
+    return names
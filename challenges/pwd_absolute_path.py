@@ -14,6 +14,8 @@ class PWDAbsolutePathChallenge(BaseChallenge):
     id = "pwd_absolute_path"
     title = "Print the working directory"
     requires_flag = True
+    # the flag is the absolute path of the workspace: never served from the setup cache
+    relocatable = False
 
     description = [
         "Two directories have been created, one inside the other.",
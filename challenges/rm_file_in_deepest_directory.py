@@ -1,6 +1,7 @@
 from pathlib import Path
 import random
 import string
+from challenges.expect import ExpectedTree
 from state import State
 
 DIR_NAMES = [
@@ -49,25 +50,21 @@ def setup_rm_file_in_deepest_directory(state: State) -> State:
     return state
 
 
-def check_rm_file_in_deepest_directory(state: State, flag: str | None) -> bool:
-    ws = Path(state.workspace)
+def expected_rm_file_in_deepest_directory(state: State) -> ExpectedTree:
+    tree = ExpectedTree()
+    deepest = f"{state.dir1}/{state.dir2}/{state.dir3}"
 
-    d1 = ws / state.dir1
-    d2 = d1 / state.dir2
-    d3 = d2 / state.dir3
-    file_path = d3 / state.filename
+    # All directories must still exist
+    tree.dir(state.dir1)
+    tree.dir(f"{state.dir1}/{state.dir2}")
+    tree.dir(deepest)
 
     # File must be removed
-    if file_path.exists():
-        return False
+    tree.absent(f"{deepest}/{state.filename}")
 
-    # All directories must still exist
-    if not d3.is_dir():
-        return False
-    if not d2.is_dir():
-        return False
-    if not d1.is_dir():
-        return False
-
-    return True
+    return tree
+
+
+def check_rm_file_in_deepest_directory(state: State, flag: str | None) -> bool:
+    return expected_rm_file_in_deepest_directory(state).matches(Path(state.workspace))
 
@@ -1,5 +1,6 @@
 from pathlib import Path
 import random
+from challenges.expect import ExpectedTree
 from state import State
 
 DIR_NAMES = [
@@ -41,23 +42,19 @@ def setup_rmdir_deepest_directory(state: State) -> State:
     return state
 
 
-def check_rmdir_deepest_directory(state: State, flag: str | None) -> bool:
-    ws = Path(state.workspace)
+def expected_rmdir_deepest_directory(state: State) -> ExpectedTree:
+    tree = ExpectedTree()
 
-    d1 = ws / state.dir1
-    d2 = d1 / state.dir2
-    d3 = d2 / state.dir3
+    # Parent directories must still exist
+    tree.dir(state.dir1)
+    tree.dir(f"{state.dir1}/{state.dir2}")
 
     # Deepest directory must be removed
-    if d3.exists():
-        return False
+    tree.absent(f"{state.dir1}/{state.dir2}/{state.dir3}")
 
-    # Parent directories must still exist
-    if not d2.exists() or not d2.is_dir():
-        return False
+    return tree
 
-    if not d1.exists() or not d1.is_dir():
-        return False
 
-    return True
+def check_rmdir_deepest_directory(state: State, flag: str | None) -> bool:
+    return expected_rmdir_deepest_directory(state).matches(Path(state.workspace))
 
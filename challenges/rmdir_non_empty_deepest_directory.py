@@ -1,6 +1,7 @@
 from pathlib import Path
 import random
 import string
+from challenges.expect import ExpectedTree
 from state import State
 
 DIR_NAMES = [
@@ -50,28 +51,19 @@ def setup_rmdir_non_empty_deepest_directory(state: State) -> State:
     return state
 
 
-def check_rmdir_non_empty_deepest_directory(state: State, flag: str | None) -> bool:
-    ws = Path(state.workspace)
-
-    d1 = ws / state.dir1
-    d2 = d1 / state.dir2
-    d3 = d2 / state.dir3
-    file_path = d3 / state.filename
+def expected_rmdir_non_empty_deepest_directory(state: State) -> ExpectedTree:
+    tree = ExpectedTree()
 
-    # File must be removed
-    if file_path.exists():
-        return False
+    # Parent directories must still exist
+    tree.dir(state.dir1)
+    tree.dir(f"{state.dir1}/{state.dir2}")
 
-    # Deepest directory must be removed
-    if d3.exists():
-        return False
+    # Deepest directory (and so its file) must be removed
+    tree.absent(f"{state.dir1}/{state.dir2}/{state.dir3}")
 
-    # Parent directories must still exist
-    if not d2.exists() or not d2.is_dir():
-        return False
+    return tree
 
-    if not d1.exists() or not d1.is_dir():
-        return False
 
-    return True
+def check_rmdir_non_empty_deepest_directory(state: State, flag: str | None) -> bool:
+    return expected_rmdir_non_empty_deepest_directory(state).matches(Path(state.workspace))
 
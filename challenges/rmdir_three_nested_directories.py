@@ -1,5 +1,6 @@
 from pathlib import Path
 import random
+from challenges.expect import ExpectedTree
 from state import State
 
 DIR_NAMES = [
@@ -40,12 +41,14 @@ def setup_rmdir_three_nested_directories(state: State) -> State:
     return state
 
 
-def check_rmdir_three_nested_directories(state: State, flag: str | None) -> bool:
-    ws = Path(state.workspace)
+def expected_rmdir_three_nested_directories(state: State) -> ExpectedTree:
+    tree = ExpectedTree()
+
+    # None of the directories must exist (the others were inside the first one)
+    tree.absent(state.dir1)
 
-    d1 = ws / state.dir1
-    d2 = d1 / state.dir2
-    d3 = d2 / state.dir3
+    return tree
 
-    # None of the directories must exist
-    return not d1.exists() and not d2.exists() and not d3.exists()
+
+def check_rmdir_three_nested_directories(state: State, flag: str | None) -> bool:
+    return expected_rmdir_three_nested_directories(state).matches(Path(state.workspace))
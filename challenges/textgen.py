@@ -0,0 +1,122 @@
+"""
+Bulk generation of random lines of text, for the grep challenges.
+
+A line is either a word of random lowercase letters, or a decoy: a short
+word containing the decoy marker (e.g. "abflagxyz", which grep for "flag"
+finds but grep for "flag:" does not). The random choices are not made one
+character or one line at a time: each batch of lines draws its random
+bytes at once (random.randbytes) and maps them to letters, lengths and
+decoy choices with bytes.translate, rejecting the byte values that would
+make the distributions uneven. Lengths and letters are therefore exactly
+uniform, and the decoy rate is exact as long as it is a fraction with a
+denominator of at most 256 (e.g. 0.3).
+
+Everything is drawn from the given random generator (the random module
+by default), so the text only depends on its seed. For files written
+while the workspace is built, stream() draws from a generator of its own,
+seeded when stream() is called, so that the text does not depend on the
+order the files are written in.
+
+    gen = TextGenerator()
+    spec.file("data.txt", gen.lines(10_000))
+    spec.stream_file("huge.txt", gen.stream(50_000_000))
+"""
+
+import random
+import string
+from fractions import Fraction
+
+# Lines generated per batch by stream()
+STREAM_LINES = 64 * 1024
+
+LETTERS = string.ascii_lowercase.encode()
+
+
+def sampler(values: bytes) -> tuple[bytes, bytes]:
+    """
+    Return the (table, delete) arguments of bytes.translate() that map
+    uniform random bytes to uniform choices among values.
+    """
+    if not 0 < len(values) <= 256:
+        raise ValueError("between 1 and 256 values are needed")
+    limit = 256 - 256 % len(values)
+    table = bytes(values[b % len(values)] if b < limit else 0 for b in range(256))
+    return table, bytes(range(limit, 256))
+
+
+def draw(rng, sampler_args: tuple[bytes, bytes], n: int) -> bytes:
+    """n choices of the sampler, from the random bytes of rng."""
+    out = bytearray()
+    while len(out) < n:
+        left = n - len(out)
+        # a few more than needed, as some bytes are rejected
+        out += rng.randbytes(left + left // 8 + 16).translate(*sampler_args)
+    del out[n:]
+    return bytes(out)
+
+
+def span(lo: int, hi: int) -> bytes:
+    if not 0 <= lo <= hi <= 255:
+        raise ValueError(f"invalid length range {lo}..{hi}")
+    return bytes(range(lo, hi + 1))
+
+
+class TextGenerator:
+    def __init__(self, rng=random, min_len: int = 2, max_len: int = 15, decoy_rate: float = 0.3,
+                 decoy_part: tuple[int, int] = (1, 5), decoy_word: bytes = b"flag"):
+        """
+        Lines are min_len..max_len letters long; a fraction decoy_rate of
+        them are decoys instead: decoy_part letters, decoy_word, then
+        decoy_part letters again.
+        """
+        rate = Fraction(str(decoy_rate))
+        if not 0 <= rate <= 1 or rate.denominator > 256:
+            raise ValueError(f"decoy rate {decoy_rate} is not a fraction n/d with d <= 256")
+        self.rng = rng
+        self.decoy_word = decoy_word
+        self.letters = sampler(LETTERS)
+        self.lengths = sampler(span(min_len, max_len))
+        self.parts = sampler(span(*decoy_part))
+        self.decoys = sampler(bytes(int(i < rate.numerator) for i in range(rate.denominator)))
+        self.settings = (min_len, max_len, decoy_rate, decoy_part, decoy_word)
+
+    def lines(self, count: int) -> bytes:
+        """count random lines, each one ending with a newline."""
+        rng = self.rng
+        decoys = draw(rng, self.decoys, count)
+        lengths = draw(rng, self.lengths, count)
+        prefixes = draw(rng, self.parts, count)
+        suffixes = draw(rng, self.parts, count)
+        letters = draw(rng, self.letters, sum(
+            p + s if decoy else n for decoy, n, p, s in zip(decoys, lengths, prefixes, suffixes)
+        ))
+
+        out = []
+        pos = 0
+        word = self.decoy_word
+        for decoy, n, p, s in zip(decoys, lengths, prefixes, suffixes):
+            if decoy:
+                out.append(letters[pos:pos + p] + word + letters[pos + p:pos + p + s])
+                pos += p + s
+            else:
+                out.append(letters[pos:pos + n])
+                pos += n
+        out.append(b"")
+        return b"\n".join(out)
+
+    def fork(self) -> "TextGenerator":
+        """A generator with the same settings and its own random generator, seeded from this one."""
+        return TextGenerator(random.Random(self.rng.getrandbits(64)), *self.settings)
+
+    def stream(self, count: int, batch: int = STREAM_LINES):
+        """Return an iterable of the bytes of count random lines, generated in batches when iterated."""
+        gen = self.fork()
+
+        def batches():
+            left = count
+            while left > 0:
+                n = min(batch, left)
+                yield gen.lines(n)
+                left -= n
+
+        return batches()
@@ -1,4 +1,5 @@
 from challenges.base import BaseChallenge
+from challenges.textgen import TextGenerator
 import random
 import string
 from pathlib import Path
@@ -29,11 +30,10 @@ class WordCountChallenge(BaseChallenge):
 
         # Random number of words
         num_words = random.randint(NUM_WORDS_MIN, NUM_WORDS_MAX)
-        words = ["".join(random.choices(string.ascii_lowercase, k=random.randint(3, 10)))
-                 for _ in range(num_words)]
-        content = " ".join(words)
+        words = TextGenerator(min_len=3, max_len=10, decoy_rate=0).lines(num_words)
+        content = words[:-1].replace(b"\n", b" ")
 
-        file_path.write_text(content)
+        file_path.write_bytes(content)
 
         state.wc_file_name = fname
         state.wc_word_count = num_words
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Thin bashquest client.
+
+Forwards the command line to the resident daemon (see daemon.py) and
+prints its answer. When no daemon is listening, the command runs
+in-process exactly as with bashquest.py.
+
+This module is imported on every command: keep its imports minimal.
+"""
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+# Commands never forwarded to the daemon
+LOCAL_COMMANDS = ("daemon", "report", "grade", "provision", "watch")
+
+
+def socket_path() -> Path:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "bashquest.sock"
+    return Path.home() / ".config" / "bashquest" / "daemon.sock"
+
+
+def connect(timeout: float | None = None) -> socket.socket:
+    """Connect to the daemon; raise OSError if none is listening."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(socket_path()))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def exchange(sock: socket.socket, request: dict) -> dict:
+    with sock:
+        sock.sendall(json.dumps(request).encode())
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while chunk := sock.recv(65536):
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks))
+
+
+def command_name(argv: list[str]) -> str | None:
+    """Return the subcommand in argv, skipping the global options."""
+    args = iter(argv)
+    for arg in args:
+        if arg == "--seed":
+            next(args, None)
+        elif not arg.startswith("-"):
+            return arg
+    return None
+
+
+def main():
+    argv = sys.argv[1:]
+
+    if command_name(argv) not in (None, *LOCAL_COMMANDS):
+        try:
+            sock = connect()
+        except OSError:
+            sock = None
+        if sock is not None:
+            # once the request is sent, never fall back: the daemon may
+            # have already executed it
+            try:
+                reply = exchange(sock, {"argv": argv, "cwd": os.getcwd()})
+            except (OSError, ValueError) as e:
+                print(f"Error: lost connection to the bashquest daemon ({e}).")
+                sys.exit(1)
+            sys.stdout.write(reply["stdout"])
+            sys.stderr.write(reply["stderr"])
+            sys.exit(reply["code"])
+
+    from bashquest import main as bashquest_main
+    bashquest_main(argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Encryption of the state files.
+
+Two formats are supported:
+
+- "aead" (default): raw binary, MAGIC + 12-byte nonce + ChaCha20-Poly1305
+  ciphertext and tag, with the key derived from SECRET_KEY by HKDF-SHA256.
+  One authenticated encryption pass and no encoding overhead.
+- "fernet": the base64 Fernet tokens (AES-CBC + HMAC) written by earlier
+  versions, with SECRET_KEY zero-padded to 32 bytes.
+
+Data is always written in the configured format (STATE_CODEC in the env
+file) and read in whatever format it was written in.
+"""
+
+import base64
+import os
+
+MAGIC = b"BQ\x00\x01"
+NONCE_SIZE = 12
+# Every Fernet token starts with the base64 encoding of its version byte 0x80
+FERNET_PREFIX = b"gAAAAA"
+
+HKDF_SALT = b"bashquest-state"
+HKDF_INFO = b"bashquest state codec v1"
+
+CODECS = ("aead", "fernet")
+
+
+class FernetCodec:
+    name = "fernet"
+
+    def __init__(self, secret_key: bytes):
+        from cryptography.fernet import Fernet
+
+        # SECRET_KEY must be 32 bytes for Fernet
+        key = secret_key.ljust(32, b'\0')[:32]
+        self.fernet = Fernet(base64.urlsafe_b64encode(key))
+
+    def encode(self, data: bytes) -> bytes:
+        return self.fernet.encrypt(data)
+
+    def decode(self, blob: bytes) -> bytes:
+        return self.fernet.decrypt(blob)
+
+
+class AeadCodec:
+    name = "aead"
+
+    def __init__(self, secret_key: bytes):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+        key = HKDF(algorithm=hashes.SHA256(), length=32, salt=HKDF_SALT, info=HKDF_INFO).derive(secret_key)
+        self.aead = ChaCha20Poly1305(key)
+
+    def encode(self, data: bytes) -> bytes:
+        nonce = os.urandom(NONCE_SIZE)
+        return MAGIC + nonce + self.aead.encrypt(nonce, data, MAGIC)
+
+    def decode(self, blob: bytes) -> bytes:
+        nonce = blob[len(MAGIC):len(MAGIC) + NONCE_SIZE]
+        return self.aead.decrypt(nonce, blob[len(MAGIC) + NONCE_SIZE:], MAGIC)
+
+
+class StateCodec:
+    """Writes with the configured codec, reads any supported format."""
+
+    def __init__(self, secret_key: bytes, name: str = "aead"):
+        if name not in CODECS:
+            raise ValueError(f"unknown state codec: {name}")
+        self.secret_key = secret_key
+        self.name = name
+        self._codecs = {}
+        # derive the key of the write codec right away
+        self.codec(name)
+
+    def codec(self, name: str):
+        if name not in self._codecs:
+            cls = AeadCodec if name == "aead" else FernetCodec
+            self._codecs[name] = cls(self.secret_key)
+        return self._codecs[name]
+
+    def encode(self, data: bytes) -> bytes:
+        return self.codec(self.name).encode(data)
+
+    def decode(self, blob: bytes) -> bytes:
+        if blob.startswith(MAGIC):
+            return self.codec("aead").decode(blob)
+        if blob.startswith(FERNET_PREFIX):
+            return self.codec("fernet").decode(blob.strip())
+        raise ValueError("unknown state format")
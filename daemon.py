@@ -0,0 +1,184 @@
+"""
+Resident bashquest server.
+
+The daemon keeps the secret key, the challenge objects (with their modules
+already imported) and the decrypted states in memory, and executes the
+commands forwarded by client.py over a per-user Unix socket. Commands are
+served one at a time, so they never interleave.
+
+Changes to the env file or to the challenges are picked up after a
+restart (`bashquest daemon stop`, then `bashquest daemon start`).
+"""
+
+import contextlib
+import io
+import json
+import os
+import socket
+import struct
+import sys
+import time
+import traceback
+
+import bashquest
+from client import connect, exchange, socket_path
+from utils import defer_detached, run_detached
+
+# The daemon exits after this many seconds without requests.
+IDLE_TIMEOUT = 30 * 60
+# Seconds a client has to send its request once connected.
+REQUEST_TIMEOUT = 10
+
+
+def peer_is_owner(conn: socket.socket) -> bool:
+    if not hasattr(socket, "SO_PEERCRED"):
+        # no peer credentials (e.g. MacOS): the socket permissions apply
+        return True
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid == os.getuid()
+
+
+def read_request(conn: socket.socket) -> dict:
+    chunks = []
+    while chunk := conn.recv(65536):
+        chunks.append(chunk)
+    return json.loads(b"".join(chunks))
+
+
+def handle_request(request: dict, secret_key, challenges) -> dict:
+    """Run one forwarded command line, capturing its output."""
+    out, err = io.StringIO(), io.StringIO()
+    code = 0
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            os.chdir(request["cwd"])
+            args = bashquest.init_argparser().parse_args(request["argv"])
+            if args.command == "daemon":
+                print("The daemon cannot be managed through itself.")
+                code = 1
+            else:
+                bashquest.run_command(args, secret_key, challenges)
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                code = e.code
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except Exception:
+            traceback.print_exc()
+            code = 1
+    return {"stdout": out.getvalue(), "stderr": err.getvalue(), "code": code}
+
+
+def ping() -> dict | None:
+    try:
+        sock = connect(timeout=REQUEST_TIMEOUT)
+    except OSError:
+        return None
+    try:
+        return exchange(sock, {"control": "ping"})
+    except (OSError, ValueError):
+        return None
+
+
+def serve():
+    path = socket_path()
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if ping() is not None:
+        print("The bashquest daemon is already running.")
+        return
+    path.unlink(missing_ok=True)
+
+    # warm everything up before accepting commands
+    secret_key = bashquest.load_secret_key()
+    challenges = bashquest.load_challenges()
+    for ch in challenges:
+        ch.load()
+    bashquest.get_codec(secret_key)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        sock.bind(str(path))
+    finally:
+        os.umask(old_umask)
+    sock.listen(64)
+    sock.settimeout(IDLE_TIMEOUT)
+
+    try:
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except TimeoutError:
+                break
+            detached = []
+            with conn:
+                conn.settimeout(REQUEST_TIMEOUT)
+                if not peer_is_owner(conn):
+                    continue
+                try:
+                    request = read_request(conn)
+                except (OSError, ValueError):
+                    continue
+                control = request.get("control")
+                if control == "ping":
+                    reply = {"pid": os.getpid()}
+                elif control == "stop":
+                    reply = {"pid": os.getpid()}
+                else:
+                    conn.settimeout(None)
+                    # the background work of the command (see
+                    # set_challenge) starts once the client has its reply
+                    with defer_detached() as detached:
+                        reply = handle_request(request, secret_key, challenges)
+                try:
+                    conn.sendall(json.dumps(reply).encode())
+                    conn.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+            for func, args in detached:
+                run_detached(func, *args)
+            if control == "stop":
+                break
+    finally:
+        sock.close()
+        path.unlink(missing_ok=True)
+
+
+def start_in_background():
+    if ping() is not None:
+        print("The bashquest daemon is already running.")
+        return
+
+    run_detached(serve)
+
+    # wait until the socket accepts commands
+    for _ in range(50):
+        reply = ping()
+        if reply is not None:
+            print(f"bashquest daemon started (pid {reply['pid']}).")
+            return
+        time.sleep(0.1)
+    print("The bashquest daemon did not start.")
+
+
+def exec_daemon_command(args):
+    if args.action == "run":
+        serve()
+    elif args.action == "start":
+        start_in_background()
+    elif args.action == "status":
+        reply = ping()
+        if reply is None:
+            print("The bashquest daemon is not running.")
+        else:
+            print(f"The bashquest daemon is running (pid {reply['pid']}, socket {socket_path()}).")
+    elif args.action == "stop":
+        try:
+            sock = connect(timeout=REQUEST_TIMEOUT)
+            exchange(sock, {"control": "stop"})
+        except (OSError, ValueError):
+            print("The bashquest daemon is not running.")
+            return
+        print("bashquest daemon stopped.")
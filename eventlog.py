@@ -0,0 +1,141 @@
+"""
+Structured, non-blocking event log.
+
+Events are written as JSON lines ({"ts": ..., "level": ..., "pid": ...,
+"event": ..., plus the fields of the event}). The logging call only puts
+the record in a queue: formatting and writing happen in the thread of a
+QueueListener, which is flushed when the process exits.
+
+The log file is rotated when it would grow beyond max_bytes, or when its
+first event is older than max_age seconds. Several bashquest processes
+may write the same log at once: every write, and the rotation, happens
+under an flock on a separate lock file, and a process that finds the
+log file replaced by a rotation reopens it.
+"""
+
+import atexit
+import fcntl
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from datetime import datetime
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "pid": record.process,
+            "event": record.getMessage(),
+        }
+        event.update(getattr(record, "fields", {}))
+        return json.dumps(event, default=str)
+
+
+class EventQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # formatted by the listener thread, not by the caller
+        return record
+
+
+class SharedRotatingFileHandler(logging.Handler):
+    """Size- and time-based rotation that is safe across processes."""
+
+    def __init__(self, filename, max_bytes: int, max_age: float, backup_count: int):
+        super().__init__()
+        self.filename = str(filename)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backup_count = backup_count
+        self.lock_fd = os.open(self.filename + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        self.fd = None
+        # time of the first event in the open log file (read lazily)
+        self.started = None
+
+    def open(self):
+        if self.fd is not None:
+            os.close(self.fd)
+        self.fd = os.open(self.filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        self.started = None
+
+    def current(self) -> os.stat_result:
+        """Reopen the log file if it was rotated by someone else; return its stat."""
+        try:
+            st = os.stat(self.filename)
+        except FileNotFoundError:
+            st = None
+        if self.fd is None or st is None or os.fstat(self.fd).st_ino != st.st_ino:
+            self.open()
+            st = os.fstat(self.fd)
+        return st
+
+    def first_event_time(self) -> float:
+        if self.started is None:
+            with open(self.filename, "rb") as f:
+                line = f.readline()
+            try:
+                self.started = datetime.fromisoformat(json.loads(line)["ts"]).timestamp()
+            except (ValueError, KeyError, TypeError):
+                # not an event (e.g. a log of earlier versions): rotate it out
+                self.started = 0.0
+        return self.started
+
+    def should_rotate(self, st: os.stat_result, size: int) -> bool:
+        if st.st_size == 0:
+            return False
+        if self.max_bytes and st.st_size + size > self.max_bytes:
+            return True
+        return bool(self.max_age) and time.time() - self.first_event_time() >= self.max_age
+
+    def rotate(self):
+        for i in range(self.backup_count - 1, 0, -1):
+            try:
+                os.rename(f"{self.filename}.{i}", f"{self.filename}.{i + 1}")
+            except FileNotFoundError:
+                pass
+        if self.backup_count > 0:
+            os.rename(self.filename, f"{self.filename}.1")
+        else:
+            os.unlink(self.filename)
+        self.open()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            data = (self.format(record) + "\n").encode()
+            fcntl.flock(self.lock_fd, fcntl.LOCK_EX)
+            try:
+                if self.should_rotate(self.current(), len(data)):
+                    self.rotate()
+                os.write(self.fd, data)
+            finally:
+                fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        for fd in (self.fd, self.lock_fd):
+            if fd is not None:
+                os.close(fd)
+        self.fd = self.lock_fd = None
+        super().close()
+
+
+def start_listener(handler: logging.Handler) -> logging.Handler:
+    """
+    Serve handler from a background thread; return the handler to attach
+    to the loggers.
+    """
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, handler)
+    listener.start()
+
+    def stop():
+        listener.stop()
+        handler.close()
+
+    atexit.register(stop)
+    return EventQueueHandler(records)
@@ -0,0 +1,141 @@
+"""
+Grading of all the workspaces under a directory tree.
+
+`bashquest grade <root>` finds every workspace under root (as `report`
+does, or from the database with the sqlite backend) and evaluates the
+current challenge of each one as `submit` without a flag would, in a pool
+of worker processes. Nothing is changed in the workspaces: the states are
+not updated and no challenge is set up. Each worker imports a challenge
+module the first time one of its workspaces needs it, and keeps it.
+
+The result of a workspace is one of:
+
+- correct / wrong: the current challenge is a put-the-flag one, and the
+  workspace is (or is not) as expected; for the challenges declaring their
+  expected tree, details says what is still wrong;
+- needs_flag: the current challenge requires a flag, which only the student
+  can submit;
+- finished: all the challenges were passed;
+- timeout / error: the evaluation took longer than --timeout seconds, or
+  failed (e.g. the state cannot be read).
+
+The challenges passed before are listed, not evaluated again: the data
+their setup left in the state is gone, and so are their files. One row
+per workspace is printed as soon as it is available, in the order of the
+workspaces.
+"""
+
+import os
+import signal
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+import bashquest
+from report import find_workspaces, map_in_pool, write_rows
+
+FIELDS = ("workspace", "challenge", "id", "result", "passed", "details", "duration_ms", "error")
+
+# Per worker process, set by init_worker()
+_backend = None
+_challenges = None
+
+
+class GradeTimeout(BaseException):
+    """Raised by the alarm; not an Exception, so that a check cannot catch it."""
+
+
+def on_alarm(signum, frame):
+    raise GradeTimeout
+
+
+def init_worker(secret_key: bytes):
+    global _backend, _challenges
+    # never the backend of the parent: a database connection must not be
+    # used across a fork
+    bashquest.get_backend.cache_clear()
+    _backend = bashquest.get_backend(secret_key)
+    _challenges = bashquest.load_challenges()
+    signal.signal(signal.SIGALRM, on_alarm)
+
+
+def evaluate(ws: Path, result: dict):
+    """Fill result with the outcome of the current challenge of ws."""
+    state = _backend.load(ws)
+    if state is None:
+        raise ValueError("the state cannot be read")
+    result["passed"] = sorted(state.passed_challenges)
+    if state.challenge_index >= len(_challenges):
+        result["result"] = "finished"
+        return
+
+    ch = _challenges[state.challenge_index]
+    result["challenge"] = state.challenge_index + 1
+    result["id"] = ch.id
+    if getattr(ch, "requires_flag", True):
+        result["result"] = "needs_flag"
+        return
+    if ch.evaluate(state, None):
+        result["result"] = "correct"
+        return
+    result["result"] = "wrong"
+    expected = getattr(ch, "expected", None)
+    if expected is not None:
+        result["details"] = expected(state).hints(Path(state.workspace))
+
+
+def grade(ws: Path, timeout: float) -> dict:
+    """Grade the workspace ws; return its row."""
+    started = time.perf_counter()
+    result = dict.fromkeys(FIELDS)
+    result["workspace"] = str(ws)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        try:
+            evaluate(ws, result)
+        finally:
+            # before the handlers below, which the alarm must not interrupt
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    except GradeTimeout:
+        result["result"] = "timeout"
+        result["error"] = f"not graded within {timeout:g} s"
+    except Exception as e:
+        result["result"] = "error"
+        result["error"] = str(e) or type(e).__name__
+    result["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+def workspaces_of(root: Path, secret_key: bytes):
+    """The workspaces under root; from the database, read whole and closed before the workers start."""
+    if bashquest.load_env().get("STATE_BACKEND") == "sqlite":
+        backend = bashquest.get_backend(secret_key)
+        try:
+            return [Path(ws) for _, ws, _, _, _ in backend.progress() if Path(ws).is_relative_to(root)]
+        finally:
+            backend.close()
+            bashquest.get_backend.cache_clear()
+    return find_workspaces(root)
+
+
+def exec_grade_command(args):
+    root = Path(args.root).expanduser().resolve()
+    if not root.is_dir():
+        print(f"{root} is not a directory.")
+        sys.exit(1)
+    if args.timeout <= 0:
+        print("The timeout must be positive.")
+        sys.exit(1)
+
+    secret_key = bashquest.load_secret_key()
+    # a broken challenge list exits here, not in every worker
+    bashquest.load_challenges()
+
+    started = time.perf_counter()
+    results = map_in_pool(partial(grade, timeout=args.timeout), workspaces_of(root, secret_key),
+                          args.jobs or os.cpu_count() or 1, init_worker, (secret_key,))
+    total, failed = write_rows(results, FIELDS, args.format, "grade", separators={"details": "; "})
+    print(f"Graded {total - failed} of {total} workspaces in {time.perf_counter() - started:.1f} s.", file=sys.stderr)
+    if failed:
+        sys.exit(1)
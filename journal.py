@@ -0,0 +1,87 @@
+"""
+Append-only journal of state changes.
+
+The state of a workspace is stored as an encrypted snapshot (state.bin)
+plus a journal (state.journal) with the changes made after the snapshot.
+Each journal record is one blob of the state codec (authenticated and
+encrypted), preceded by its length as a 4-byte big-endian integer, with
+the fields of State.to_dict() set or deleted by one save. Every record
+carries the id of the snapshot it applies to, so records left over by an
+interrupted compaction are ignored on replay.
+"""
+
+import json
+import os
+import secrets
+import struct
+from pathlib import Path
+
+LENGTH = struct.Struct(">I")
+
+
+def new_journal_id() -> str:
+    return secrets.token_hex(8)
+
+
+def diff_fields(old: dict, new: dict) -> dict:
+    """Return the record turning the fields old into new."""
+    changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+    removed = [k for k in old if k not in new]
+    return {"set": changed, "del": removed}
+
+
+def is_empty(record: dict) -> bool:
+    return not record["set"] and not record["del"]
+
+
+def apply_record(data: dict, record: dict):
+    data.update(record["set"])
+    for key in record["del"]:
+        data.pop(key, None)
+
+
+def append_record(journal_file: Path, codec, journal_id: str, record: dict, fsync: bool = False):
+    blob = codec.encode(json.dumps({"journal": journal_id, **record}).encode())
+    fd = os.open(journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        # a single write, so that concurrent appends do not interleave
+        os.write(fd, LENGTH.pack(len(blob)) + blob)
+        if fsync:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def split_records(content: bytes) -> tuple[list[bytes], bool]:
+    """Return the record blobs in content, and whether the last one is torn."""
+    blobs = []
+    pos = 0
+    while pos + LENGTH.size <= len(content):
+        (size,) = LENGTH.unpack_from(content, pos)
+        if pos + LENGTH.size + size > len(content):
+            break
+        pos += LENGTH.size
+        blobs.append(content[pos:pos + size])
+        pos += size
+    # an incomplete tail is a torn append: it is not part of the blobs
+    return blobs, pos < len(content)
+
+
+def read_records(journal_file: Path, codec, journal_id: str) -> tuple[list[dict], int, bool]:
+    """
+    Return the records of journal_file that belong to journal_id, the total
+    number of records in the journal, and whether new records can be
+    appended to it (False if it has a torn tail: the next save must then
+    write a new snapshot).
+    """
+    try:
+        content = journal_file.read_bytes()
+    except FileNotFoundError:
+        return [], 0, True
+    blobs, torn = split_records(content)
+    records = []
+    for blob in blobs:
+        record = json.loads(codec.decode(blob))
+        if record["journal"] == journal_id:
+            records.append(record)
+    return records, len(blobs), not torn
@@ -0,0 +1,237 @@
+import hashlib
+import importlib
+import json
+import os
+from pathlib import Path
+
+from challenges.base import BaseChallenge
+
+# Bump when the layout of the manifest changes: older files are rebuilt.
+MANIFEST_VERSION = 2
+
+ROOT_DIR = Path(__file__).resolve().parent
+CHALLENGES_DIR = ROOT_DIR / "challenges"
+
+# Modules the setups of the challenges depend on, besides their own: a
+# change in any of them changes the source_hash of every challenge (the
+# setup cache, the prepared setups and the recorded trees use it)
+HELPER_MODULES = (
+    "challenges/base.py",
+    "challenges/builder.py",
+    "challenges/expect.py",
+    "challenges/names.py",
+    "challenges/textgen.py",
+    "state.py",
+    "utils.py",
+)
+
+# ===================== CHALLENGE BUILDING =====================
+
+class SymbolChallenge:
+    def __init__(self, cid, title, description, setup, evaluate):
+        self.id = cid
+        self.title = title
+        self.description = description
+        self.setup = setup
+        self.evaluate = evaluate
+
+
+def build_from_symbols(mod, cid):
+    title = getattr(mod, f"title_{cid}")
+    description = getattr(mod, f"description_{cid}")
+    setup = getattr(mod, f"setup_{cid}")
+    evaluate = getattr(mod, f"check_{cid}")
+
+    ch = SymbolChallenge(cid, title, description, setup, evaluate)
+    ch.requires_flag = getattr(mod, f"requires_flag_{cid}", True)
+    ch.relocatable = getattr(mod, f"relocatable_{cid}", True)
+    ch.expected = getattr(mod, f"expected_{cid}", None)
+    return ch
+
+
+def instantiate(name: str):
+    """
+    Import challenges.<name> and return the challenge object it defines,
+    either an instance of its BaseChallenge subclass or a SymbolChallenge.
+    """
+    mod = importlib.import_module(f"challenges.{name}")
+
+    cls = next(
+        (c for c in mod.__dict__.values()
+         if isinstance(c, type)
+         and issubclass(c, BaseChallenge)
+         and c is not BaseChallenge),
+        None
+    )
+
+    if cls:
+        return cls()
+    return build_from_symbols(mod, name)
+
+
+class LazyChallenge:
+    """
+    Challenge built from a manifest entry.
+
+    Metadata (id, title, description, requires_flag) is served from the
+    manifest; the module is imported the first time anything else is needed.
+    """
+
+    def __init__(self, entry: dict):
+        self.id = entry["id"]
+        self.name = entry["name"]
+        self.title = entry["title"]
+        self.description = entry["description"]
+        self.requires_flag = entry["requires_flag"]
+        self.source_hash = entry["source_hash"]
+        self._impl = None
+
+    def load(self):
+        if self._impl is None:
+            self._impl = instantiate(self.name)
+        return self._impl
+
+    def setup(self, state):
+        return self.load().setup(state)
+
+    def evaluate(self, state, flag):
+        return self.load().evaluate(state, flag)
+
+    def __getattr__(self, attr):
+        # only called for attributes not set in __init__
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        return getattr(self.load(), attr)
+
+
+# ===================== MANIFEST =====================
+
+def sha256_file(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def helper_stamps() -> list:
+    """[path, mtime_ns, size] of the helper modules (None for a missing one)."""
+    stamps = []
+    for rel in HELPER_MODULES:
+        try:
+            st = (ROOT_DIR / rel).stat()
+            stamps.append([rel, st.st_mtime_ns, st.st_size])
+        except OSError:
+            stamps.append([rel, None, None])
+    return stamps
+
+
+def helpers_hash() -> str:
+    h = hashlib.sha256()
+    for rel in HELPER_MODULES:
+        path = ROOT_DIR / rel
+        h.update(f"{rel}:{sha256_file(path) if path.exists() else None}\n".encode())
+    return h.hexdigest()
+
+
+def build_entry(name: str, helpers: str) -> dict:
+    """The manifest entry of challenge module name, whose helper modules hash to helpers."""
+    path = CHALLENGES_DIR / f"{name}.py"
+    st = path.stat()
+    ch = instantiate(name)
+    module_hash = sha256_file(path)
+    return {
+        "name": name,
+        "id": ch.id,
+        "module": f"challenges.{name}",
+        "title": ch.title,
+        "description": list(ch.description),
+        "requires_flag": bool(getattr(ch, "requires_flag", True)),
+        "path": str(path),
+        "module_hash": module_hash,
+        "source_hash": hashlib.sha256(f"{module_hash}:{helpers}".encode()).hexdigest(),
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+    }
+
+
+def entry_is_fresh(entry: dict) -> bool:
+    """
+    Check an entry against its module source: a matching stat is trusted,
+    otherwise the source is hashed (and the stat refreshed if unchanged).
+    """
+    path = CHALLENGES_DIR / f"{entry['name']}.py"
+    try:
+        st = path.stat()
+    except OSError:
+        return False
+    if entry.get("path") != str(path):
+        return False
+    if st.st_mtime_ns == entry["mtime_ns"] and st.st_size == entry["size"]:
+        return True
+    if sha256_file(path) != entry["module_hash"]:
+        return False
+    entry["mtime_ns"] = st.st_mtime_ns
+    entry["size"] = st.st_size
+    return True
+
+
+def read_manifest(manifest_file: Path) -> dict | None:
+    try:
+        data = json.loads(manifest_file.read_text())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return None
+    return data
+
+
+def write_manifest(manifest_file: Path, data: dict):
+    # the manifest is only a cache: failing to write it is not an error
+    tmp = manifest_file.with_name(f".{manifest_file.name}.{os.getpid()}")
+    try:
+        manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(data, indent=1))
+        os.replace(tmp, manifest_file)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+
+
+def load_manifest(list_file: Path, manifest_file: Path) -> list[dict]:
+    """
+    Return the manifest entries for the challenges listed in list_file,
+    in order. Entries whose module changed (or the whole manifest, if the
+    challenge list changed) are rebuilt and the manifest file is updated.
+    """
+    list_text = list_file.read_text()
+    list_hash = hashlib.sha256(list_text.encode()).hexdigest()
+
+    data = read_manifest(manifest_file)
+    stamps = helper_stamps()
+    # as for the modules: matching stats are trusted, otherwise the
+    # helpers are hashed (and a change rebuilds every entry)
+    if (data is not None and data["list_hash"] == list_hash
+            and (stamps == data["helpers"]["stamps"] or helpers_hash() == data["helpers"]["hash"])):
+        entries = data["challenges"]
+        changed = stamps != data["helpers"]["stamps"]
+        data["helpers"]["stamps"] = stamps
+        for i, entry in enumerate(entries):
+            stamp = (entry["mtime_ns"], entry["size"])
+            if not entry_is_fresh(entry):
+                entries[i] = build_entry(entry["name"], data["helpers"]["hash"])
+                changed = True
+            elif stamp != (entry["mtime_ns"], entry["size"]):
+                changed = True
+        if changed:
+            write_manifest(manifest_file, data)
+        return entries
+
+    # data = tomllib.loads(list_text)
+    # challenge_ids = data["challenges"]
+    challenge_ids = json.loads(list_text)
+    helpers = {"stamps": stamps, "hash": helpers_hash()}
+    entries = [build_entry(cid, helpers["hash"]) for cid in challenge_ids]
+    write_manifest(manifest_file, {
+        "version": MANIFEST_VERSION,
+        "list_file": str(list_file),
+        "list_hash": list_hash,
+        "helpers": helpers,
+        "challenges": entries,
+    })
+    return entries
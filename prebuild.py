@@ -0,0 +1,186 @@
+"""
+Speculative setup of the next challenge.
+
+Once a challenge is set, a detached process sets up the following one in
+a staging directory, so that a correct submit only has to rename the
+prepared entries into the workspace. Only the challenge right after the
+current one is prepared, with a fresh random seed; a submit or goto to
+any other challenge, or with an explicit --seed, sets up as usual and the
+prepared one is thrown away.
+
+The staging directory of a workspace is in ~/.config/bashquest/staging,
+outside the workspace (so that find, grep -r etc. run in it never see
+it), and has no read permission: the prepared tree is in a subdirectory
+with a random name, which is only written in the encrypted "ready" file,
+together with the state fields set by the setup. This only keeps the
+tree out of casual view: the staging directory belongs to the student,
+who can chmod it and look at the next challenge (its files, and around
+the permissions it sets) before reaching it. Set PREBUILD_NEXT to 0
+where that matters.
+
+A lock file serializes the processes preparing a workspace; a submit
+never waits for it, it simply sets up the challenge as usual if the
+preparation is not done.
+
+Challenges that are not relocatable (see setupcache.py) are never
+prepared, nor are workspaces on another filesystem than the staging
+directory, where entries cannot be renamed.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import random
+import secrets
+import stat
+from pathlib import Path
+
+from journal import apply_record, diff_fields
+from state import State
+from utils import remove_tree, reset_workspace
+
+LOCK_FILE = "lock"
+READY_FILE = "ready"
+# Owner can create and enter, not list (unless they chmod it)
+STAGING_MODE = 0o300
+
+
+def move_entries(src: Path, dst: Path):
+    """Rename every entry of src into dst."""
+    for name in os.listdir(src):
+        try:
+            os.rename(src / name, dst / name)
+        except PermissionError:
+            # a directory without write permission (its ".." changes)
+            mode = stat.S_IMODE(os.lstat(src / name).st_mode)
+            os.chmod(src / name, mode | stat.S_IWUSR)
+            os.rename(src / name, dst / name)
+            os.chmod(dst / name, mode)
+
+
+class Prebuilder:
+    def __init__(self, staging_root: Path, codec):
+        self.staging_root = staging_root
+        self.codec = codec
+
+    def staging(self, ws: Path) -> Path:
+        return self.staging_root / hashlib.sha256(str(ws).encode()).hexdigest()[:16]
+
+    def clear(self, staging: Path):
+        """Remove everything but the lock file from the staging directory."""
+        staging.chmod(0o700)
+        try:
+            for entry in os.scandir(staging):
+                if entry.name != LOCK_FILE:
+                    remove_tree(Path(entry.path))
+        finally:
+            staging.chmod(STAGING_MODE)
+
+    def build(self, ws: Path, ch, idx: int):
+        """Set up challenge ch (at index idx) in the staging directory of ws."""
+        if not getattr(ch, "relocatable", True) or getattr(ch, "source_hash", None) is None:
+            return
+        self.staging_root.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if os.stat(self.staging_root).st_dev != os.stat(ws).st_dev:
+            return
+        staging = self.staging(ws)
+        try:
+            staging.mkdir(mode=STAGING_MODE)
+        except FileExistsError:
+            pass
+
+        fd = os.open(staging / LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            self.clear(staging)
+
+            token = secrets.token_urlsafe(16)
+            (staging / token).mkdir(mode=0o700)
+            tree = staging / token / "tree"
+            tree.mkdir()
+            tree = tree.resolve()
+
+            # not the generator of the parent process; recorded for resets
+            seed = secrets.randbits(63)
+            random.seed(seed)
+            state = State()
+            state.workspace = str(tree)
+            state.challenge_index = idx
+            before = state.to_dict()
+            state = ch.setup(state)
+            record = diff_fields(before, state.to_dict())
+            for name, value in record["set"].items():
+                if name != "workspace" and isinstance(value, str) and str(tree) in value:
+                    # depends on the location of the workspace
+                    remove_tree(staging / token)
+                    return
+
+            ready = {
+                "token": token,
+                "index": idx,
+                "id": ch.id,
+                "source_hash": ch.source_hash,
+                "seed": seed,
+                "record": record,
+            }
+            tmp = staging / token / READY_FILE
+            with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as f:
+                f.write(self.codec.encode(json.dumps(ready).encode()))
+            os.rename(tmp, staging / READY_FILE)
+        finally:
+            os.close(fd)
+
+    def take(self, ws: Path, ch, idx: int, state: State) -> tuple[State, int] | None:
+        """
+        Move the prepared challenge ch (at index idx) into ws and return
+        state updated by its setup, with the seed of the setup; return None
+        if it is not prepared. Whatever was prepared is consumed.
+        """
+        staging = self.staging(ws)
+        try:
+            fd = os.open(staging / LOCK_FILE, os.O_RDWR)
+        except FileNotFoundError:
+            return None
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # still preparing
+                return None
+            try:
+                ready = json.loads(self.codec.decode((staging / READY_FILE).read_bytes()))
+                (staging / READY_FILE).unlink()
+            except (OSError, ValueError):
+                return None
+
+            prepared = staging / ready["token"]
+            try:
+                if (ready["index"], ready["id"], ready["source_hash"]) != (idx, ch.id, getattr(ch, "source_hash", None)):
+                    return None
+                try:
+                    move_entries(prepared / "tree", ws)
+                except OSError:
+                    reset_workspace(ws)
+                    return None
+            finally:
+                remove_tree(prepared)
+        finally:
+            os.close(fd)
+
+        record = ready["record"]
+        if "workspace" in record["set"]:
+            # set by the setup to its resolved path
+            record["set"]["workspace"] = str(ws)
+        data = state.to_dict()
+        apply_record(data, record)
+        return State.from_dict(data), ready["seed"]
+
+    def discard(self, ws: Path):
+        """Remove the staging directory of ws."""
+        staging = self.staging(ws)
+        try:
+            staging.chmod(0o700)
+        except FileNotFoundError:
+            return
+        remove_tree(staging)
@@ -0,0 +1,200 @@
+"""
+Creation of the workspaces of a whole class at once.
+
+`bashquest provision <roster>` reads a CSV roster with the columns user,
+workspace and (optionally) seed, and creates every workspace with its
+first challenge in a pool of worker processes, like `bashquest start`
+run by each student:
+
+- the workspace and its first challenge are set up with the seed of the
+  row, or --seed-base plus the row number if the row has none, or a
+  random seed (printed, so that the setup can be reproduced);
+- the workspace is created and set up with the identity of the user (so
+  its parent must be writable by the user), and becomes the active
+  workspace of the user (~/.config/bashquest/active_workspace);
+- with the sqlite backend, the state is stored under the user.
+
+Workspace paths going through a symbolic link are refused.
+
+Rows whose workspace already has a state, or is a directory that is not
+empty, are not touched: the roster can be provisioned again after fixing
+the rows that failed. One row per workspace is printed as soon as it is
+ready, with the time it took and the error if any.
+
+Workspaces of the user running the provisioning with the same challenge
+and seed are served from the setup cache (see setupcache.py) after the
+first one; the cache is not readable as the other users. The next challenge is not
+prepared in advance (see prebuild.py): its staging directory would belong
+to the user running the provisioning.
+"""
+
+import csv
+import os
+import random
+import secrets
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import bashquest
+from report import map_in_pool, write_rows
+from state import State
+
+COLUMNS = ("user", "workspace", "seed")
+FIELDS = ("user", "workspace", "seed", "challenge", "duration_ms", "error")
+
+# Per worker process, set by init_worker()
+_secret_key = None
+_challenges = None
+
+
+def read_roster(path: Path, seed_base: int | None) -> list[dict]:
+    """Return the rows of the roster, each one with its seed; exit on invalid rosters."""
+    with path.open(newline="") as f:
+        reader = csv.DictReader(f)
+        missing = [c for c in COLUMNS[:2] if c not in (reader.fieldnames or ())]
+        if missing:
+            print(f"{path}: missing column(s): {', '.join(missing)}.")
+            sys.exit(1)
+        rows = []
+        for n, row in enumerate(reader):
+            seed = (row.get("seed") or "").strip()
+            if seed:
+                try:
+                    seed = int(seed)
+                except ValueError:
+                    print(f"{path}, line {reader.line_num}: invalid seed {seed!r}.")
+                    sys.exit(1)
+            elif seed_base is not None:
+                seed = seed_base + n
+            else:
+                seed = secrets.randbits(63)
+            workspace = Path(row["workspace"].strip()).expanduser()
+            rows.append({"user": row["user"].strip(), "workspace": os.path.abspath(workspace), "seed": seed})
+
+    seen = set()
+    for row in rows:
+        if row["workspace"] in seen:
+            print(f"{path}: workspace {row['workspace']} appears more than once.")
+            sys.exit(1)
+        seen.add(row["workspace"])
+    return rows
+
+
+@contextmanager
+def as_user(pw):
+    """Run the block with the identity of the user pw (effective ids), if it is another user."""
+    uid, gid = os.geteuid(), os.getegid()
+    if pw.pw_uid == uid:
+        yield
+        return
+    groups = os.getgroups()
+    os.setgroups(os.getgrouplist(pw.pw_name, pw.pw_gid))
+    os.setegid(pw.pw_gid)
+    os.seteuid(pw.pw_uid)
+    try:
+        yield
+    finally:
+        os.seteuid(uid)
+        os.setegid(gid)
+        os.setgroups(groups)
+
+
+def set_user_active_workspace(home: Path, ws: Path):
+    """Write the active workspace of the user whose home is home."""
+    config = home / bashquest.CONFIG_DIR.relative_to(Path.home())
+    config.mkdir(mode=0o700, parents=True, exist_ok=True)
+    (config / bashquest.ACTIVE_WORKSPACE_FILE.name).write_text(str(ws))
+
+
+def init_worker(secret_key: bytes):
+    global _secret_key, _challenges
+    _secret_key = secret_key
+    _challenges = bashquest.load_challenges()
+    # imported now: the sources may not be readable with the identity of
+    # the users (see as_user)
+    import restore  # noqa: F401
+    if _challenges:
+        _challenges[0].load()
+
+
+def provision(row: dict) -> dict:
+    """Create the workspace of a row of the roster; return the row with its outcome."""
+    import pwd
+
+    started = time.perf_counter()
+    result = dict(row, challenge=None, duration_ms=None, error=None)
+    try:
+        if not _challenges:
+            raise ValueError("there are no challenges")
+        try:
+            pw = pwd.getpwnam(row["user"])
+        except KeyError:
+            raise ValueError(f"no such user: {row['user']}") from None
+        other_user = pw.pw_uid != os.geteuid()
+        if other_user and os.geteuid() != 0:
+            raise PermissionError("only root can provision the workspaces of other users")
+
+        ws = Path(row["workspace"])
+        if ws.resolve() != ws:
+            raise ValueError(f"{ws} goes through a symbolic link")
+        # opened with the identity of the provisioning user (e.g. the database)
+        backend = bashquest.get_backend(_secret_key)
+        # everything in the workspace and in the home of the user is done as
+        # the user: with root privileges, the user could have anything of
+        # root written or chowned through a symbolic link (or a directory
+        # renamed meanwhile)
+        with as_user(pw):
+            if backend.load(ws) is not None:
+                raise FileExistsError(f"{ws} is already a workspace")
+            if ws.is_dir() and any(ws.iterdir()):
+                raise FileExistsError(f"{ws} is not empty")
+            (ws / ".bashquest").mkdir(parents=True, exist_ok=True)
+
+            ch = _challenges[0]
+            result["challenge"] = ch.id
+            state = State()
+            state.workspace = str(ws)
+            random.seed(row["seed"])
+            # the cache of another user cannot be read as the user
+            cache = bashquest.get_setup_cache(_secret_key) if not other_user else None
+            if cache is not None:
+                state = cache.setup(ch, state, ws, row["seed"])
+            else:
+                state = ch.setup(state)
+
+            bashquest.record_setup(ws, ch, 0, row["seed"], _secret_key)
+            backend.save(state, user=row["user"])
+            set_user_active_workspace(Path(pw.pw_dir), ws)
+    except Exception as e:
+        result["error"] = str(e) or type(e).__name__
+    result["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+def logged(results):
+    for result in results:
+        bashquest.log_event("workspace_provisioned", user=result["user"], workspace=result["workspace"],
+                            seed=result["seed"], challenge=result["challenge"],
+                            outcome="error" if result["error"] else "ok", duration_ms=result["duration_ms"])
+        yield result
+
+
+def exec_provision_command(args):
+    roster = Path(args.roster).expanduser()
+    if not roster.is_file():
+        print(f"{roster} is not a file.")
+        sys.exit(1)
+    rows = read_roster(roster, args.seed_base)
+
+    secret_key = bashquest.load_secret_key()
+    bashquest.load_challenges()
+
+    started = time.perf_counter()
+    results = map_in_pool(provision, rows, args.jobs or os.cpu_count() or 1, init_worker, (secret_key,))
+    total, failed = write_rows(logged(results), FIELDS, args.format, "provision")
+    print(f"Provisioned {total - failed} of {total} workspaces in {time.perf_counter() - started:.1f} s.",
+          file=sys.stderr)
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,170 @@
+"""
+Progress report of all the workspaces under a directory tree.
+
+`bashquest report <root>` finds every workspace (a directory with a
+.bashquest/state.bin) under root, decrypts the states in a pool of worker
+processes and prints one row per workspace, as CSV or JSON lines, as soon
+as it is available: the memory used does not grow with the number of
+workspaces.
+
+With the sqlite backend the states are not read from the workspaces: the
+rows come from the database.
+"""
+
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import bashquest
+from storage import FileBackend, StateError, workspace_journal_file, workspace_state_file
+
+FIELDS = ("workspace", "challenge", "passed", "modified")
+
+# Per worker process, set by init_worker()
+_backend = None
+
+
+def find_workspaces(root: Path):
+    """
+    Yield the workspaces under root. The content of a workspace is not
+    scanned, nor are symbolic links followed.
+    """
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        try:
+            if workspace_state_file(path).is_file():
+                yield path
+                continue
+            with os.scandir(path) as it:
+                subdirs = [Path(e.path) for e in it if e.is_dir(follow_symlinks=False)]
+        except OSError:
+            continue
+        # in reverse, so that workspaces come out in the order of the listing
+        stack.extend(reversed(sorted(subdirs)))
+
+
+def modified_time(ws: Path) -> float:
+    mtime = 0.0
+    for f in (workspace_state_file(ws), workspace_journal_file(ws)):
+        try:
+            mtime = max(mtime, f.stat().st_mtime)
+        except FileNotFoundError:
+            pass
+    return mtime
+
+
+def init_worker(secret_key: bytes):
+    global _backend
+    _backend = FileBackend(bashquest.get_codec(secret_key), 0)
+
+
+def read_workspace(ws: Path) -> dict:
+    try:
+        state = _backend.load(ws)
+    except StateError:
+        state = None
+    if state is None:
+        return {"workspace": str(ws), "error": "the state cannot be read"}
+    return make_row(ws, state.challenge_index, sorted(state.passed_challenges), modified_time(ws))
+
+
+def make_row(ws, challenge_index: int, passed: list[str], mtime: float) -> dict:
+    return {
+        "workspace": str(ws),
+        # 1-based, as in 'list' and 'goto'
+        "challenge": challenge_index + 1,
+        "passed": passed,
+        "modified": datetime.fromtimestamp(mtime).isoformat(timespec="seconds"),
+    }
+
+
+def read_database(root: Path, secret_key: bytes):
+    for _, ws, idx, passed, updated_at in bashquest.get_backend(secret_key).progress():
+        if Path(ws).is_relative_to(root):
+            yield make_row(ws, idx, passed, updated_at)
+
+
+# ===================== POOL AND OUTPUT =====================
+# Shared with grade.py and provision.py
+
+def map_in_pool(func, items, jobs: int, initializer, initargs=()):
+    """
+    Yield func(item) for every item, in the order of the items, computed
+    in a pool of jobs worker processes. At most a few results per worker
+    are pending at any time: the memory used does not grow with the number
+    of items.
+    """
+    window = 4 * jobs
+    with ProcessPoolExecutor(jobs, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def csv_cell(value, separator: str):
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return separator.join(value)
+    return value
+
+
+def write_rows(rows, fields, fmt: str, action: str, separators=None, keep_failed=True) -> tuple[int, int]:
+    """
+    Print the rows as they come, as CSV with the columns fields or as JSON
+    lines; in CSV, lists are joined with the separator of their field in
+    separators (a space by default). A row with an error is reported on
+    stderr ("Cannot <action> <workspace>: <error>"), and printed too if
+    keep_failed. Return the number of rows and of failed ones; exit if the
+    reader goes away (e.g. the output is piped into head).
+    """
+    separators = separators or {}
+    total = failed = 0
+    try:
+        if fmt == "csv":
+            writer = csv.writer(sys.stdout)
+            writer.writerow(fields)
+        for row in rows:
+            total += 1
+            if row.get("error") is not None:
+                print(f"Cannot {action} {row['workspace']}: {row['error']}", file=sys.stderr)
+                failed += 1
+                if not keep_failed:
+                    continue
+            if fmt == "csv":
+                writer.writerow([csv_cell(row.get(f), separators.get(f, " ")) for f in fields])
+            else:
+                print(json.dumps(row))
+            sys.stdout.flush()
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    return total, failed
+
+
+def exec_report_command(args):
+    root = Path(args.root).expanduser().resolve()
+    if not root.is_dir():
+        print(f"{root} is not a directory.")
+        sys.exit(1)
+
+    secret_key = bashquest.load_secret_key()
+    if bashquest.load_env().get("STATE_BACKEND") == "sqlite":
+        rows = read_database(root, secret_key)
+    else:
+        rows = map_in_pool(read_workspace, find_workspaces(root), args.jobs or os.cpu_count() or 1,
+                           init_worker, (secret_key,))
+
+    _, failed = write_rows(rows, FIELDS, args.format, "report", keep_failed=False)
+    if failed:
+        sys.exit(1)
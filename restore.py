@@ -0,0 +1,245 @@
+"""
+Incremental reset of the workspace of the current challenge.
+
+Once a challenge is set up, the tree it created is recorded in
+.bashquest/tree.bin, encrypted with the state codec like the state: the
+path, kind, mode, size and content hash (target, for links) of every
+entry, with the challenge and the random seed of the setup. .bashquest
+itself is never part of the tree.
+
+A reset compares the live tree with the record and only:
+
+- removes the entries the student added;
+- restores the entries removed or modified, from a setup of the challenge
+  with the same seed in a scratch directory (run only if something has to
+  be restored);
+- restores the modes that were changed.
+
+A file whose inode and ctime still match the record has not been written
+to (nor chmod-ed) and is not read. The entries of the scratch setup are
+checked against the record before they are moved into the workspace: if
+the tree of the challenge cannot be reproduced from its seed,
+RestoreError is raised and nothing is restored.
+"""
+
+import hashlib
+import json
+import os
+import stat
+import tempfile
+from pathlib import Path
+
+from setupcache import walk
+from utils import remove_tree
+
+TREE_VERSION = 1
+TREE_FILE = Path(".bashquest") / "tree.bin"
+
+
+class RestoreError(Exception):
+    pass
+
+
+def file_digest(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def kind_of(st: os.stat_result) -> str:
+    if stat.S_ISDIR(st.st_mode):
+        return "dir"
+    if stat.S_ISLNK(st.st_mode):
+        return "link"
+    if stat.S_ISREG(st.st_mode):
+        return "file"
+    return "other"
+
+
+def describe(path: Path, st: os.stat_result) -> list:
+    """[kind, mode, size, digest or link target, inode, ctime] of the entry path."""
+    kind = kind_of(st)
+    data = None
+    if kind == "link":
+        data = os.readlink(path)
+    elif kind == "file":
+        data = file_digest(path)
+    elif kind == "other":
+        raise RestoreError(f"cannot record {path}: not a file, directory or link")
+    return [kind, stat.S_IMODE(st.st_mode), st.st_size if kind == "file" else 0, data,
+            st.st_ino, st.st_ctime_ns]
+
+
+def record_tree(root: Path) -> dict[str, list]:
+    """Describe the entries under root, parents first."""
+    entries = {}
+    changed = []
+    unreadable = []
+    try:
+        for rel, st in walk(root, changed):
+            path = root / rel
+            if stat.S_ISREG(st.st_mode) and not os.access(path, os.R_OK):
+                unreadable.append((path, stat.S_IMODE(st.st_mode)))
+                path.chmod(stat.S_IMODE(st.st_mode) | stat.S_IRUSR)
+            entries[str(rel)] = describe(path, st)
+    finally:
+        for path, mode in reversed(changed + unreadable):
+            path.chmod(mode)
+    # the modes just restored changed the ctimes
+    for path, _ in changed + unreadable:
+        entry = entries.get(str(path.relative_to(root)))
+        if entry is not None:
+            st = os.lstat(path)
+            entry[4:] = [st.st_ino, st.st_ctime_ns]
+    return entries
+
+
+# ===================== RECORD FILE =====================
+
+def save_tree(ws: Path, codec, record: dict):
+    tmp = ws / TREE_FILE.with_name(f".{TREE_FILE.name}.tmp")
+    tmp.write_bytes(codec.encode(json.dumps({"version": TREE_VERSION, **record}).encode()))
+    os.rename(tmp, ws / TREE_FILE)
+
+
+def load_tree(ws: Path, codec) -> dict | None:
+    try:
+        record = json.loads(codec.decode((ws / TREE_FILE).read_bytes()))
+    except (OSError, ValueError):
+        return None
+    if record.get("version") != TREE_VERSION:
+        return None
+    return record
+
+
+def forget_tree(ws: Path):
+    (ws / TREE_FILE).unlink(missing_ok=True)
+
+
+# ===================== RESET =====================
+
+def is_intact(path: Path, st: os.stat_result, entry: list) -> bool:
+    """Whether the live entry path (of the kind of entry) still has its recorded content."""
+    kind, _, size, data, ino, ctime = entry
+    if kind == "dir":
+        return True
+    if kind == "link":
+        return os.readlink(path) == data
+    if st.st_size != size:
+        return False
+    if (st.st_ino, st.st_ctime_ns) == (ino, ctime):
+        return True
+    # an unreadable file is restored rather than made readable to be checked
+    if not os.access(path, os.R_OK) or file_digest(path) != data:
+        return False
+    # same content: not read again by the next reset
+    entry[4:] = [st.st_ino, st.st_ctime_ns]
+    return True
+
+
+def diff_tree(ws: Path, entries: dict, changed: list) -> tuple[list, list, list]:
+    """
+    Compare the live tree of ws with the recorded entries; return the
+    entries to remove, to restore (parents first) and to chmod. The
+    directories made readable to be compared are appended to changed.
+    """
+    extra = []
+    modes = []
+    intact = set()
+    removed = set()
+    for rel, st in walk(ws, changed):
+        name = str(rel)
+        if str(rel.parent) in removed:
+            # removed with its parent
+            removed.add(name)
+            continue
+        entry = entries.get(name)
+        if entry is None or entry[0] != kind_of(st):
+            extra.append(name)
+            removed.add(name)
+        elif is_intact(ws / rel, st, entry):
+            intact.add(name)
+            if entry[0] != "link" and stat.S_IMODE(st.st_mode) != entry[1]:
+                modes.append(name)
+    missing = [name for name in entries if name not in intact]
+    return extra, missing, modes
+
+
+def check_source(source: Path, names: list[str], entries: dict):
+    """Check that the entries names of the scratch setup source are as recorded."""
+    for name in names:
+        path = source / name
+        try:
+            st = os.lstat(path)
+            if stat.S_ISREG(st.st_mode):
+                path.chmod(0o600)
+            found = describe(path, st)
+        except OSError:
+            found = None
+        if found is None or found[:4] != entries[name][:4]:
+            raise RestoreError(f"the setup did not create {name} as recorded")
+
+
+def open_up(source: Path):
+    """Make every directory of the scratch setup source writable, to move its entries out."""
+    for rel, st in walk(source, []):
+        if stat.S_ISDIR(st.st_mode):
+            (source / rel).chmod(0o700)
+
+
+def restore_tree(ws: Path, entries: dict, setup) -> tuple[int, int, int]:
+    """
+    Bring the tree of ws back to the recorded entries, which are updated
+    with the new inodes and ctimes. setup(path) must set the challenge up
+    again in the empty directory path. Return the number of entries
+    removed, restored and chmod-ed.
+    """
+    # directory -> original mode, for the directories opened up
+    opened = {}
+    changed = []
+    extra, missing, modes = [], [], []
+    source = None
+    try:
+        extra, missing, modes = diff_tree(ws, entries, changed)
+        opened.update((str(path.relative_to(ws)), mode) for path, mode in changed)
+
+        needed = [name for name in missing if entries[name][0] != "dir"]
+        if needed:
+            source = Path(tempfile.mkdtemp(dir=ws / TREE_FILE.parent, prefix="restore-"))
+            setup(source)
+            open_up(source)
+            check_source(source, needed, entries)
+
+        # the directories entries are removed from or restored into
+        for name in extra + missing:
+            parent = str(Path(name).parent)
+            if parent not in opened and (parent == "." or parent not in missing):
+                opened[parent] = stat.S_IMODE(os.lstat(ws / parent).st_mode)
+                (ws / parent).chmod(0o700)
+
+        for name in extra:
+            remove_tree(ws / name)
+        for name in missing:
+            if entries[name][0] == "dir":
+                if not (ws / name).is_dir():
+                    os.mkdir(ws / name, 0o700)
+            else:
+                os.rename(source / name, ws / name)
+    finally:
+        for path, mode in changed:
+            opened.setdefault(str(path.relative_to(ws)), mode)
+        chmod = set(missing) | set(modes) | set(opened)
+        # children before their parents
+        for name in reversed(entries):
+            if name in chmod and entries[name][0] != "link" and os.path.lexists(ws / name):
+                os.chmod(ws / name, entries[name][1])
+        for name, mode in opened.items():
+            if name not in entries and os.path.lexists(ws / name):
+                os.chmod(ws / name, mode)
+        if source is not None:
+            remove_tree(source)
+
+    for name in set(missing) | set(modes):
+        if entries[name][0] == "file":
+            st = os.lstat(ws / name)
+            entries[name][4:] = [st.st_ino, st.st_ctime_ns]
+    return len(extra), len(missing), len(modes)
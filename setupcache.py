@@ -0,0 +1,244 @@
+"""
+Cache of materialized challenge setups.
+
+A setup only depends on the challenge module and on the random seed, so
+the tree it creates and the state fields it sets can be reused by every
+later setup of the same challenge with the same seed (goto with --seed,
+classroom provisioning with a shared seed). Entries are keyed by the
+challenge id, the seed and the source hash of the challenge (which covers
+its module and the helper modules, see manifest.HELPER_MODULES), and are
+only used when the random generator is exactly in its freshly-seeded
+state.
+
+Each entry is a directory with:
+
+- tree/: a copy of the workspace, with owner-only permissions;
+- meta.json: the entries of the tree in creation order (path, kind, mode,
+  link target) and the total size;
+- state.bin: the state fields set by the setup, encrypted with the state
+  codec like the state of the workspaces.
+
+Files are materialized with a reflink (FICLONE) where the filesystem
+supports it, and copied otherwise; modes are applied last, children
+before their parents. Hard links are never used: the student may modify
+the files in place, which would modify the cache.
+
+Challenges whose setup depends on the location of the workspace (e.g. a
+flag that is an absolute path) declare `relocatable = False` and are never
+cached. Entries are evicted least-recently-used first when the cache
+grows beyond its budget.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import random
+import shutil
+import stat
+import tempfile
+from pathlib import Path
+
+from journal import apply_record, diff_fields
+from state import State
+from utils import remove_tree, reset_workspace
+
+CACHE_VERSION = 1
+# ioctl(dest_fd, FICLONE, src_fd), from linux/fs.h
+FICLONE = 0x40049409
+
+
+def cache_key(cid: str, seed: int, source_hash: str) -> str:
+    return hashlib.sha256(f"{CACHE_VERSION}:{cid}:{seed}:{source_hash}".encode()).hexdigest()
+
+
+def clone_file(src: Path, dst: Path, reflink: bool) -> bool:
+    """Copy src to dst; return whether reflinks are worth trying again."""
+    with open(src, "rb") as fsrc, open(dst, "xb") as fdst:
+        if reflink:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                return True
+            except OSError:
+                reflink = False
+        shutil.copyfileobj(fsrc, fdst)
+    return reflink
+
+
+def walk(root: Path, changed: list):
+    """
+    Yield (relative path, lstat) of the entries under root but .bashquest,
+    parents first. Directories that cannot be listed or entered are made
+    accessible, and appended to changed with their mode, for the caller
+    to restore.
+    """
+    stack = [Path()]
+    while stack:
+        rel = stack.pop()
+        path = root / rel
+        if not os.access(path, os.R_OK | os.X_OK):
+            changed.append((path, stat.S_IMODE(path.stat().st_mode)))
+            path.chmod(0o700)
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        for entry in entries:
+            if rel == Path() and entry.name == ".bashquest":
+                continue
+            st = entry.stat(follow_symlinks=False)
+            yield rel / entry.name, st
+            if stat.S_ISDIR(st.st_mode):
+                stack.append(rel / entry.name)
+
+
+class SetupCache:
+    def __init__(self, cache_dir: Path, codec, budget: int):
+        self.cache_dir = cache_dir
+        self.codec = codec
+        self.budget = budget
+
+    def key(self, ch, seed: int) -> str | None:
+        source_hash = getattr(ch, "source_hash", None)
+        if source_hash is None or not getattr(ch, "relocatable", True):
+            return None
+        return cache_key(ch.id, seed, source_hash)
+
+    def setup(self, ch, state: State, ws: Path, seed: int) -> State:
+        """Run the setup of ch in the workspace ws, or materialize it from the cache."""
+        key = self.key(ch, seed)
+        if key is None or random.getstate() != random.Random(seed).getstate():
+            return ch.setup(state)
+
+        cached = self.materialize(key, state, ws)
+        if cached is not None:
+            return cached
+
+        before = state.to_dict()
+        state = ch.setup(state)
+        try:
+            self.store(key, ws, before, state.to_dict())
+        except OSError:
+            # the cache is best effort
+            pass
+        return state
+
+    # ===================== HIT =====================
+
+    def materialize(self, key: str, state: State, ws: Path) -> State | None:
+        entry = self.cache_dir / key
+        try:
+            meta = json.loads((entry / "meta.json").read_text())
+            record = json.loads(self.codec.decode((entry / "state.bin").read_bytes()))
+        except (OSError, ValueError):
+            return None
+
+        try:
+            self.copy_tree(entry / "tree", ws, meta["entries"])
+        except OSError:
+            # evicted meanwhile: start again from an empty workspace
+            reset_workspace(ws)
+            return None
+        os.utime(entry)
+
+        data = state.to_dict()
+        apply_record(data, record)
+        if "workspace" in record["set"]:
+            # set by the setup to its resolved path
+            data["workspace"] = str(ws)
+        return State.from_dict(data)
+
+    def copy_tree(self, src: Path, ws: Path, entries: list):
+        reflink = True
+        for rel, kind, _, target in entries:
+            if kind == "dir":
+                os.mkdir(ws / rel, 0o700)
+            elif kind == "link":
+                os.symlink(target, ws / rel)
+            else:
+                reflink = clone_file(src / rel, ws / rel, reflink)
+        for rel, kind, mode, _ in reversed(entries):
+            if kind != "link":
+                os.chmod(ws / rel, mode)
+
+    # ===================== MISS =====================
+
+    def store(self, key: str, ws: Path, before: dict, after: dict):
+        record = diff_fields(before, after)
+        ws_path = str(ws)
+        for name, value in record["set"].items():
+            if name != "workspace" and isinstance(value, str) and ws_path in value:
+                # depends on the location of the workspace
+                return
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if (self.cache_dir / key).exists():
+            return
+        tmp = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=".new-"))
+        try:
+            entries, size = self.capture(ws, tmp / "tree")
+            if size > self.budget:
+                return
+            (tmp / "meta.json").write_text(json.dumps({"entries": entries, "size": size}))
+            (tmp / "state.bin").write_bytes(self.codec.encode(json.dumps(record).encode()))
+            try:
+                os.rename(tmp, self.cache_dir / key)
+            except OSError:
+                # stored by another process meanwhile
+                return
+        finally:
+            if tmp.exists():
+                remove_tree(tmp)
+        self.evict()
+
+    def capture(self, ws: Path, dest: Path) -> tuple[list, int]:
+        """Copy the tree of ws to dest; return its entries and total size."""
+        dest.mkdir()
+        entries = []
+        changed = []
+        size = 0
+        try:
+            for rel, st in walk(ws, changed):
+                mode = stat.S_IMODE(st.st_mode)
+                if stat.S_ISDIR(st.st_mode):
+                    os.mkdir(dest / rel, 0o700)
+                    entries.append([str(rel), "dir", mode, None])
+                elif stat.S_ISLNK(st.st_mode):
+                    entries.append([str(rel), "link", mode, os.readlink(ws / rel)])
+                elif stat.S_ISREG(st.st_mode):
+                    if not mode & stat.S_IRUSR:
+                        changed.append((ws / rel, mode))
+                        (ws / rel).chmod(mode | stat.S_IRUSR)
+                    clone_file(ws / rel, dest / rel, reflink=True)
+                    (dest / rel).chmod(0o600)
+                    entries.append([str(rel), "file", mode, None])
+                    size += st.st_size
+                else:
+                    raise OSError(f"cannot cache {rel}: not a file, directory or link")
+        finally:
+            # restore the modes changed to read the tree
+            for path, mode in reversed(changed):
+                path.chmod(mode)
+        return entries, size
+
+    def evict(self):
+        """Remove the least recently used entries beyond the budget."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.startswith("."):
+                continue
+            try:
+                size = json.loads(Path(entry.path, "meta.json").read_text())["size"]
+                entries.append((entry.stat().st_mtime, size, entry.name))
+            except (OSError, ValueError):
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.budget:
+                break
+            # renamed first, so that no one materializes a half-removed entry
+            doomed = self.cache_dir / f".old-{name}"
+            try:
+                os.rename(self.cache_dir / name, doomed)
+                remove_tree(doomed)
+            except OSError:
+                continue
+            total -= size
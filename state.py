@@ -1,10 +1,143 @@
 import hashlib
 from pathlib import Path
 
+# Version of the dictionary returned by State.to_dict().
+# 1: pickled State objects with arbitrary attributes (no explicit version).
+# 2: fixed core fields plus the scratch namespace of the current challenge.
+SCHEMA_VERSION = 2
+
+CORE_FIELDS = ("challenge_index", "flag_hash", "workspace", "passed_challenges")
+
+
 class State:
+    """
+    Progress of a quest in a workspace.
+
+    The core fields are fixed. Any other attribute assigned by a challenge
+    setup (e.g. state.dir1) is stored in the scratch namespace of the
+    current challenge, which is dropped when another challenge is set.
+    Scratch values must be JSON types (str, int, float, bool, None, list, dict).
+    """
+
+    __slots__ = CORE_FIELDS + ("scratch",)
+
     def __init__(self):
         self.challenge_index = 0
         self.flag_hash = b""
         self.workspace = ""
         self.passed_challenges: set[str] = set()  # store IDs of passed challenges
+        self.scratch: dict = {}
+
+    def __getattr__(self, name):
+        # only called for names that are not (initialized) slots
+        try:
+            return object.__getattribute__(self, "scratch")[name]
+        except (AttributeError, KeyError):
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        if name in State.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            self.scratch[name] = value
+
+    def __delattr__(self, name):
+        if name in State.__slots__:
+            object.__delattr__(self, name)
+        else:
+            try:
+                del self.scratch[name]
+            except KeyError:
+                raise AttributeError(name) from None
+
+    def clear_scratch(self):
+        """Forget the data of the current challenge."""
+        self.scratch = {}
+        self.flag_hash = b""
+
+    def context(self) -> dict:
+        """Fields available to challenge descriptions."""
+        context = {name: getattr(self, name) for name in CORE_FIELDS}
+        context.update(self.scratch)
+        return context
+
+    def to_dict(self) -> dict:
+        return {
+            "version": SCHEMA_VERSION,
+            "challenge_index": self.challenge_index,
+            "flag_hash": self.flag_hash.hex(),
+            "workspace": self.workspace,
+            "passed_challenges": sorted(self.passed_challenges),
+            "scratch": dict(self.scratch),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "State":
+        data = migrate(data)
+        state = cls()
+        state.challenge_index = data["challenge_index"]
+        state.flag_hash = bytes.fromhex(data["flag_hash"])
+        state.workspace = data["workspace"]
+        state.passed_challenges = set(data["passed_challenges"])
+        state.scratch = dict(data["scratch"])
+        return state
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, data):
+        # also receives the __dict__ of states pickled before __slots__
+        other = State.from_dict(data)
+        for name in State.__slots__:
+            object.__setattr__(self, name, getattr(other, name))
+
+
+# ===================== MIGRATIONS =====================
+
+def migrate_v1(attrs: dict) -> dict:
+    """Split the attributes of a version 1 state into core and scratch."""
+    flag_hash = attrs.get("flag_hash", b"")
+    return {
+        "version": 2,
+        "challenge_index": attrs.get("challenge_index", 0),
+        "flag_hash": flag_hash.hex() if isinstance(flag_hash, bytes) else flag_hash,
+        "workspace": attrs.get("workspace", ""),
+        "passed_challenges": sorted(attrs.get("passed_challenges", ())),
+        "scratch": {k: v for k, v in attrs.items() if k not in CORE_FIELDS},
+    }
+
+
+MIGRATIONS = {
+    1: migrate_v1,
+}
+
+
+def migrate(data: dict) -> dict:
+    version = data.get("version", 1)
+    while version < SCHEMA_VERSION:
+        data = MIGRATIONS[version](data)
+        version = data["version"]
+    return data
+
+
+def load_legacy(raw: bytes):
+    """
+    Unpickle data written by versions storing pickled states, refusing any
+    class other than State and sets.
+    """
+    import io
+    import pickle
+
+    allowed = {
+        ("state", "State"),
+        ("builtins", "set"),
+        ("builtins", "frozenset"),
+    }
+
+    class LegacyUnpickler(pickle.Unpickler):
+        def find_class(self, module, name):
+            if (module, name) not in allowed:
+                raise pickle.UnpicklingError(f"unexpected class in state: {module}.{name}")
+            return super().find_class(module, name)
 
+    return LegacyUnpickler(io.BytesIO(raw)).load()
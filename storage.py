@@ -0,0 +1,370 @@
+"""
+Storage backends for the state of the workspaces.
+
+- FileBackend (default): one encrypted snapshot plus an append-only journal
+  in the .bashquest directory of each workspace (see journal.py).
+- SqliteBackend: a single SQLite database (WAL mode) with the encrypted
+  state of every workspace, for system-wide installations. The passed
+  challenges are also stored in plain, indexed rows for instructor
+  queries; the encrypted state stays authoritative for the quest itself.
+
+The backend is selected with STATE_BACKEND in the env file.
+
+load() returns None when a workspace has no state yet, and raises
+StateError when it has one that cannot be read (corrupt, or encrypted
+with another key), so that it is never mistaken for a new workspace.
+
+The commands changing the state hold the lock of the workspace (see
+lock_workspace) from the load of the state to its last save. Readers take
+no lock: the snapshots of the file backend are replaced atomically, and a
+load that raced with a compaction is retried.
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import sys
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from state import State
+
+BACKENDS = ("file", "sqlite")
+
+# Attempts of a load racing with writers before giving up
+LOAD_ATTEMPTS = 5
+
+
+class StateError(Exception):
+    """The state of a workspace exists but cannot be read."""
+
+
+class StateBackend(ABC):
+    """Interface of the state storage backends."""
+
+    @abstractmethod
+    def load(self, ws: Path) -> State | None:
+        """Return the state of workspace ws, or None if there is none."""
+
+    @abstractmethod
+    def save(self, state: State, user: str | None = None):
+        """
+        Persist the state of workspace state.workspace, which belongs to
+        user (default: the current user).
+        """
+
+    @abstractmethod
+    def delete(self, ws: Path):
+        """Forget the state of workspace ws."""
+
+    def close(self):
+        """Release what the backend keeps open."""
+
+
+# ===================== FILES =====================
+
+def workspace_state_file(ws: Path) -> Path:
+    return ws / ".bashquest" / "state.bin"
+
+
+def workspace_journal_file(ws: Path) -> Path:
+    return ws / ".bashquest" / "state.journal"
+
+
+def workspace_lock_file(ws: Path) -> Path:
+    return ws / ".bashquest" / "lock"
+
+
+@contextlib.contextmanager
+def lock_workspace(ws: Path):
+    """
+    Hold the lock of the workspace ws, waiting for it if needed. It is a
+    POSIX record lock (lockf): unlike flock, it is not inherited by the
+    processes forked meanwhile (see utils.run_detached), which would keep
+    the workspace locked after the command ends.
+    """
+    lock_file = workspace_lock_file(ws)
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(lock_file, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600)
+    try:
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            print("Waiting for another bashquest command on this workspace...", file=sys.stderr)
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        # closing the file releases the lock
+        os.close(fd)
+
+
+def state_files_stamp(ws: Path) -> tuple:
+    stamp = []
+    for f in (workspace_state_file(ws), workspace_journal_file(ws)):
+        try:
+            st = f.stat()
+            # the inode changes when a new snapshot replaces the file
+            stamp.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def fsync_dir(path: Path):
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class FileBackend(StateBackend):
+    def __init__(self, codec, compact_every: int, fsync: bool = True):
+        self.codec = codec
+        self.compact_every = compact_every
+        # whether the writes are flushed to the disk before save() returns
+        self.fsync = fsync
+        # What was last loaded from or saved to each workspace: the fields
+        # of the state, the journal id and length, and the stat of the state
+        # files. It lets save() append only the changes, and lets a
+        # long-running process (see daemon.py) skip decryption while no one
+        # else wrote the files.
+        self.persisted: dict[Path, dict] = {}
+
+    def remember(self, ws: Path, data: dict, journal_id: str | None, records: int):
+        self.persisted[ws] = {
+            "data": data,
+            "journal": journal_id,
+            "records": records,
+            "stamp": state_files_stamp(ws),
+        }
+
+    def write_snapshot(self, ws: Path, data: dict) -> str:
+        """
+        Write the whole state and start a new, empty journal. The snapshot
+        is written to a temporary file renamed over state.bin: readers (and
+        a crash) see either the previous snapshot or the new one, never a
+        truncated file. The records left in the journal carry the id of the
+        previous snapshot and are ignored if the journal is not removed.
+        """
+        from journal import new_journal_id
+
+        journal_id = new_journal_id()
+        raw = json.dumps({"state": data, "journal": journal_id}).encode()
+        state_file = workspace_state_file(ws)
+        fd, tmp = tempfile.mkstemp(dir=state_file.parent, prefix=f".{state_file.name}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.codec.encode(raw))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.rename(tmp, state_file)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        if self.fsync:
+            fsync_dir(state_file.parent)
+        workspace_journal_file(ws).unlink(missing_ok=True)
+        return journal_id
+
+    def save(self, state: State, user: str | None = None):
+        """
+        Normally append one journal record with the fields changed since the
+        last load/save; write a full snapshot when the journal is due for
+        compaction or the files were changed by someone else.
+        """
+        from journal import append_record, diff_fields, is_empty
+
+        ws = Path(state.workspace)
+        ws_bash = ws / ".bashquest"
+        ws_bash.mkdir(parents=True, exist_ok=True)
+        data = state.to_dict()
+
+        last = self.persisted.get(ws)
+        if (last is None or last["journal"] is None
+                or last["stamp"] != state_files_stamp(ws)
+                or last["records"] >= self.compact_every):
+            self.remember(ws, data, self.write_snapshot(ws, data), 0)
+            return
+
+        record = diff_fields(last["data"], data)
+        if is_empty(record):
+            return
+        append_record(workspace_journal_file(ws), self.codec, last["journal"], record, self.fsync)
+        self.remember(ws, data, last["journal"], last["records"] + 1)
+
+    def load_legacy(self, ws: Path, raw: bytes) -> State:
+        """Read a state.bin written with pickle by older versions (which had no journal)."""
+        from state import load_legacy
+
+        state = load_legacy(raw)
+        if not isinstance(state, State):
+            raise ValueError("unknown state format")
+        return state
+
+    def load(self, ws: Path) -> State | None:
+        """
+        Return the state of ws, or None if it has none. A snapshot replaced
+        while its journal was being read (the journal then belongs to the
+        new snapshot) is read again.
+        """
+        for attempt in range(LOAD_ATTEMPTS):
+            stamp = state_files_stamp(ws)
+            if stamp[0] is None:
+                return None
+            last = self.persisted.get(ws)
+            if last is not None and last["stamp"] == stamp:
+                return State.from_dict(last["data"])
+            try:
+                state, journal_id, length = self.read_state(ws)
+            except FileNotFoundError:
+                # removed meanwhile
+                continue
+            except Exception as e:
+                if state_files_stamp(ws) != stamp:
+                    continue
+                raise StateError(f"the state of {ws} cannot be read ({type(e).__name__}: {e})") from e
+            if state_files_stamp(ws) != stamp:
+                continue
+            self.remember(ws, state.to_dict(), journal_id, length)
+            return state
+        raise StateError(f"the state of {ws} keeps changing while it is read")
+
+    def read_state(self, ws: Path) -> tuple[State, str | None, int]:
+        """
+        Read the snapshot and the journal of ws; return the state, the id of
+        the journal (None if it cannot be appended to) and its length.
+        """
+        from journal import apply_record, read_records
+
+        raw = self.codec.decode(workspace_state_file(ws).read_bytes())
+        if not raw.startswith(b"{"):
+            # rewritten as a new snapshot by the next save
+            return self.load_legacy(ws, raw), None, 0
+
+        snapshot = json.loads(raw)
+        data, journal_id = snapshot["state"], snapshot["journal"]
+        records, length, appendable = read_records(workspace_journal_file(ws), self.codec, journal_id)
+        for record in records:
+            apply_record(data, record)
+        return State.from_dict(data), journal_id if appendable else None, length
+
+    def delete(self, ws: Path):
+        # the state files go away with the workspace
+        self.persisted.pop(ws, None)
+
+
+# ===================== SQLITE =====================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workspaces (
+    workspace       TEXT PRIMARY KEY,
+    user            TEXT NOT NULL,
+    challenge_index INTEGER NOT NULL,
+    state           BLOB NOT NULL,
+    updated_at      REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS passed (
+    workspace       TEXT NOT NULL REFERENCES workspaces(workspace) ON DELETE CASCADE,
+    challenge_id    TEXT NOT NULL,
+    passed_at       REAL NOT NULL,
+    PRIMARY KEY (workspace, challenge_id)
+);
+CREATE INDEX IF NOT EXISTS workspaces_user ON workspaces(user);
+CREATE INDEX IF NOT EXISTS passed_challenge ON passed(challenge_id);
+"""
+
+
+def current_user() -> str:
+    import pwd
+
+    return pwd.getpwuid(os.getuid()).pw_name
+
+
+class SqliteBackend(StateBackend):
+    """
+    All the states in one database. WAL mode lets any number of students
+    read while one writes; writes are single short transactions, and
+    waiting writers retry for up to busy_timeout instead of failing.
+    """
+
+    def __init__(self, codec, db_file: Path, busy_timeout: float = 10.0):
+        import sqlite3
+
+        self.codec = codec
+        db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(db_file, timeout=busy_timeout, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+
+    def load(self, ws: Path) -> State | None:
+        row = self.db.execute(
+            "SELECT state FROM workspaces WHERE workspace = ?", (str(ws),)
+        ).fetchone()
+        if row is None:
+            if workspace_state_file(ws).exists():
+                # created with the file backend: imported by the next save
+                return FileBackend(self.codec, 0).load(ws)
+            return None
+        try:
+            return State.from_dict(json.loads(self.codec.decode(row[0])))
+        except Exception as e:
+            raise StateError(f"the state of {ws} cannot be read ({type(e).__name__}: {e})") from e
+
+    def save(self, state: State, user: str | None = None):
+        data = state.to_dict()
+        blob = self.codec.encode(json.dumps(data).encode())
+        now = time.time()
+        ws = str(Path(state.workspace))
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self.db.execute(
+                "INSERT INTO workspaces (workspace, user, challenge_index, state, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(workspace) DO UPDATE SET user = excluded.user,"
+                " challenge_index = excluded.challenge_index, state = excluded.state,"
+                " updated_at = excluded.updated_at",
+                (ws, user or current_user(), state.challenge_index, blob, now),
+            )
+            self.db.executemany(
+                "INSERT OR IGNORE INTO passed (workspace, challenge_id, passed_at) VALUES (?, ?, ?)",
+                [(ws, cid, now) for cid in data["passed_challenges"]],
+            )
+            placeholders = ",".join("?" * len(data["passed_challenges"]))
+            self.db.execute(
+                f"DELETE FROM passed WHERE workspace = ? AND challenge_id NOT IN ({placeholders})",
+                (ws, *data["passed_challenges"]),
+            )
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def delete(self, ws: Path):
+        self.db.execute("DELETE FROM workspaces WHERE workspace = ?", (str(ws),))
+
+    def close(self):
+        self.db.close()
+
+    def progress(self, user: str | None = None):
+        """
+        Yield (user, workspace, challenge_index, passed challenge ids,
+        updated_at) for every workspace, or only those of user.
+        """
+        query = (
+            "SELECT w.user, w.workspace, w.challenge_index, group_concat(p.challenge_id), w.updated_at"
+            " FROM workspaces w LEFT JOIN passed p ON p.workspace = w.workspace"
+        )
+        params = ()
+        if user is not None:
+            query += " WHERE w.user = ?"
+            params = (user,)
+        query += " GROUP BY w.workspace ORDER BY w.user, w.workspace"
+        for user, ws, idx, passed, updated_at in self.db.execute(query, params):
+            yield user, ws, idx, sorted(passed.split(",")) if passed else [], updated_at
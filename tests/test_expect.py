@@ -0,0 +1,115 @@
+import hashlib
+import os
+
+import pytest
+
+from challenges.copy_file_to_dir import CopyFileToDirChallenge
+from challenges.expect import CHUNK_SIZE, WHITESPACE, ExpectedTree
+from state import State
+
+
+@pytest.fixture
+def tree():
+    tree = ExpectedTree()
+    tree.dir("alpha/beta")
+    tree.absent("alpha/beta/gamma")
+    tree.unchanged("apple.txt", "This file is named apple.\n")
+    tree.file("alice/apple.txt", "This file is named apple.\n")
+    return tree
+
+
+def solve(ws):
+    (ws / "alpha" / "beta").mkdir(parents=True)
+    (ws / "alice").mkdir()
+    (ws / "apple.txt").write_text("This file is named apple.\n")
+    (ws / "alice" / "apple.txt").write_text("This file is named apple.\n")
+
+
+def test_solved_tree_passes(tree, tmp_path):
+    solve(tmp_path)
+    assert tree.matches(tmp_path)
+    assert tree.hints(tmp_path) == []
+
+
+def test_hints_of_an_empty_workspace(tree, tmp_path):
+    assert tree.hints(tmp_path) == [
+        "apple.txt was removed, but it must stay where it is.",
+        "alice/apple.txt does not exist yet.",
+        "alpha/beta does not exist yet.",
+    ]
+
+
+def test_hints_of_wrong_entries(tree, tmp_path):
+    solve(tmp_path)
+    (tmp_path / "alpha" / "beta" / "gamma").mkdir()
+    (tmp_path / "apple.txt").write_text("This file is named pear.\n")
+    (tmp_path / "alice" / "apple.txt").write_text("")
+    assert tree.hints(tmp_path) == [
+        "apple.txt was modified, but it must keep its content.",
+        "alice/apple.txt does not have the expected content.",
+        "alpha/beta/gamma must not exist.",
+    ]
+
+
+def test_hint_of_wrong_kind(tree, tmp_path):
+    solve(tmp_path)
+    (tmp_path / "alpha" / "beta").rmdir()
+    (tmp_path / "alpha" / "beta").write_text("")
+    assert tree.hints(tmp_path) == ["alpha/beta should be a directory, not a file."]
+
+
+def test_dangling_link_is_not_absent(tmp_path):
+    tree = ExpectedTree()
+    tree.absent("gone")
+    tree.file("target")
+    os.symlink("nowhere", tmp_path / "gone")
+    os.symlink("nowhere", tmp_path / "target")
+    assert tree.hints(tmp_path) == [
+        "gone must not exist.",
+        "target should be a file, not a broken link.",
+    ]
+
+
+def test_mode(tmp_path):
+    tree = ExpectedTree()
+    tree.file("f", mode=0o640)
+    (tmp_path / "f").write_text("")
+    (tmp_path / "f").chmod(0o600)
+    assert tree.hints(tmp_path) == ["f should have mode 640, not 600."]
+    (tmp_path / "f").chmod(0o640)
+    assert tree.matches(tmp_path)
+
+
+def test_ignored_characters(tmp_path):
+    tree = ExpectedTree()
+    tree.file("f", "flag", ignore_leading=WHITESPACE, ignore_trailing=WHITESPACE)
+    for content, ok in [("flag", True), ("  flag\n\n", True), ("flag!\n", False), ("fla\n", False)]:
+        (tmp_path / "f").write_text(content)
+        assert tree.matches(tmp_path) is ok, content
+
+
+def test_content_across_chunks(tmp_path):
+    content = os.urandom(CHUNK_SIZE * 2 + 10)
+    (tmp_path / "big").write_bytes(content)
+    tree = ExpectedTree()
+    tree.file("big", content, sha256=hashlib.sha256(content).hexdigest())
+    assert tree.matches(tmp_path)
+
+    (tmp_path / "big").write_bytes(content[:-1] + bytes([content[-1] ^ 1]))
+    assert not tree.matches(tmp_path)
+
+
+def test_copy_only_checks_the_copy(tmp_path):
+    ch = CopyFileToDirChallenge()
+    state = State()
+    state.workspace = str(tmp_path)
+    state = ch.setup(state)
+    src = tmp_path / state.cp_source_file
+    assert not ch.evaluate(state, None)
+
+    (tmp_path / state.cp_dest_dir / src.name).write_bytes(src.read_bytes())
+    src.write_text("edited after the copy\n")
+    assert ch.evaluate(state, None)
+
+    src.unlink()
+    assert ch.expected(state).hints(tmp_path) == [f"{src.name} was removed, but it must stay where it is."]
@@ -0,0 +1,112 @@
+import json
+
+from codec import StateCodec
+from journal import LENGTH, append_record, read_records, split_records
+from state import State
+from storage import FileBackend, workspace_journal_file, workspace_state_file
+
+CODEC = StateCodec(b"test key")
+
+
+def new_state(ws):
+    state = State()
+    state.workspace = str(ws)
+    return state
+
+
+def snapshot_of(ws) -> dict:
+    return json.loads(CODEC.decode(workspace_state_file(ws).read_bytes()))
+
+
+def test_changes_are_appended_and_replayed(tmp_path):
+    backend = FileBackend(CODEC, compact_every=10, fsync=False)
+    state = new_state(tmp_path)
+    backend.save(state)
+    for i in range(1, 4):
+        state.challenge_index = i
+        state.passed_challenges.add(f"ch{i}")
+        state.dir1 = f"d{i}"
+        backend.save(state)
+
+    # the snapshot still has the first state; the journal has the changes
+    assert snapshot_of(tmp_path)["state"]["challenge_index"] == 0
+    records, length, appendable = read_records(
+        workspace_journal_file(tmp_path), CODEC, snapshot_of(tmp_path)["journal"])
+    assert (len(records), length, appendable) == (3, 3, True)
+    assert records[-1]["set"]["challenge_index"] == 3
+
+    loaded = FileBackend(CODEC, compact_every=10).load(tmp_path)
+    assert loaded.to_dict() == state.to_dict()
+
+
+def test_unchanged_state_is_not_appended(tmp_path):
+    backend = FileBackend(CODEC, compact_every=10, fsync=False)
+    state = new_state(tmp_path)
+    backend.save(state)
+    backend.save(state)
+    assert not workspace_journal_file(tmp_path).exists()
+
+
+def test_deleted_fields_are_replayed(tmp_path):
+    backend = FileBackend(CODEC, compact_every=10, fsync=False)
+    state = new_state(tmp_path)
+    state.dir1 = "alpha"
+    backend.save(state)
+    state.clear_scratch()
+    backend.save(state)
+
+    loaded = FileBackend(CODEC, compact_every=10).load(tmp_path)
+    assert loaded.scratch == {}
+
+
+def test_journal_is_compacted(tmp_path):
+    backend = FileBackend(CODEC, compact_every=3, fsync=False)
+    state = new_state(tmp_path)
+    backend.save(state)
+    first = snapshot_of(tmp_path)["journal"]
+    for i in range(1, 4):
+        state.challenge_index = i
+        backend.save(state)
+    assert snapshot_of(tmp_path)["journal"] == first
+
+    # the fourth change is due for compaction: a new snapshot, no journal
+    state.challenge_index = 4
+    backend.save(state)
+    snapshot = snapshot_of(tmp_path)
+    assert snapshot["journal"] != first
+    assert snapshot["state"]["challenge_index"] == 4
+    assert not workspace_journal_file(tmp_path).exists()
+    assert FileBackend(CODEC, compact_every=3).load(tmp_path).challenge_index == 4
+
+
+def test_records_of_another_snapshot_are_ignored(tmp_path):
+    backend = FileBackend(CODEC, compact_every=10, fsync=False)
+    state = new_state(tmp_path)
+    backend.save(state)
+    # left over by a compaction interrupted before the journal was removed
+    append_record(workspace_journal_file(tmp_path), CODEC, "stale", {"set": {"challenge_index": 7}, "del": []})
+
+    assert FileBackend(CODEC, compact_every=10).load(tmp_path).challenge_index == 0
+
+
+def test_torn_tail_is_dropped_and_compacted(tmp_path):
+    backend = FileBackend(CODEC, compact_every=10, fsync=False)
+    state = new_state(tmp_path)
+    backend.save(state)
+    state.challenge_index = 1
+    backend.save(state)
+    journal = workspace_journal_file(tmp_path)
+    with open(journal, "ab") as f:
+        f.write(LENGTH.pack(100) + b"partial")
+
+    blobs, torn = split_records(journal.read_bytes())
+    assert (len(blobs), torn) == (1, True)
+
+    reader = FileBackend(CODEC, compact_every=10, fsync=False)
+    loaded = reader.load(tmp_path)
+    assert loaded.challenge_index == 1
+    # nothing is appended after a torn tail: the next save is a snapshot
+    loaded.challenge_index = 2
+    reader.save(loaded)
+    assert not journal.exists()
+    assert snapshot_of(tmp_path)["state"]["challenge_index"] == 2
@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from challenges.names import PLACES, count_names, sample_names
+
+
+def test_places_are_distinct():
+    assert len(PLACES) == len(set(PLACES))
+
+
+def test_names_are_unique_and_well_formed():
+    names = sample_names(100_000, length=(3, 6), rng=random.Random(1))
+    assert len(names) == len(set(names)) == 100_000
+    assert all(3 <= len(name) <= 6 and name.isalpha() and name.islower() for name in names)
+
+
+def test_names_can_exhaust_the_names_available():
+    names = sample_names(count_names((1, 2), "ab"), length=(1, 2), alphabet="ab", rng=random.Random(2))
+    assert sorted(names) == ["a", "aa", "ab", "b", "ba", "bb"]
+
+
+def test_taken_names_are_not_returned():
+    taken = {"aa", "ab", "ba"}
+    assert sample_names(1, length=(2, 2), alphabet="ab", taken=taken, rng=random.Random(3)) == ["bb"]
+    with pytest.raises(ValueError):
+        sample_names(2, length=(2, 2), alphabet="ab", taken=taken)
+
+
+def test_contains_and_excludes():
+    rng = random.Random(4)
+    with_ab = sample_names(7, contains="ab", rng=rng)
+    without = sample_names(293, excludes="ab", taken=with_ab, rng=rng)
+    assert all("ab" in name for name in with_ab)
+    assert not any("ab" in name for name in without)
+    assert len(set(with_ab + without)) == 300
+
+
+def test_too_many_names():
+    with pytest.raises(ValueError):
+        sample_names(5, length=(1, 1), alphabet="abcd")
+    with pytest.raises(ValueError):
+        sample_names(1, length=(1, 2), contains="abc")
@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from restore import RestoreError, diff_tree, record_tree, restore_tree
+
+
+def setup(root):
+    (root / "a" / "b").mkdir(parents=True)
+    (root / "a" / "one.txt").write_text("one\n")
+    (root / "a" / "one.txt").chmod(0o444)
+    (root / "a" / "b" / "three.txt").write_text("three\n")
+    (root / "two.txt").write_text("two\n")
+    os.symlink("two.txt", root / "link")
+
+
+def no_setup(root):
+    raise AssertionError("nothing has to be restored")
+
+
+def shape(entries):
+    """The recorded kind, mode, size and content of each entry."""
+    return {name: entry[:4] for name, entry in entries.items()}
+
+
+@pytest.fixture
+def ws(tmp_path):
+    ws = tmp_path / "ws"
+    (ws / ".bashquest").mkdir(parents=True)
+    setup(ws)
+    return ws
+
+
+def test_record_skips_bashquest(ws):
+    entries = record_tree(ws)
+    assert list(entries) == ["a", "link", "two.txt", "a/b", "a/one.txt", "a/b/three.txt"]
+    assert entries["a/one.txt"][:3] == ["file", 0o444, 4]
+    assert entries["link"][0] == "link"
+
+
+def test_intact_tree(ws):
+    entries = record_tree(ws)
+    assert diff_tree(ws, entries, []) == ([], [], [])
+    assert restore_tree(ws, entries, no_setup) == (0, 0, 0)
+
+
+def test_rewritten_with_same_content(ws):
+    entries = record_tree(ws)
+    (ws / "two.txt").unlink()
+    (ws / "two.txt").write_text("two\n")
+    assert diff_tree(ws, entries, []) == ([], [], [])
+    # the new inode is recorded: the file is not read again
+    assert entries["two.txt"][4] == os.lstat(ws / "two.txt").st_ino
+
+
+def test_diff(ws):
+    entries = record_tree(ws)
+    (ws / "extra").mkdir()
+    (ws / "extra" / "inside.txt").write_text("x\n")
+    (ws / "two.txt").unlink()
+    (ws / "a" / "b" / "three.txt").write_text("THREE\n")
+    (ws / "a" / "one.txt").chmod(0o600)
+
+    extra, missing, modes = diff_tree(ws, entries, [])
+    assert extra == ["extra"]
+    assert sorted(missing) == ["a/b/three.txt", "two.txt"]
+    assert modes == ["a/one.txt"]
+
+
+def test_restore(ws):
+    entries = record_tree(ws)
+    before = shape(entries)
+    (ws / "extra").mkdir()
+    (ws / "extra" / "inside.txt").write_text("x\n")
+    (ws / "new.txt").write_text("new\n")
+    (ws / "two.txt").unlink()
+    os.unlink(ws / "link")
+    (ws / "a" / "b" / "three.txt").write_text("THREE\n")
+    (ws / "a" / "one.txt").chmod(0o600)
+
+    assert restore_tree(ws, entries, setup) == (2, 3, 1)
+    assert shape(record_tree(ws)) == before
+    assert (ws / "a" / "b" / "three.txt").read_text() == "three\n"
+    assert os.readlink(ws / "link") == "two.txt"
+    # the scratch setup is gone
+    assert os.listdir(ws / ".bashquest") == []
+    # the updated record matches the restored files
+    assert diff_tree(ws, entries, []) == ([], [], [])
+
+
+def test_restore_removed_directory(ws):
+    entries = record_tree(ws)
+    before = shape(entries)
+    (ws / "a" / "b" / "three.txt").unlink()
+    (ws / "a" / "b").rmdir()
+
+    assert restore_tree(ws, entries, setup) == (0, 2, 0)
+    assert shape(record_tree(ws)) == before
+
+
+def test_setup_not_reproducible(ws):
+    entries = record_tree(ws)
+    (ws / "two.txt").write_text("changed\n")
+    (ws / "extra.txt").write_text("x\n")
+
+    def other_setup(root):
+        setup(root)
+        (root / "two.txt").write_text("TWO\n")
+
+    with pytest.raises(RestoreError):
+        restore_tree(ws, entries, other_setup)
+    # nothing was changed
+    assert (ws / "two.txt").read_text() == "changed\n"
+    assert (ws / "extra.txt").exists()
+    assert os.listdir(ws / ".bashquest") == []
@@ -0,0 +1,85 @@
+import pytest
+
+from codec import StateCodec
+from state import State
+from storage import FileBackend, SqliteBackend, StateBackend, StateError
+
+CODEC = StateCodec(b"test key")
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SqliteBackend(CODEC, tmp_path / "db" / "state.db")
+    yield backend
+    backend.close()
+
+
+def new_state(ws, index=0, passed=()):
+    state = State()
+    state.workspace = str(ws)
+    state.challenge_index = index
+    state.passed_challenges = set(passed)
+    return state
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        StateBackend()
+
+
+def test_sqlite_round_trip(backend, tmp_path):
+    ws = tmp_path / "ws"
+    state = new_state(ws, 2, {"a", "b"})
+    state.flag_hash = b"\x01\x02"
+    state.dir1 = "alpha"
+    backend.save(state, user="alice")
+
+    reader = SqliteBackend(CODEC, tmp_path / "db" / "state.db")
+    try:
+        assert reader.load(ws).to_dict() == state.to_dict()
+    finally:
+        reader.close()
+
+
+def test_sqlite_missing_workspace(backend, tmp_path):
+    assert backend.load(tmp_path / "nowhere") is None
+
+
+def test_sqlite_save_replaces_the_passed_rows(backend, tmp_path):
+    ws = tmp_path / "ws"
+    backend.save(new_state(ws, 2, {"a", "b"}), user="alice")
+    backend.save(new_state(ws, 1, {"a"}), user="alice")
+    backend.save(new_state(tmp_path / "other", 0), user="bob")
+
+    rows = [row[:4] for row in backend.progress()]
+    assert rows == [("alice", str(ws), 1, ["a"]), ("bob", str(tmp_path / "other"), 0, [])]
+    assert [row[1] for row in backend.progress("bob")] == [str(tmp_path / "other")]
+
+
+def test_sqlite_delete(backend, tmp_path):
+    ws = tmp_path / "ws"
+    backend.save(new_state(ws, 1, {"a"}), user="alice")
+    backend.delete(ws)
+    assert backend.load(ws) is None
+    assert list(backend.progress()) == []
+
+
+def test_sqlite_wrong_key(backend, tmp_path):
+    ws = tmp_path / "ws"
+    backend.save(new_state(ws), user="alice")
+    other = SqliteBackend(StateCodec(b"another key"), tmp_path / "db" / "state.db")
+    try:
+        with pytest.raises(StateError):
+            other.load(ws)
+    finally:
+        other.close()
+
+
+def test_sqlite_imports_file_state(backend, tmp_path):
+    ws = tmp_path / "ws"
+    FileBackend(CODEC, compact_every=10, fsync=False).save(new_state(ws, 3, {"a"}))
+
+    state = backend.load(ws)
+    assert state.challenge_index == 3
+    backend.save(state, user="alice")
+    assert [row[2] for row in backend.progress()] == [3]
@@ -0,0 +1,72 @@
+import random
+from collections import Counter
+
+import pytest
+
+from challenges.textgen import TextGenerator, sampler, span
+
+
+def test_sampler_is_exactly_uniform():
+    values = b"abcdefg"
+    table, delete = sampler(values)
+    kept = bytes(b for b in range(256) if b not in delete)
+    counts = Counter(kept.translate(table))
+    assert set(counts) == set(values)
+    assert len(set(counts.values())) == 1
+
+
+def test_sampler_rejects_empty_values():
+    with pytest.raises(ValueError):
+        sampler(b"")
+
+
+def test_lines_lengths_and_letters():
+    gen = TextGenerator(random.Random(1), min_len=3, max_len=6, decoy_rate=0)
+    lines = gen.lines(10_000).split(b"\n")
+    assert lines.pop() == b""
+    assert len(lines) == 10_000
+    assert {len(line) for line in lines} == set(span(3, 6))
+    assert all(line.isalpha() and line.islower() for line in lines)
+
+
+def test_decoy_rate():
+    gen = TextGenerator(random.Random(2), decoy_rate=0.3, decoy_part=(1, 2))
+    lines = gen.lines(100_000).splitlines()
+    decoys = [line for line in lines if b"flag" in line]
+    # plain lines are 2..15 random letters: "flag" in them is rare
+    assert abs(len(decoys) / len(lines) - 0.3) < 0.01
+    assert all(6 <= len(line) <= 8 for line in decoys)
+
+
+@pytest.mark.parametrize("rate", [0, 1])
+def test_decoy_rate_bounds(rate):
+    lines = TextGenerator(random.Random(3), decoy_rate=rate, decoy_word=b"#").lines(1000).splitlines()
+    assert sum(b"#" in line for line in lines) == 1000 * rate
+
+
+def test_invalid_decoy_rate():
+    with pytest.raises(ValueError):
+        TextGenerator(decoy_rate=1 / 3)
+    with pytest.raises(ValueError):
+        TextGenerator(decoy_rate=1.5)
+
+
+def test_same_seed_same_text():
+    assert TextGenerator(random.Random(4)).lines(500) == TextGenerator(random.Random(4)).lines(500)
+
+
+def test_stream_yields_count_lines_in_batches():
+    gen = TextGenerator(random.Random(5))
+    batches = list(gen.stream(2500, batch=1000))
+    assert [chunk.count(b"\n") for chunk in batches] == [1000, 1000, 500]
+
+
+def test_stream_does_not_depend_on_when_it_is_iterated():
+    first = TextGenerator(random.Random(6))
+    a = first.stream(100)
+    b = first.stream(100)
+    second = TextGenerator(random.Random(6))
+    c = second.stream(100)
+    d = second.stream(100)
+    assert b"".join(b) == b"".join(d)
+    assert b"".join(a) == b"".join(c)
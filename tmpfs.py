@@ -0,0 +1,112 @@
+"""
+Workspaces kept in RAM.
+
+With WORKSPACE_STORAGE=tmpfs, `start` creates the tree of the workspace
+in a directory of the user under TMPFS_ROOT (/dev/shm by default), and
+the path asked for is a symbolic link to it: the files created and
+deleted at every challenge never reach the disk (or the NFS home). The
+directory of the user is bashquest-<uid>, only accessible by its owner.
+
+The RAM used by all the workspaces of the user is capped: a workspace is
+created on disk instead when the cap is reached or the filesystem has no
+room for it, and a workspace whose challenge grows the usage beyond the
+cap is moved to disk (see move_to_disk).
+
+The state and the active workspace refer to the tree itself (the path
+the link resolves to); `workspace` prints the link.
+"""
+
+import os
+import secrets
+import shutil
+import stat
+from pathlib import Path
+
+
+def user_dir(root: Path) -> Path | None:
+    """Return the directory of the user in root, created if needed; None if it cannot be used."""
+    path = root / f"bashquest-{os.getuid()}"
+    try:
+        path.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+    except OSError:
+        return None
+    st = os.lstat(path)
+    # root is usually world-writable: anyone could have created it first
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        return None
+    if stat.S_IMODE(st.st_mode) != 0o700:
+        path.chmod(0o700)
+    return path
+
+
+def usage(path: Path) -> int:
+    """Bytes allocated to the entries under path (unreadable directories are not counted)."""
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    st = entry.stat(follow_symlinks=False)
+                    total += st.st_blocks * 512
+                    if stat.S_ISDIR(st.st_mode):
+                        stack.append(entry.path)
+        except OSError:
+            continue
+    return total
+
+
+def has_room(root: Path, cap: int) -> bool:
+    """Whether the workspaces of the user in root can still grow up to cap bytes altogether."""
+    home = user_dir(root)
+    if home is None:
+        return False
+    used = usage(home)
+    st = os.statvfs(home)
+    return used < cap and st.f_bavail * st.f_frsize >= cap - used
+
+
+def create(path: Path, root: Path, cap: int) -> bool:
+    """
+    Create the tree of the workspace path in root, and path as a symbolic
+    link to it; return False, creating nothing, if there is no room.
+    """
+    if not has_room(root, cap):
+        return False
+    tree = user_dir(root) / f"{path.name}-{secrets.token_hex(4)}"
+    tree.mkdir(mode=0o700)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.symlink_to(tree)
+    return True
+
+
+def is_in(ws: Path, root: Path) -> bool:
+    """Whether the (resolved) workspace ws is a tree in root."""
+    return ws.parent == root.resolve() / f"bashquest-{os.getuid()}"
+
+
+def over_cap(root: Path, cap: int) -> bool:
+    home = user_dir(root)
+    return home is not None and usage(home) > cap
+
+
+def move_to_disk(link: Path, tree: Path) -> Path:
+    """
+    Replace link with a workspace on disk, with the .bashquest directory of
+    the tree; return it. The tree (and its trash) is left for the caller
+    to remove.
+    """
+    tmp = link.with_name(f".{link.name}.{secrets.token_hex(4)}")
+    tmp.mkdir(mode=0o755)
+    try:
+        shutil.copytree(tree / ".bashquest", tmp / ".bashquest", symlinks=True)
+        link.unlink()
+        os.rename(tmp, link)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.lexists(link):
+            link.symlink_to(tree)
+        raise
+    return link.resolve()
@@ -1,5 +1,10 @@
-import shutil
+import os
+import stat
+import errno
+import fcntl
 import hashlib
+import secrets
+from contextlib import contextmanager
 from pathlib import Path
 
 WORKSPACE_DIR = "workspace"
@@ -17,11 +22,236 @@ def make_writable_recursive(p: Path):
         for c in p.iterdir():
             make_writable_recursive(c)
 
-def reset_workspace(ws: Path):
-    if ws.exists():
-        make_writable_recursive(ws)
-        shutil.rmtree(ws)
+_DIR_FLAGS = os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC
+# Directories kept open at once while removing a tree
+MAX_OPEN_DIRS = 64
+
+def _open_dir(name, dir_fd=None, flags=_DIR_FLAGS | os.O_NOFOLLOW) -> int:
+    try:
+        return os.open(name, flags, dir_fd=dir_fd)
+    except PermissionError:
+        # not readable (e.g. the directories of cd_permissions)
+        os.chmod(name, 0o700, dir_fd=dir_fd)
+        return os.open(name, flags, dir_fd=dir_fd)
+
+def _remove_in(remove, name: str, dir_fd: int):
+    try:
+        remove(name, dir_fd=dir_fd)
+    except PermissionError:
+        # the directory is not writable
+        os.fchmod(dir_fd, 0o700)
+        remove(name, dir_fd=dir_fd)
+
+def _clear_dir(dir_fd: int, keep=()) -> list[str]:
+    """Unlink everything but the subdirectories in dir_fd; return their names."""
+    subdirs = []
+    with os.scandir(dir_fd) as it:
+        for entry in it:
+            if entry.name in keep:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+            else:
+                _remove_in(os.unlink, entry.name, dir_fd)
+    return subdirs
+
+def _remove_subdirs(dir_fd: int, subdirs: list[str]):
+    """
+    Remove the subdirectories of dir_fd with their content.
+
+    Iterative, with at most MAX_OPEN_DIRS open directories: each directory
+    is listed once, its files are unlinked as they are listed, and
+    permissions are changed only where an open or unlink fails.
+    """
+    stack = [(dir_fd, None, subdirs)]
+    try:
+        while len(stack) > 1 or stack[0][2]:
+            fd, name, pending = stack[-1]
+            if pending:
+                child_name = pending.pop()
+                stack.append((_open_dir(child_name, fd), child_name, []))
+                stack[-1][2].extend(_clear_dir(stack[-1][0]))
+                if len(stack) > MAX_OPEN_DIRS + 1:
+                    # deep tree: reopened with ".." on the way back up
+                    old_fd, old_name, old_pending = stack[-MAX_OPEN_DIRS - 1]
+                    if old_fd is not None:
+                        os.close(old_fd)
+                        stack[-MAX_OPEN_DIRS - 1] = (None, old_name, old_pending)
+                continue
+            stack.pop()
+            parent_fd, parent_name, parent_pending = stack[-1]
+            if parent_fd is None:
+                parent_fd = os.open("..", _DIR_FLAGS, dir_fd=fd)
+                stack[-1] = (parent_fd, parent_name, parent_pending)
+            os.close(fd)
+            _remove_in(os.rmdir, name, parent_fd)
+    finally:
+        for fd, _, _ in stack[1:]:
+            if fd is not None:
+                os.close(fd)
+
+def remove_tree(path: Path):
+    """Remove path and, if it is a directory, all its content."""
+    path = Path(path)
+    # O_PATH: the parent may be writable but not readable
+    parent = os.open(path.parent, getattr(os, "O_PATH", os.O_RDONLY) | os.O_DIRECTORY | os.O_CLOEXEC)
+    try:
+        try:
+            st = os.stat(path.name, dir_fd=parent, follow_symlinks=False)
+        except FileNotFoundError:
+            return
+        if stat.S_ISDIR(st.st_mode):
+            _remove_subdirs(parent, [path.name])
+        else:
+            _remove_in(os.unlink, path.name, parent)
+    finally:
+        os.close(parent)
+
+def reset_workspace(ws: Path, keep=(".bashquest",)):
+    """Remove everything in the workspace except the entries named in keep."""
     ws.mkdir(parents=True, exist_ok=True)
+    fd = _open_dir(ws, flags=_DIR_FLAGS)
+    try:
+        _remove_subdirs(fd, _clear_dir(fd, keep))
+    finally:
+        os.close(fd)
+
+def trash_dir(ws: Path) -> Path:
+    """
+    Where the content of the previous challenge of ws waits to be deleted:
+    beside the workspace (on the same filesystem), so that find, grep -r
+    or du run in it never see the old files.
+    """
+    return ws.parent / f".{ws.name}.trash"
+
+def _open_trash(ws: Path, create: bool = False) -> int | None:
+    """
+    Open the trash of ws, created if create; return None if it does not
+    exist or is not a directory of the user (the parent of the workspace
+    may be shared: the trash must not lead anywhere else).
+    """
+    path = trash_dir(ws)
+    if create:
+        try:
+            path.mkdir(mode=0o700)
+        except FileExistsError:
+            pass
+    try:
+        fd = os.open(path, _DIR_FLAGS | os.O_NOFOLLOW)
+    except OSError as e:
+        if e.errno in (errno.ENOENT, errno.ENOTDIR, errno.ELOOP):
+            return None
+        raise
+    if os.fstat(fd).st_uid != os.getuid():
+        os.close(fd)
+        return None
+    return fd
+
+def move_to_trash(ws: Path, keep=(".bashquest",)):
+    """
+    Move everything in the workspace except the entries named in keep to a
+    new directory in the trash (see purge_trash). Each entry is moved with
+    a single rename: it is either still in the workspace, or entirely gone.
+    If the trash cannot be used, the entries are deleted right away.
+    """
+    ws.mkdir(parents=True, exist_ok=True)
+    try:
+        trash_fd = _open_trash(ws, create=True)
+    except PermissionError:
+        # the parent of the workspace is not writable
+        trash_fd = None
+    if trash_fd is not None and os.fstat(trash_fd).st_dev != os.stat(ws).st_dev:
+        # the workspace is a mount point: entries cannot be renamed out of it
+        os.close(trash_fd)
+        trash_fd = None
+    if trash_fd is None:
+        reset_workspace(ws, keep)
+        return
+    try:
+        target = secrets.token_hex(8)
+        os.mkdir(target, 0o700, dir_fd=trash_fd)
+        target_fd = _open_dir(target, dir_fd=trash_fd)
+    finally:
+        os.close(trash_fd)
+    ws_fd = _open_dir(ws, flags=_DIR_FLAGS)
+    try:
+        with os.scandir(ws_fd) as it:
+            names = [entry.name for entry in it if entry.name not in keep]
+        for name in names:
+            try:
+                os.rename(name, name, src_dir_fd=ws_fd, dst_dir_fd=target_fd)
+            except PermissionError:
+                # the workspace is not writable, or the entry is a directory
+                # that is not (its ".." changes)
+                os.fchmod(ws_fd, 0o700)
+                if stat.S_ISDIR(os.stat(name, dir_fd=ws_fd, follow_symlinks=False).st_mode):
+                    os.chmod(name, 0o700, dir_fd=ws_fd)
+                os.rename(name, name, src_dir_fd=ws_fd, dst_dir_fd=target_fd)
+    finally:
+        os.close(target_fd)
+        os.close(ws_fd)
+
+def purge_trash(ws: Path):
+    """
+    Delete the content of the trash of the workspace, including what is
+    moved there in the meantime. Does nothing if another process is
+    already purging it.
+    """
+    fd = _open_trash(ws)
+    if fd is None:
+        return
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        while subdirs := _clear_dir(fd):
+            _remove_subdirs(fd, subdirs)
+    finally:
+        os.close(fd)
+
+# Calls of run_detached postponed by defer_detached()
+_deferred = None
+
+def run_detached(func, *args):
+    """
+    Run func(*args) in a new session, in a process that is not a child of
+    the caller, with the standard streams on /dev/null and no other file
+    descriptor of the caller. Return right away.
+    """
+    if _deferred is not None:
+        _deferred.append((func, args))
+        return
+    pid = os.fork()
+    if pid == 0:
+        # double fork, so that the process is not a child of the caller
+        try:
+            os.setsid()
+            if os.fork() == 0:
+                devnull = os.open(os.devnull, os.O_RDWR)
+                for fd in (0, 1, 2):
+                    os.dup2(devnull, fd)
+                # e.g. a client connection of the daemon, which would
+                # stay open (and the client waiting) until func returns
+                os.closerange(3, os.sysconf("SC_OPEN_MAX"))
+                func(*args)
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+@contextmanager
+def defer_detached():
+    """
+    Within the block, record the calls of run_detached instead of running
+    them; yield the list of (func, args) recorded, for the caller to run
+    when it is done (e.g. the daemon, once it has replied).
+    """
+    global _deferred
+    outer, _deferred = _deferred, []
+    try:
+        yield _deferred
+    finally:
+        _deferred = outer
 
 def hash_flag(s: str) -> bytes:
     return hashlib.sha256(s.encode()).digest()
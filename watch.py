@@ -0,0 +1,378 @@
+"""
+Watch mode for the put-the-flag challenges.
+
+`bashquest watch` checks the current challenge each time the workspace
+changes, as `submit` would, and sets the next challenge as soon as the
+current one is solved; in between, it prints what is still wrong whenever
+that changes. It stops at the first challenge that requires a flag (only
+the student can submit it), or when all the challenges are passed.
+
+Changes are notified by inotify (through ctypes, on Linux): every directory
+of the workspace is watched, and the process sleeps in poll() until an
+event arrives, using no CPU while the student is not changing anything.
+Bursts of events (e.g. cp -r, rm -r) are debounced: the challenge is
+checked once no event arrived for DEBOUNCE seconds (or MAX_DELAY seconds
+after the first one). For the challenges declaring their expected tree
+(see challenges/expect.py), only the events on the declared paths, their
+parents and their content trigger a check. The state files are watched
+too, so that a `submit`, `goto` or `reset` run from another terminal is
+noticed.
+
+Where inotify is not available (other systems, or the limit of watches of
+the user reached), the workspace is checked every POLL_INTERVAL seconds,
+and the challenge only evaluated when the stat of the relevant paths
+changed.
+
+Each check takes the lock of the workspace (see storage.lock_workspace),
+like submit.
+"""
+
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+import bashquest
+from storage import lock_workspace, workspace_journal_file, workspace_state_file
+
+# Seconds without events after which a burst is over
+DEBOUNCE = 0.2
+# Seconds after the first event of a burst after which the challenge is checked anyway
+MAX_DELAY = 1.0
+# Seconds between two checks of the polling fallback
+POLL_INTERVAL = 1.0
+# Directories watched at most (beyond that, the workspace is polled)
+MAX_WATCHES = 4096
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+
+EVENT = struct.Struct("iIII")
+
+STATE_DIR = ".bashquest"
+
+
+# ===================== RELEVANT PATHS =====================
+
+class Relevance:
+    """Which paths of the workspace (relative, "" for the root) matter to the current challenge."""
+
+    def __init__(self, paths: set[str] | None):
+        # None: all of them
+        self.paths = paths
+        self.ancestors = set()
+        for path in paths or ():
+            while path:
+                path = os.path.dirname(path)
+                self.ancestors.add(path)
+        self.state_files = {os.path.join(STATE_DIR, workspace_state_file(Path()).name),
+                            os.path.join(STATE_DIR, workspace_journal_file(Path()).name)}
+
+    def __contains__(self, path: str) -> bool:
+        if path in self.state_files:
+            return True
+        if path == STATE_DIR or path.startswith(STATE_DIR + os.sep):
+            return False
+        if self.paths is None or path in self.paths or path in self.ancestors:
+            return True
+        parent = os.path.dirname(path)
+        while parent:
+            if parent in self.paths:
+                return True
+            parent = os.path.dirname(parent)
+        return False
+
+    def signature(self, ws: Path) -> tuple:
+        """The stat of the relevant paths, for the polling fallback."""
+        if self.paths is None:
+            names = list(walk_dirs(ws))
+            names += [os.path.join(d, e) for d in names for e in list_names(ws / d)]
+        else:
+            names = sorted(self.paths | self.ancestors)
+        names += sorted(self.state_files)
+        stamp = []
+        for name in names:
+            try:
+                st = os.lstat(ws / name)
+                stamp.append((name, st.st_ino, st.st_mode, st.st_size, st.st_mtime_ns, st.st_ctime_ns))
+            except OSError:
+                stamp.append((name, None))
+        return tuple(stamp)
+
+
+def list_names(path: Path) -> list[str]:
+    try:
+        return sorted(os.listdir(path))
+    except OSError:
+        return []
+
+
+def walk_dirs(ws: Path, rel: str = ""):
+    """Yield the directory rel of ws and the directories in it (relative to ws), but .bashquest."""
+    stack = [rel]
+    while stack:
+        rel = stack.pop()
+        yield rel
+        try:
+            with os.scandir(ws / rel) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False) and not (rel == "" and entry.name == STATE_DIR):
+                        stack.append(os.path.join(rel, entry.name))
+        except OSError:
+            continue
+
+
+# ===================== INOTIFY =====================
+
+def load_inotify():
+    """Return libc with the inotify functions; raise OSError if they are not available."""
+    import ctypes
+    import ctypes.util
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError) as e:
+        raise OSError(errno.ENOSYS, f"inotify is not available ({e})") from None
+    return libc
+
+
+class InotifyWatcher:
+    def __init__(self, ws: Path, relevance: Relevance):
+        import ctypes
+
+        self.ws = ws
+        self.relevance = relevance
+        self.libc = load_inotify()
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        # watch descriptor -> relative path of the directory
+        self.dirs: dict[int, str] = {}
+        try:
+            self.watch_tree("")
+            self.watch(STATE_DIR)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def watch(self, rel: str):
+        import ctypes
+
+        if len(self.dirs) >= MAX_WATCHES:
+            raise OSError(errno.ENOSPC, f"more than {MAX_WATCHES} directories to watch")
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(self.ws / rel), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                # gone meanwhile, or not readable: its changes cannot be seen
+                return
+            raise OSError(err, os.strerror(err))
+        self.dirs[wd] = rel
+
+    def watch_tree(self, rel: str):
+        for sub in walk_dirs(self.ws, rel):
+            self.watch(sub)
+
+    def rewatch(self):
+        """Watch the tree again from scratch (after directories were moved: their paths changed)."""
+        for wd in self.dirs:
+            self.libc.inotify_rm_watch(self.fd, wd)
+        self.dirs = {}
+        self.watch_tree("")
+        self.watch(STATE_DIR)
+
+    def read_events(self) -> bool:
+        """Read the pending events; return whether any of them is relevant."""
+        relevant = False
+        moved = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, pos)
+                pos += EVENT.size
+                name = os.fsdecode(data[pos:pos + length].rstrip(b"\0"))
+                pos += length
+                if mask & IN_Q_OVERFLOW:
+                    relevant = moved = True
+                    continue
+                parent = self.dirs.get(wd)
+                if parent is None:
+                    continue
+                if mask & IN_IGNORED:
+                    del self.dirs[wd]
+                    continue
+                path = os.path.join(parent, name) if name else parent
+                if path in self.relevance:
+                    relevant = True
+                if mask & IN_ISDIR and parent != STATE_DIR:
+                    if mask & (IN_MOVED_FROM | IN_MOVED_TO):
+                        moved = True
+                    elif mask & IN_CREATE:
+                        # with what was created in it before it was watched
+                        self.watch_tree(path)
+        if moved:
+            self.rewatch()
+        return relevant
+
+    def wait(self):
+        """Return after a burst of events with relevant ones; sleep until then."""
+        poller = select.poll()
+        poller.register(self.fd, select.POLLIN)
+        while True:
+            poller.poll()
+            if not self.read_events():
+                continue
+            first = time.monotonic()
+            while time.monotonic() - first < MAX_DELAY and poller.poll(DEBOUNCE * 1000):
+                self.read_events()
+            return
+
+
+# ===================== POLLING =====================
+
+class PollingWatcher:
+    def __init__(self, ws: Path, relevance: Relevance):
+        self.ws = ws
+        self.relevance = relevance
+        self.stamp = relevance.signature(ws)
+
+    def wait(self):
+        while True:
+            time.sleep(POLL_INTERVAL)
+            stamp = self.relevance.signature(self.ws)
+            if stamp != self.stamp:
+                self.stamp = stamp
+                return
+
+    def close(self):
+        pass
+
+
+def make_watcher(ws: Path, relevance: Relevance, polling: bool):
+    if not polling:
+        try:
+            return InotifyWatcher(ws, relevance)
+        except OSError as e:
+            print(f"Cannot watch the workspace with inotify ({e.strerror or e}):"
+                  f" checking it every {POLL_INTERVAL:g} s instead.")
+    return PollingWatcher(ws, relevance)
+
+
+# ===================== WATCH =====================
+
+def relevance_of(ch, state) -> Relevance:
+    expected = getattr(ch, "expected", None)
+    if expected is None:
+        return Relevance(None)
+    return Relevance(set(expected(state).rules))
+
+
+def check(workspace: Path, secret_key, challenges, seed):
+    """
+    Check the current challenge, under the lock of the workspace; set the
+    next one if it is solved. Return (state, challenge, hints), with
+    challenge None if watching must stop and hints None if the challenge
+    was solved.
+    """
+    if not (workspace / STATE_DIR).is_dir():
+        print("The workspace was removed.")
+        return None, None, []
+    with lock_workspace(workspace):
+        state = bashquest.load_state(workspace, secret_key)
+        if state is None:
+            print("The workspace has no quest: use 'start'.")
+            return state, None, []
+        if state.challenge_index >= len(challenges):
+            print("All challenges completed.")
+            return state, None, []
+        ch = challenges[state.challenge_index]
+        if getattr(ch, "requires_flag", True):
+            print(f"Challenge {state.challenge_index + 1} requires a flag: use 'submit <flag>'.")
+            return state, None, []
+        if not ch.evaluate(state, None):
+            return state, ch, bashquest.get_hints(ch, state)
+
+        last = state.challenge_index + 1 == len(challenges)
+        bashquest.pass_challenge(state, challenges, ch, secret_key, seed)
+        if last:
+            return state, None, []
+        # the next challenge is set: hints None, to check it right away
+        return state, ch, None
+
+
+def exec_watch_command(workspace: Path, secret_key, challenges, seed=None):
+    polling = False
+    watcher = None
+    # what the watcher was made for, and the hints last printed
+    watched = None
+    shown = None
+    print("Watching the workspace: the challenge is checked as you change it (Ctrl-C to stop).")
+    try:
+        while True:
+            state, ch, hints = check(workspace, secret_key, challenges, seed)
+            if ch is None:
+                break
+            if hints is None:
+                # a new challenge: check it right away
+                shown = None
+                continue
+            if hints != shown:
+                bashquest.print_hints(hints)
+                shown = hints
+            key = (state.challenge_index, state.to_dict())
+            if key != watched:
+                if watcher is not None:
+                    watcher.close()
+                watcher = make_watcher(Path(state.workspace), relevance_of(ch, state), polling)
+                polling = isinstance(watcher, PollingWatcher)
+                watched = key
+                # check again: what changed before the watcher was ready made no event
+                continue
+            sys.stdout.flush()
+            try:
+                watcher.wait()
+            except OSError as e:
+                # e.g. the limit of watches reached by new directories
+                print(f"Cannot watch the workspace with inotify ({e.strerror or e}):"
+                      f" checking it every {POLL_INTERVAL:g} s instead.")
+                watcher.close()
+                polling = True
+                watcher = PollingWatcher(Path(state.workspace), relevance_of(ch, state))
+                # the next pass checks again, after the baseline of the polling
+    except KeyboardInterrupt:
+        print("")
+    finally:
+        if watcher is not None:
+            watcher.close()
+    print("Watch stopped.")